@@ -1,33 +1,71 @@
+from typing import Any, Sequence
 from uuid import UUID
-from datetime import date
+from datetime import datetime
 
 import src.database.models.patients as db_mod_pat
-from sqlalchemy import delete, select, func, or_
+from sqlalchemy import Row, delete, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.data_access_layer.general import Page, get_page, lock_id
+from src.data_access_layer.instrumentation import instrument_data_access
+from src.data_access_layer.specialists import MAX_VISIT_DURATION
 
+
+@instrument_data_access
 class Appointments:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    async def add(self, new_appointment: dict[str, Any]) -> db_mod_pat.Appointments:
+        insert_query = insert(db_mod_pat.Appointments).values(new_appointment).returning(db_mod_pat.Appointments)
+        result = await self.db_session.scalar(insert_query)
+        await self.db_session.flush()
+        return result
+
+    async def lock_patient(self, patient_id: UUID):
+        """Wait for other transactions booking the patient, lock is released at the end of transaction."""
+        await lock_id(self.db_session, patient_id)
+
+    async def get_patient_appointments(self, patient_id: UUID, start: datetime, end: datetime) -> Sequence[Row]:
+        """Appointments of patient overlapping time range, as id, start and end."""
+        appointments_table = db_mod_pat.Appointments
+        select_query = (select(appointments_table.id, appointments_table.start, appointments_table.end).
+                        where(appointments_table.patient_id == patient_id,
+                              appointments_table.start >= start - MAX_VISIT_DURATION,
+                              appointments_table.start < end, appointments_table.end > start))
+        appointments = await self.db_session.execute(select_query)
+        return appointments.all()
+
     async def delete(self, id_: UUID) -> (int, UUID):
         delete_query = (delete(db_mod_pat.Appointments).where(db_mod_pat.Appointments.id == id_).
-                        returning(db_mod_pat.Appointments.patient_id, db_mod_pat.Appointments.start))
+                        returning(db_mod_pat.Appointments.id, db_mod_pat.Appointments.patient_id,
+                                  db_mod_pat.Appointments.start))
         delete_result = await self.db_session.execute(delete_query)
         visit_data = delete_result.first()
-        number_deleted_rows: int = delete_result.rowcount # bad type hint for sqlalchemy
+        number_deleted_rows = 0 if visit_data is None else 1  # ORM result of DELETE RETURNING has no rowcount
         await self.db_session.flush()
         return number_deleted_rows, visit_data
 
-    async def get_many(self, pagination, specialist_id: UUID, start: date, end: date):
-        offset = pagination['offset']
-        limit = offset + pagination['page_size']
-        select_query = (select(db_mod_pat.Appointments).offset(offset).limit(limit).
-                        where(or_(db_mod_pat.Appointments.specialist_id == specialist_id, specialist_id is None)).
-                        where(or_(db_mod_pat.Appointments.start == start, start is None)).
-                        where(or_(db_mod_pat.Appointments.end == end, end is None)))
-        appointments = await self.db_session.scalars(select_query)
-        count_query = select(func.count(db_mod_pat.Appointments.id).over())
-        appointments_number = await self.db_session.scalar(count_query)
-        appointments = appointments.fetchall()
-        return appointments, appointments_number
+    async def delete_range(self, specialist_id: UUID, start: datetime, end: datetime) -> Sequence[Row]:
+        """Delete appointments of specialist starting in range [start, end) in one statement.
+
+        Returns id, patient_id and start of deleted appointments.
+        """
+        appointments_table = db_mod_pat.Appointments
+        delete_query = (delete(appointments_table).
+                        where(appointments_table.specialist_id == specialist_id, appointments_table.start >= start,
+                              appointments_table.start < end).
+                        returning(appointments_table.id, appointments_table.patient_id, appointments_table.start))
+        deleted_visits = await self.db_session.execute(delete_query)
+        return deleted_visits.all()
+
+    async def get_many(self, pagination: dict[str, Any], specialist_id: UUID | None, start: datetime,
+                       end: datetime) -> Page:
+        """Appointments starting in range [start, end), filtered by start, so only partitions of range are read."""
+        appointments_table = db_mod_pat.Appointments
+        sort_columns = (appointments_table.start, appointments_table.specialist_id)  # Primary key, unique
+        select_query = select(appointments_table).where(appointments_table.start >= start,
+                                                        appointments_table.start < end)
+        if specialist_id is not None:  # Served by (specialist_id, start) index of partition
+            select_query = select_query.where(appointments_table.specialist_id == specialist_id)
+        return await get_page(self.db_session, select_query, sort_columns, pagination)
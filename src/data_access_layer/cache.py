@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """Bounded in-memory cache with per-entry time to live and LRU eviction."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            expires_at, value = self.__entries[key]
+        except KeyError:
+            return default
+        if expires_at <= time.monotonic():
+            del self.__entries[key]
+            return default
+        self.__entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self.__entries.pop(key, None)
+            return
+        self.__entries[key] = (time.monotonic() + ttl, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        _, value = self.__entries.pop(key, (None, None))
+        return value
+
+    def pop_where(self, predicate: Callable[[Any], bool]) -> int:
+        keys = [key for key, (_, value) in self.__entries.items() if predicate(value)]
+        for key in keys:
+            del self.__entries[key]
+        return len(keys)
+
+    def clear(self):
+        self.__entries.clear()
@@ -1,14 +1,39 @@
-from typing import Any, Sequence, TypeVar
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Any, NamedTuple, Sequence, TypeVar
+from uuid import UUID
 
-from sqlalchemy import insert, select, delete, update
+from sqlalchemy import event, insert, select, delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import or_
+from sqlalchemy.orm import Session
 
 import src.database.dicts_models as db_dicts
+from src.data_access_layer.instrumentation import instrument_data_access
+from src.data_access_layer.invalidation import publish, register_invalidator
 
 DbDictionary = TypeVar('DbDictionary', bound=db_dicts.DatabaseDictionary)
 
 
+class DictionaryRow(NamedTuple):
+    id: int
+    display_name: str
+    description: str | None
+    is_active: bool
+    is_system_value: bool
+    create_date: datetime
+    created_by_id: UUID
+    last_modified_by_id: UUID | None
+    last_modified_date: datetime | None
+
+
+class DictionarySnapshot(NamedTuple):
+    version: int
+    rows: tuple[DictionaryRow, ...]
+    etag: str
+
+
+@instrument_data_access
 class Dictionaries:
 
     __db_dictionaries_by_names = {'application_roles': db_dicts.ApplicationRoles,
@@ -16,6 +41,11 @@ class Dictionaries:
                                   'examination_status': db_dicts.ExaminationStatus,
                                   'drawn_spots_types': db_dicts.DrawnSpotsTypes}
 
+    # Dictionaries are tiny and rarely changed, so they are served from immutable in memory snapshots
+    __snapshots: dict[str, DictionarySnapshot] = {}
+    __versions: dict[str, int] = {name: 0 for name in __db_dictionaries_by_names}
+    __locks: dict[str, asyncio.Lock] = {}
+
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
@@ -27,30 +57,84 @@ class Dictionaries:
         except KeyError:
             return None
 
+    @classmethod
+    def invalidate(cls, dictionary_name: str | None):
+        """Bump version of dictionary, or of all dictionaries for None, snapshot is rebuilt on next read."""
+        dictionaries_names = [dictionary_name] if dictionary_name is not None else list(cls.__versions)
+        for dictionary_name in dictionaries_names:
+            if dictionary_name in cls.__versions:
+                cls.__versions[dictionary_name] += 1
+                cls.__snapshots.pop(dictionary_name, None)
+
+    async def __mark_changed(self, db_dictionary: DbDictionary):
+        # Snapshot is invalidated after commit, so it is never rebuilt from not committed data
+        self.db_session.info.setdefault('changed_dictionaries', set()).add(db_dictionary.__tablename__)
+        await publish(self.db_session, 'dictionaries', db_dictionary.__tablename__)  # For other workers
+
+    async def get_snapshot(self, db_dictionary: DbDictionary) -> DictionarySnapshot:
+        dictionary_name = db_dictionary.__tablename__
+        snapshot = self.__snapshots.get(dictionary_name)
+        if snapshot is not None:
+            return snapshot
+        lock = self.__locks.setdefault(dictionary_name, asyncio.Lock())
+        async with lock:
+            snapshot = self.__snapshots.get(dictionary_name)
+            if snapshot is not None:
+                return snapshot
+            version = self.__versions[dictionary_name]
+            select_query = select(db_dictionary).order_by(db_dictionary.id)
+            dictionary_rows = await self.db_session.scalars(select_query)
+            rows = tuple(DictionaryRow(*(getattr(row, field) for field in DictionaryRow._fields))
+                         for row in dictionary_rows)
+            digest = hashlib.sha256(repr(rows).encode('utf-8')).hexdigest()[:16]
+            snapshot = DictionarySnapshot(version, rows, f'"{dictionary_name}-{version}-{digest}"')
+            if self.__versions[dictionary_name] == version:  # Not changed in meantime by other request
+                self.__snapshots[dictionary_name] = snapshot
+            return snapshot
+
     async def add_row(self, db_dictionary: DbDictionary, dictionary_row: dict[str, Any]) -> DbDictionary:
         insert_query = insert(db_dictionary).values(dictionary_row).returning(db_dictionary)
         result = await self.db_session.scalar(insert_query)
         await self.db_session.flush()
+        await self.__mark_changed(db_dictionary)
         return result
 
-    async def get_rows(self, db_dictionary: DbDictionary, is_active: bool) -> Sequence[DbDictionary]:
-        select_query = select(db_dictionary).where(or_(is_active is None, db_dictionary.is_active == is_active))
-        dictionary_rows = await self.db_session.scalars(select_query)
-        dictionary_rows = dictionary_rows.all()
-        return dictionary_rows
+    async def get_rows(self, db_dictionary: DbDictionary, is_active: bool) -> Sequence[DictionaryRow]:
+        snapshot = await self.get_snapshot(db_dictionary)
+        if is_active is None:
+            return snapshot.rows
+        return [row for row in snapshot.rows if row.is_active == is_active]
 
-    async def get_row(self, db_dictionary: DbDictionary, row_id: int) -> DbDictionary:
-        select_query = select(db_dictionary).where(db_dictionary.id == row_id)
-        dictionary_row = await self.db_session.scalar(select_query)
-        return dictionary_row
+    async def get_row(self, db_dictionary: DbDictionary, row_id: int) -> DictionaryRow | None:
+        snapshot = await self.get_snapshot(db_dictionary)
+        for row in snapshot.rows:
+            if row.id == row_id:
+                return row
+        return None
 
     async def delete_row(self, db_dictionary: DbDictionary, row_id: int):
         delete_query = delete(db_dictionary).where(db_dictionary.id == row_id)
         await self.db_session.execute(delete_query)
         await self.db_session.flush()
+        await self.__mark_changed(db_dictionary)
 
     async def update_row(self, db_dictionary: DbDictionary, row_data: dict[str, Any],  row_id: int) -> DbDictionary:
         update_query = update(db_dictionary).where(db_dictionary.id == row_id).values(row_data).returning(db_dictionary)
         dictionary_row = await self.db_session.scalar(update_query)
         await self.db_session.flush()
+        await self.__mark_changed(db_dictionary)
         return dictionary_row
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_dictionaries(session: Session):
+    for dictionary_name in session.info.pop('changed_dictionaries', ()):
+        Dictionaries.invalidate(dictionary_name)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_dictionaries(session: Session):
+    session.info.pop('changed_dictionaries', None)
+
+
+register_invalidator('dictionaries', Dictionaries.invalidate)
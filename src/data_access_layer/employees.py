@@ -1,69 +1,236 @@
-from typing import Any, Sequence
+from typing import Any, AsyncIterator, Sequence
+from dataclasses import dataclass
 import datetime
+import os
 from uuid import UUID
 
 import src.database.models.employees
-from sqlalchemy import update, insert, delete, select
-from sqlalchemy.sql import func
+from sqlalchemy import update, insert, delete, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.data_access_layer.cache import TTLCache
+from src.data_access_layer.general import Page, get_page, copy_records, stream_partitions
+from src.data_access_layer.instrumentation import instrument_data_access
+from src.data_access_layer.invalidation import publish, register_invalidator
 
+ACCESS_TOKENS_CACHE_SIZE = int(os.environ.get('ACCESS_TOKENS_CACHE_SIZE', 10_000))
+ACCESS_TOKENS_CACHE_TTL = float(os.environ.get('ACCESS_TOKENS_CACHE_TTL', 300))
+ACCESS_TOKENS_NEGATIVE_CACHE_TTL = float(os.environ.get('ACCESS_TOKENS_NEGATIVE_CACHE_TTL', 5))
+
+_UNKNOWN_TOKEN = object()
+
+
+@instrument_data_access
 class Employees:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
-    async def add(self, new_employee: dict[str, Any]) -> src.databases.models.employees.Employees:
-        insert_query = insert(src.databases.models.employees.Employees).values(new_employee).returning(
-            src.databases.models.employees.Employees)
+    async def add(self, new_employee: dict[str, Any]) -> src.database.models.employees.Employees:
+        insert_query = insert(src.database.models.employees.Employees).values(new_employee).returning(
+            src.database.models.employees.Employees)
         result = await self.db_session.scalar(insert_query)
         await self.db_session.flush()
         return result
 
-    async def get_many(self, pagination: dict[str, int]) -> (Sequence[src.databases.models.employees.Employees], int):
-        offset = pagination['offset']
-        limit = offset + pagination['page_size']
-        select_query = select(src.databases.models.employees.Employees).offset(offset).limit(limit)
-        employees = await self.db_session.scalars(select_query)
-        count_query = select(func.count(src.databases.models.employees.Employees.id).over())
-        employees_number = await self.db_session.scalar(count_query)
-        employees = employees.fetchall()
-        return employees, employees_number
-
-    async def get_by_email(self, email: str) -> src.databases.models.employees.Employees:
-        select_query = select(src.databases.models.employees.Employees).where(
-            src.databases.models.employees.Employees.email == email)
+    def stream_all(self, columns: Sequence[str], partition_size: int) -> AsyncIterator[Sequence[Any]]:
+        """Chosen columns of all employees in order of creation, in partitions read by server side cursor."""
+        employees_table = src.database.models.employees.Employees
+        select_query = select(*(getattr(employees_table, column) for column in columns)).order_by(
+            employees_table.create_date, employees_table.id)
+        return stream_partitions(self.db_session, select_query, partition_size)
+
+    async def get_many(self, pagination: dict[str, Any]) -> Page:
+        employees_table = src.database.models.employees.Employees
+        sort_columns = (employees_table.create_date, employees_table.id)
+        return await get_page(self.db_session, select(employees_table), sort_columns, pagination)
+
+    async def get_by_email(self, email: str) -> src.database.models.employees.Employees:
+        select_query = select(src.database.models.employees.Employees).where(
+            src.database.models.employees.Employees.email == email)
         result = await self.db_session.scalar(select_query)
         return result
 
-    async def update(self, id_: UUID, employee: dict[str, Any]) -> src.databases.models.employees.Employees:
-        update_query = update(src.databases.models.employees.Employees).where(
-            src.databases.models.employees.Employees.id == id_)\
-                       .values(employee).returning(src.databases.models.employees.Employees)
+    async def update(self, id_: UUID, employee: dict[str, Any]) -> src.database.models.employees.Employees:
+        update_query = update(src.database.models.employees.Employees).where(
+            src.database.models.employees.Employees.id == id_)\
+                       .values(employee).returning(src.database.models.employees.Employees)
         result = await self.db_session.scalar(update_query)
         await self.db_session.flush()
+        await publish(self.db_session, 'employees', str(id_))
         return result
 
     async def delete(self, id_: UUID) -> int:
-        delete_query = delete(src.databases.models.employees.Employees).where(
-            src.databases.models.employees.Employees.id == id_)
+        delete_query = delete(src.database.models.employees.Employees).where(
+            src.database.models.employees.Employees.id == id_)
         delete_result = await self.db_session.execute(delete_query)
         number_deleted_rows: int = delete_result.rowcount # bad type hint for sqlalchemy
         await self.db_session.flush()
+        await publish(self.db_session, 'employees', str(id_))
         return number_deleted_rows
 
 
+@instrument_data_access
+class EmployeesImport:
+    """Bulk import of employees through temporary staging table, use it inside of single transaction.
+
+    Rows violating constraints are reported and skipped, all other rows are added together.
+    """
+
+    staging_table = 'employees_import'
+    columns = ('row_number', 'name', 'surname', 'pesel_or_identifier', 'birth_date', 'role_id', 'hashed_password',
+               'telephone', 'business_telephone', 'email', 'address', 'created_by_id')
+    unique_columns = ('email', 'telephone', 'business_telephone', 'pesel_or_identifier')
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def create_staging(self):
+        create_query = text(f'CREATE TEMPORARY TABLE {self.staging_table} '
+                            '(row_number integer PRIMARY KEY, LIKE employees INCLUDING DEFAULTS) ON COMMIT DROP')
+        await self.db_session.execute(create_query)
+
+    async def copy(self, employees: Sequence[tuple]):
+        """Rows are tuples of values of columns, starting with row number."""
+        await copy_records(self.db_session, self.staging_table, self.columns, employees)
+
+    async def get_violations(self) -> Sequence[tuple[int, str]]:
+        """Row numbers with description of violated constraint, repeated value is accepted in first row only."""
+        violations_queries = []
+        for column in self.unique_columns:
+            violations_queries.append(f"SELECT staging.row_number, '{column} already exists' "
+                                      f'FROM {self.staging_table} staging '
+                                      f'JOIN employees ON employees.{column} = staging.{column}')
+            violations_queries.append(f"SELECT row_number, '{column} repeated in import' FROM "
+                                      f'(SELECT row_number, count(*) OVER (PARTITION BY {column} '
+                                      f'ORDER BY row_number) AS occurrence '
+                                      f'FROM {self.staging_table} WHERE {column} IS NOT NULL) AS occurrences '
+                                      'WHERE occurrence > 1')
+        violations_queries.append(f"SELECT row_number, 'role_id is not known' FROM {self.staging_table} staging "
+                                  'WHERE NOT EXISTS (SELECT 1 FROM dicts.application_roles roles '
+                                  'WHERE roles.id = staging.role_id)')
+        violations_queries.append(f"SELECT row_number, 'telephone or business_telephone is required' "
+                                  f'FROM {self.staging_table} '
+                                  'WHERE telephone IS NULL AND business_telephone IS NULL')
+        select_query = text(' UNION ALL '.join(violations_queries) + ' ORDER BY 1')
+        violations = await self.db_session.execute(select_query)
+        return violations.all()
+
+    async def merge(self, skipped_rows: Sequence[int]) -> Sequence[tuple[int, UUID | None]]:
+        """Add staged employees except skipped rows, id is None for row conflicting with concurrently added one."""
+        employees_columns = ', '.join(('id',) + self.columns[1:])
+        merge_query = text(f'WITH added AS (INSERT INTO employees ({employees_columns}) '
+                           f'SELECT {employees_columns} FROM {self.staging_table} '
+                           'WHERE row_number <> ALL(:skipped_rows) ORDER BY row_number '
+                           'ON CONFLICT DO NOTHING RETURNING id) '
+                           f'SELECT staging.row_number, added.id FROM {self.staging_table} staging '
+                           'LEFT JOIN added ON added.id = staging.id '
+                           'WHERE staging.row_number <> ALL(:skipped_rows) ORDER BY staging.row_number')
+        merged_rows = await self.db_session.execute(merge_query, {'skipped_rows': list(skipped_rows)})
+        return merged_rows.all()
+
+
+@dataclass(frozen=True)
+class TokenData:
+    id: UUID
+    role_id: int
+    expiration_date: datetime.datetime
+
+
+@instrument_data_access
 class EmployeesTokens:
+    # Shared by all instances, so tokens checked in one request are served from memory in the next ones.
+    tokens_cache = TTLCache(ACCESS_TOKENS_CACHE_SIZE, ACCESS_TOKENS_CACHE_TTL)
+
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
     async def add(self, new_token: dict[str, Any]):
-        insert_query = insert(src.databases.models.employees.EmployeesAccessTokens).values(new_token)
+        insert_query = insert(src.database.models.employees.EmployeesAccessTokens).values(new_token)
         await self.db_session.execute(insert_query)
         await self.db_session.flush()
 
-    async def check(self, access_token: str) -> src.databases.models.employees.EmployeesAccessTokens:
-        select_query = (select(src.databases.models.employees.EmployeesAccessTokens).
-                        where(src.databases.models.employees.EmployeesAccessTokens.access_token == access_token,
-                              src.databases.models.employees.EmployeesAccessTokens.expiration_date > datetime.datetime.now()))
-        token_data = await self.db_session.scalar(select_query)
+    async def check(self, access_token: str) -> TokenData | None:
+        now = datetime.datetime.now()
+        cached_token = self.tokens_cache.get(access_token)
+        if cached_token is _UNKNOWN_TOKEN:
+            return None
+        if cached_token is not None and cached_token.expiration_date > now:
+            return cached_token
+
+        select_query = (select(src.database.models.employees.EmployeesAccessTokens).
+                        where(src.database.models.employees.EmployeesAccessTokens.access_token == access_token,
+                              src.database.models.employees.EmployeesAccessTokens.expiration_date > now))
+        token_row = await self.db_session.scalar(select_query)
+        if token_row is None:
+            self.tokens_cache.set(access_token, _UNKNOWN_TOKEN, ACCESS_TOKENS_NEGATIVE_CACHE_TTL)
+            return None
+        token_data = TokenData(token_row.id, token_row.role_id, token_row.expiration_date)
+        seconds_to_expiration = (token_data.expiration_date - now).total_seconds()
+        self.tokens_cache.set(access_token, token_data, min(ACCESS_TOKENS_CACHE_TTL, seconds_to_expiration))
         return token_data
+
+    async def delete(self, access_token: str) -> int:
+        delete_query = delete(src.database.models.employees.EmployeesAccessTokens).where(
+            src.database.models.employees.EmployeesAccessTokens.access_token == access_token)
+        delete_result = await self.db_session.execute(delete_query)
+        number_deleted_rows: int = delete_result.rowcount # bad type hint for sqlalchemy
+        await self.db_session.flush()
+        await publish(self.db_session, 'tokens', access_token)
+        return number_deleted_rows
+
+    async def delete_expired(self, batch_size: int) -> int:
+        access_tokens = src.database.models.employees.EmployeesAccessTokens
+        now = datetime.datetime.now()
+        expired_query = select(access_tokens.access_token).where(access_tokens.expiration_date <= now).limit(batch_size)
+        delete_query = delete(access_tokens).where(access_tokens.access_token.in_(expired_query.scalar_subquery()),
+                                                   access_tokens.expiration_date <= now)
+        delete_result = await self.db_session.execute(delete_query)
+        number_deleted_rows: int = delete_result.rowcount # bad type hint for sqlalchemy
+        await self.db_session.flush()
+        return number_deleted_rows
+
+    @classmethod
+    def evict(cls, access_token: str | None):
+        """Drop token from cache, call it after the transaction revoking token is committed. None drops all."""
+        if access_token is None:
+            cls.tokens_cache.clear()
+        else:
+            cls.tokens_cache.pop(access_token)
+
+    @classmethod
+    def evict_employee(cls, employee_id: str | None):
+        if employee_id is None:
+            cls.tokens_cache.clear()
+        else:
+            employee_id = UUID(employee_id)
+            cls.tokens_cache.pop_where(lambda token: token is not _UNKNOWN_TOKEN and token.id == employee_id)
+
+
+@instrument_data_access
+class EmployeesRevokedTokens:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def add(self, revoked_token: dict[str, Any]):
+        insert_query = insert(src.database.models.employees.EmployeesRevokedTokens).values(revoked_token)
+        await self.db_session.execute(insert_query)
+        await self.db_session.flush()
+        await publish(self.db_session, 'revoked_tokens', revoked_token['token_id'])
+
+    async def get_active(self) -> Sequence[src.database.models.employees.EmployeesRevokedTokens]:
+        select_query = select(src.database.models.employees.EmployeesRevokedTokens).where(
+            src.database.models.employees.EmployeesRevokedTokens.expiration_date > datetime.datetime.now())
+        revoked_tokens = await self.db_session.scalars(select_query)
+        return revoked_tokens.all()
+
+    async def delete_expired(self) -> int:
+        delete_query = delete(src.database.models.employees.EmployeesRevokedTokens).where(
+            src.database.models.employees.EmployeesRevokedTokens.expiration_date <= datetime.datetime.now())
+        delete_result = await self.db_session.execute(delete_query)
+        number_deleted_rows: int = delete_result.rowcount # bad type hint for sqlalchemy
+        await self.db_session.flush()
+        return number_deleted_rows
+
+
+register_invalidator('tokens', EmployeesTokens.evict)
+register_invalidator('employees', EmployeesTokens.evict_employee)
@@ -1,19 +1,243 @@
+import hashlib
+import logging
+import os
+import time
+from typing import Annotated, Any, AsyncIterator, NamedTuple, Sequence
+from uuid import UUID
+
 import sqlalchemy
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from fastapi import Depends, Request
+from sqlalchemy import Select, func, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 
 import src.database.relational as db_rel
+from src.database.models.general import SchemaVersion
+from src.data_access_layer.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+COUNTS_CACHE_SIZE = int(os.environ.get('COUNTS_CACHE_SIZE', 1_000))
+COUNTS_CACHE_TTL = float(os.environ.get('COUNTS_CACHE_TTL', 60))
+
+counts_cache = TTLCache(COUNTS_CACHE_SIZE, COUNTS_CACHE_TTL)
+
+REPLICA_RETRY_INTERVAL = float(os.environ.get('REPLICA_RETRY_INTERVAL', 30))
+READ_FROM_HEADER = 'X-Read-From'  # Value primary forces primary, for reading just written data
+
+_replica_down_until = 0.0
+
+
+class Page(NamedTuple):
+    rows: Sequence[Any]
+    rows_number: int | None  # Not counted with count strategy none
+    has_next: bool
+    has_previous: bool
+    first_key: tuple | None
+    last_key: tuple | None
+
+
+async def get_relational_async_session() -> AsyncIterator[db_rel.AsyncSession]:
+    """Request scoped session, authentication and route handler share it and its single pooled connection.
+
+    Connection is checked out once, transactions of request run on it and it is returned to pool after handler.
+    """
+    async with db_rel.async_engine.connect() as connection:
+        async with db_rel.async_session(bind=connection) as session:
+            yield session
 
 
-def get_relational_async_session() -> db_rel.AsyncSession:
+async def get_relational_read_session(request: Request,
+                                      session: Annotated[AsyncSession, Depends(get_relational_async_session)])\
+        -> AsyncIterator[db_rel.AsyncSession]:
+    """Request scoped session for read only handlers, it is bound to replica when one is configured and reachable.
+
+    Otherwise, and when X-Read-From: primary header is sent, it is the primary session shared with authentication.
+    Replica that failed to connect or had no free connection in pool is skipped for REPLICA_RETRY_INTERVAL seconds.
+    """
+    global _replica_down_until
+    if (db_rel.replica_async_engine is None or time.monotonic() < _replica_down_until
+            or request.headers.get(READ_FROM_HEADER, '').lower() == 'primary'):
+        yield session
+        return
+    connection = db_rel.replica_async_engine.connect()
+    try:
+        await connection.start()
+    except (DBAPIError, PoolTimeoutError, OSError):  # Pool timeout when all replica connections are checked out
+        logger.exception('Replica is unavailable, reading from primary.')
+        _replica_down_until = time.monotonic() + REPLICA_RETRY_INTERVAL
+        yield session
+        return
+    try:
+        async with db_rel.async_session(bind=connection) as replica_session:
+            yield replica_session
+    finally:
+        await connection.close()
+
+
+def create_relational_async_session() -> db_rel.AsyncSession:
+    """Session for work outside of requests, like background tasks, use it as async context manager."""
     return db_rel.async_session()
 
 
-async def init_relational_database():
+def paginate(select_query: Select, sort_columns: Sequence[InstrumentedAttribute], pagination: dict[str, Any])\
+        -> Select:
+    """Order and limit select, skipping rows by offset or by keyset cursor.
+
+    Sort columns must be unique together and covered by index, one row more than page size is selected
+    to know if there is further page without counting.
+    """
+    sort_key = tuple_(*sort_columns)
+    if pagination['before'] is not None:
+        select_query = (select_query.where(sort_key < tuple_(*pagination['before'])).
+                        order_by(*[column.desc() for column in sort_columns]))
+    else:
+        if pagination['after'] is not None:
+            select_query = select_query.where(sort_key > tuple_(*pagination['after']))
+        elif not pagination['keyset']:
+            select_query = select_query.offset(pagination['offset'])
+        select_query = select_query.order_by(*sort_columns)
+    return select_query.limit(pagination['page_size'] + 1)
+
+
+def make_page(rows: Sequence[Any], rows_number: int | None, sort_columns: Sequence[InstrumentedAttribute],
+              pagination: dict[str, Any]) -> Page:
+    page_size = pagination['page_size']
+    has_more = len(rows) > page_size
+    rows = list(rows[:page_size])
+    if pagination['before'] is not None:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    elif pagination['keyset']:
+        has_next, has_previous = has_more, pagination['after'] is not None
+    else:
+        has_next, has_previous = has_more, pagination['offset'] > 0
+    first_key = last_key = None
+    if rows:
+        first_key = tuple(getattr(rows[0], column.key) for column in sort_columns)
+        last_key = tuple(getattr(rows[-1], column.key) for column in sort_columns)
+    return Page(rows, rows_number, has_next, has_previous, first_key, last_key)
+
+
+async def estimate_rows(db_session: AsyncSession, table: sqlalchemy.Table) -> int | None:
+    """Number of rows from planner statistics, summed over partitions. None if table was never analyzed."""
+    table_name = f'{table.schema}.{table.name}' if table.schema else table.name
+    select_query = text("SELECT CASE WHEN bool_or(reltuples < 0) THEN NULL ELSE sum(reltuples)::bigint END "
+                        "FROM pg_class WHERE relkind = 'r' AND (oid = to_regclass(:table_name) OR oid IN "
+                        "(SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table_name)))")
+    return await db_session.scalar(select_query, {'table_name': table_name})
+
+
+def _counts_cache_key(count_query: Select) -> tuple[str, str]:
+    compiled_query = count_query.compile()
+    return str(compiled_query), repr(sorted(compiled_query.params.items()))
+
+
+async def get_page(db_session: AsyncSession, select_query: Select, sort_columns: Sequence[InstrumentedAttribute],
+                   pagination: dict[str, Any]) -> Page:
+    """Select page of rows and count all rows matching filters with strategy chosen in pagination.
+
+    exact - filtered count computed by subquery in the same round trip as page,
+    estimate - planner statistics for not filtered select, exact count otherwise,
+    cached - exact count remembered per filters for a while, none - no counting.
+    """
+    count_strategy = pagination['count']
+    count_query = select_query.with_only_columns(func.count(), maintain_column_froms=True)
+    rows_number = None
+    if count_strategy == 'estimate' and select_query.whereclause is None:
+        rows_number = await estimate_rows(db_session, select_query.get_final_froms()[0])
+    elif count_strategy == 'cached':
+        rows_number = counts_cache.get(_counts_cache_key(count_query))
+
+    page_query = paginate(select_query, sort_columns, pagination)
+    if rows_number is None and count_strategy != 'none':
+        page_query = page_query.add_columns(count_query.scalar_subquery())
+        result = await db_session.execute(page_query)
+        rows = result.all()
+        if rows:
+            rows_number = rows[0][-1]
+            rows = [row[0] for row in rows]
+            if count_strategy == 'cached':
+                counts_cache.set(_counts_cache_key(count_query), rows_number)
+    else:
+        rows = await db_session.scalars(page_query)
+        rows = rows.all()
+    return make_page(rows, rows_number, sort_columns, pagination)
+
+
+async def stream_partitions(db_session: AsyncSession, select_query: Select, partition_size: int)\
+        -> AsyncIterator[Sequence[sqlalchemy.Row]]:
+    """Rows of select fetched by server side cursor, only one partition of rows is in memory at once."""
+    result = await db_session.stream(select_query.execution_options(yield_per=partition_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def lock_id(db_session: AsyncSession, id_: UUID):
+    """Wait for advisory lock of id, released at the end of transaction, key is bigint hash of the whole UUID."""
+    await db_session.execute(sqlalchemy.select(func.pg_advisory_xact_lock(func.hashtextextended(str(id_), 0))))
+
+
+async def copy_records(db_session: AsyncSession, table_name: str, columns: Sequence[str],
+                       records: Sequence[tuple]):
+    """Load rows by binary COPY on connection of session, in its current transaction.
+
+    Transaction must be already started by statement executed by session, so COPY is part of it.
+    """
+    connection = await db_session.connection()
+    raw_connection = await connection.get_raw_connection()
+    asyncpg_connection = raw_connection.driver_connection
+    await asyncpg_connection.copy_records_to_table(table_name, records=records, columns=columns)
+
+
+SCHEMAS = ('dicts', 'patients')
+SCHEMA_LOCK_ID = 7_403_216  # Advisory lock of workers creating tables at the same time
+
+
+def get_schema_hash() -> str:
+    """Hash of DDL of schemas, tables and indexes of models, compiled without connecting to database."""
+    dialect = postgresql.dialect()
+    schema_hash = hashlib.sha256(','.join(SCHEMAS).encode('utf-8'))
+    for table in sorted(db_rel.Base.metadata.tables.values(), key=lambda model_table: model_table.fullname):
+        schema_hash.update(str(sqlalchemy.schema.CreateTable(table).compile(dialect=dialect)).encode('utf-8'))
+        for index in sorted(table.indexes, key=lambda table_index: str(table_index.name)):
+            schema_hash.update(str(sqlalchemy.schema.CreateIndex(index).compile(dialect=dialect)).encode('utf-8'))
+    return schema_hash.hexdigest()
+
+
+async def _get_recorded_schema_hash(connection: AsyncConnection) -> str | None:
+    if await connection.scalar(text("SELECT to_regclass('schema_version')")) is None:
+        return None
+    return await connection.scalar(sqlalchemy.select(SchemaVersion.schema_hash).where(SchemaVersion.id == 1))
+
+
+async def init_relational_database() -> bool:
+    """Create schemas and tables when hash of models differs from the recorded one, returns True when they were.
+
+    Unchanged schema costs two queries instead of reflection of every table. Changed models only add missing tables
+    and indexes, columns of existing tables have to be migrated by hand.
+    """
+    schema_hash = get_schema_hash()
     async with db_rel.async_engine.begin() as conn:
-        await conn.execute(sqlalchemy.schema.CreateSchema('dicts', True))
-        await conn.execute(sqlalchemy.schema.CreateSchema('patients', True))
+        if await _get_recorded_schema_hash(conn) == schema_hash:
+            return False
+        await conn.execute(sqlalchemy.select(func.pg_advisory_xact_lock(SCHEMA_LOCK_ID)))
+        if await _get_recorded_schema_hash(conn) == schema_hash:  # Created by other worker meanwhile
+            return False
+        for schema in SCHEMAS:
+            await conn.execute(sqlalchemy.schema.CreateSchema(schema, True))
         await conn.run_sync(db_rel.Base.metadata.create_all)
+        insert_query = pg_insert(SchemaVersion).values(id=1, schema_hash=schema_hash)
+        await conn.execute(insert_query.on_conflict_do_update(
+            index_elements=[SchemaVersion.id], set_={'schema_hash': schema_hash, 'update_date': func.now()}))
+    logger.info('Database schema %s created.', schema_hash)
+    return True
 
 
 async def close_relational_database():
     await db_rel.async_engine.dispose(close=True)
+    if db_rel.replica_async_engine is not None:
+        await db_rel.replica_async_engine.dispose(close=True)
@@ -0,0 +1,34 @@
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from src.tracing import traced
+
+# Data access method running now, like Employees.get_many, queries executed by it are attributed to it
+data_access_method: ContextVar[str | None] = ContextVar('data_access_method', default=None)
+
+
+def _attributed(method: Callable[..., Awaitable[Any]], method_name: str) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(method)
+    async def attributed_method(*args, **kwargs):
+        context_token = data_access_method.set(method_name)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            data_access_method.reset(context_token)
+
+    return attributed_method
+
+
+def instrument_data_access(cls: type) -> type:
+    """Class decorator, queries of public coroutine methods are attributed to ClassName.method_name.
+
+    Methods run in tracing spans of the same name. Methods returning async iterators are left as they are, their
+    queries run after method has returned.
+    """
+    for name, method in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.iscoroutinefunction(method):
+            method_name = f'{cls.__name__}.{name}'
+            setattr(cls, name, _attributed(traced(method_name, 'data_access')(method), method_name))
+    return cls
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Callable
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import src.database.relational as db_rel
+
+logger = logging.getLogger(__name__)
+
+CACHE_INVALIDATION_CHANNEL = 'employees_api_cache_invalidation'
+CACHE_INVALIDATION_LISTENER = os.environ.get('CACHE_INVALIDATION_LISTENER', 'true').lower() == 'true'
+CACHE_INVALIDATION_RECONNECT_DELAY = float(os.environ.get('CACHE_INVALIDATION_RECONNECT_DELAY', 5))
+
+# Invalidator gets key of changed object, or None when everything should be dropped
+Invalidator = Callable[[str | None], None]
+_invalidators: dict[str, list[Invalidator]] = defaultdict(list)
+
+
+def register_invalidator(topic: str, invalidator: Invalidator):
+    _invalidators[topic].append(invalidator)
+
+
+def dispatch(topic: str, key: str | None):
+    for invalidator in _invalidators[topic]:
+        try:
+            invalidator(key)
+        except Exception:
+            logger.exception('Invalidation of %s %s failed.', topic, key)
+
+
+def dispatch_all():
+    for topic in list(_invalidators):
+        dispatch(topic, None)
+
+
+async def publish(db_session: AsyncSession, topic: str, key: str):
+    """Notify all workers about change, Postgres delivers it after commit and drops it on rollback."""
+    payload = json.dumps({'topic': topic, 'key': key})
+    await db_session.execute(select(func.pg_notify(CACHE_INVALIDATION_CHANNEL, payload)))
+
+
+def _on_notification(connection: asyncpg.Connection, pid: int, channel: str, payload: str):
+    try:
+        message = json.loads(payload)
+        topic, key = message['topic'], message['key']
+    except (ValueError, KeyError):
+        logger.warning('Invalid cache invalidation message %r.', payload)
+        return
+    dispatch(topic, key)
+
+
+async def listen():
+    """Consume invalidation messages on dedicated connection, reconnecting when it is lost."""
+    dsn = make_url(db_rel.DATABASE_URL).set(drivername='postgresql').render_as_string()
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn, password=db_rel.get_postgres_password())
+            connection_lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: connection_lost.set())
+            await connection.add_listener(CACHE_INVALIDATION_CHANNEL, _on_notification)
+            dispatch_all()  # Messages sent while not listening are lost
+            await connection_lost.wait()
+            logger.warning('Cache invalidation connection lost.')
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Cache invalidation listener failed.')
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        dispatch_all()
+        await asyncio.sleep(CACHE_INVALIDATION_RECONNECT_DELAY)
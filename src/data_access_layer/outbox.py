@@ -0,0 +1,44 @@
+from typing import Any, Sequence
+from uuid import UUID
+
+from sqlalchemy import Interval, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.data_access_layer.instrumentation import instrument_data_access
+from src.database.models.patients import EmailsOutbox as EmailsOutboxTable
+
+
+@instrument_data_access
+class EmailsOutbox:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def add_many(self, new_emails: Sequence[dict[str, Any]]):
+        """Queue emails, ones with already queued idempotency key are skipped."""
+        insert_query = pg_insert(EmailsOutboxTable).on_conflict_do_nothing(index_elements=['idempotency_key'])
+        await self.db_session.execute(insert_query, list(new_emails))
+
+    async def lock_pending(self, limit: int) -> Sequence[EmailsOutboxTable]:
+        """Due emails locked until end of transaction, emails locked by other workers are skipped."""
+        select_query = (select(EmailsOutboxTable).
+                        where(EmailsOutboxTable.status == 'pending', EmailsOutboxTable.next_attempt_at <= func.now()).
+                        order_by(EmailsOutboxTable.next_attempt_at).limit(limit).
+                        with_for_update(skip_locked=True))
+        emails = await self.db_session.scalars(select_query)
+        return emails.all()
+
+    async def mark_sent(self, emails_ids: Sequence[UUID]):
+        update_query = (update(EmailsOutboxTable).where(EmailsOutboxTable.id.in_(emails_ids)).
+                        values(status='sent', attempts=EmailsOutboxTable.attempts + 1, sent_date=func.now(),
+                               last_error=None))
+        await self.db_session.execute(update_query)
+
+    async def mark_failed(self, failures: Sequence[dict[str, Any]]):
+        """Failures have email_id, and new status, attempts, retry_delay (timedelta) and last_error of email."""
+        outbox_table = EmailsOutboxTable.__table__  # Core statement, executed once for all failures
+        update_query = (update(outbox_table).where(outbox_table.c.id == bindparam('email_id')).
+                        values(status=bindparam('status'), attempts=bindparam('attempts'),
+                               next_attempt_at=func.now() + bindparam('retry_delay', type_=Interval),  # Database clock
+                               last_error=bindparam('last_error')))
+        await self.db_session.execute(update_query, list(failures))
@@ -0,0 +1,76 @@
+from datetime import date, datetime
+from typing import Sequence
+
+import sqlalchemy as sqla
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.data_access_layer.instrumentation import instrument_data_access
+
+
+def _qualified_name(table: sqla.Table, name: str | None = None) -> str:
+    name = name or table.name
+    if table.schema:
+        return f'{table.schema}.{name}'
+    return name
+
+
+@instrument_data_access
+class Partitions:
+    """Management of declarative partitions, names of partitions are generated by application, not by users."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def is_partitioned(self, table: sqla.Table) -> bool:
+        select_query = text('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table '
+                            'WHERE partrelid = to_regclass(:table_name))')
+        return await self.db_session.scalar(select_query, {'table_name': _qualified_name(table)})
+
+    async def get_names(self, table: sqla.Table) -> Sequence[str]:
+        select_query = text('SELECT child.relname FROM pg_inherits '
+                            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                            'WHERE pg_inherits.inhparent = to_regclass(:table_name) ORDER BY child.relname')
+        partitions_names = await self.db_session.scalars(select_query, {'table_name': _qualified_name(table)})
+        return partitions_names.all()
+
+    async def create_range(self, table: sqla.Table, partition_name: str, lower: date | datetime,
+                           upper: date | datetime):
+        create_query = text(f'CREATE TABLE IF NOT EXISTS {_qualified_name(table, partition_name)} '
+                            f'PARTITION OF {_qualified_name(table)} '
+                            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')")
+        await self.db_session.execute(create_query)
+
+    async def create_default(self, table: sqla.Table, partition_name: str):
+        create_query = text(f'CREATE TABLE IF NOT EXISTS {_qualified_name(table, partition_name)} '
+                            f'PARTITION OF {_qualified_name(table)} DEFAULT')
+        await self.db_session.execute(create_query)
+
+    async def count_rows(self, table: sqla.Table, partition_name: str) -> int:
+        count_query = text(f'SELECT count(*) FROM {_qualified_name(table, partition_name)}')
+        return await self.db_session.scalar(count_query)
+
+    async def count_rows_by_partition(self, table: sqla.Table) -> dict[str, int]:
+        """Rows of all partitions counted by one scan, empty partitions are missing."""
+        count_query = text(f'SELECT partition.relname, count(*) FROM {_qualified_name(table)} '
+                           f'JOIN pg_class partition ON partition.oid = {table.name}.tableoid '
+                           f'GROUP BY partition.relname')
+        rows = await self.db_session.execute(count_query)
+        return dict(rows.tuples().all())
+
+    async def drop(self, table: sqla.Table, partition_name: str):
+        drop_query = text(f'DROP TABLE IF EXISTS {_qualified_name(table, partition_name)}')
+        await self.db_session.execute(drop_query)
+
+    async def create_index(self, table: sqla.Table, partition_name: str, columns: Sequence[str]):
+        index_name = f"ix_{partition_name}_{'_'.join(columns)}"
+        quoted_columns = ', '.join(f'"{column}"' for column in columns)
+        create_query = text(f'CREATE INDEX IF NOT EXISTS {index_name} ON {_qualified_name(table, partition_name)} '
+                            f'({quoted_columns})')
+        await self.db_session.execute(create_query)
+
+    async def detach(self, table: sqla.Table, partition_name: str):
+        """Partition is kept as standalone table, for archiving or dropping later."""
+        detach_query = text(f'ALTER TABLE {_qualified_name(table)} '
+                            f'DETACH PARTITION {_qualified_name(table, partition_name)}')
+        await self.db_session.execute(detach_query)
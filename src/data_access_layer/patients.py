@@ -1,51 +1,86 @@
-from typing import Any, Sequence, cast
+from typing import Any, AsyncIterator, Sequence, cast
 from uuid import UUID
 
 import src.database.models.patients
-from sqlalchemy import update, delete, select, insert, func
+from sqlalchemy import update, delete, select, insert, literal, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.data_access_layer.general import Page, get_page, stream_partitions
+from src.data_access_layer.instrumentation import instrument_data_access
 
+
+@instrument_data_access
 class Patients:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
-    async def add(self, new_patient: dict[str, Any]) -> src.databases.models.patients.Patients:
-        insert_query = insert(src.databases.models.patients.Patients).values(new_patient).returning(
-            src.databases.models.patients.Patients)
+    async def add(self, new_patient: dict[str, Any]) -> src.database.models.patients.Patients:
+        insert_query = insert(src.database.models.patients.Patients).values(new_patient).returning(
+            src.database.models.patients.Patients)
         result = await self.db_session.scalar(insert_query)
         await self.db_session.flush()
         return result
 
-    async def get_many(self, pagination: dict[str, int]) -> (Sequence[src.databases.models.patients.Patients], int):
-        offset = pagination['offset']
-        limit = offset + pagination['page_size']
-        select_query = select(src.databases.models.patients.Patients).offset(offset).limit(limit)
-        patients = await self.db_session.scalars(select_query)
-        count_query = select(func.count(src.databases.models.patients.Patients.id).over())
-        patients_number = await self.db_session.scalar(count_query)
-        patients = patients.fetchall()
-        return patients, patients_number
-
-    async def update(self, id_: UUID, patient: dict[str, Any]) -> src.databases.models.patients.Patients:
-        update_query = update(src.databases.models.patients.Patients).where(
-            src.databases.models.patients.Patients.id == id_)\
-                       .values(patient).returning(src.databases.models.patients.Patients)
+    async def add_many(self, new_patients: Sequence[dict[str, Any]]) -> dict[str, UUID]:
+        """Add patients by multi row inserts, patients conflicting with registered ones are skipped.
+
+        Returns ids of added patients by their logins.
+        """
+        patients_table = src.database.models.patients.Patients
+        # List of parameters is sent as few batched INSERT ... VALUES statements, compiled once and cached
+        insert_query = pg_insert(patients_table).on_conflict_do_nothing().returning(patients_table.login,
+                                                                                    patients_table.id)
+        added_patients = await self.db_session.execute(insert_query, list(new_patients))
+        return dict(added_patients.all())
+
+    async def get_taken(self, logins: Sequence[str], pesels: Sequence[str]) -> Sequence[tuple[str, str]]:
+        """Logins and verified identifiers already registered, as pairs of column name and value."""
+        patients_table = src.database.models.patients.Patients
+        select_query = union_all(
+            select(literal('login'), patients_table.login).where(patients_table.login.in_(logins)),
+            select(literal('pesel_or_identifier'), patients_table.pesel_or_identifier).where(
+                patients_table.pesel_or_identifier.in_(pesels), patients_table.is_verified.is_(True)))
+        taken = await self.db_session.execute(select_query)
+        return taken.all()
+
+    def stream_all(self, columns: Sequence[str], partition_size: int) -> AsyncIterator[Sequence[Any]]:
+        """Chosen columns of all patients in order of creation, in partitions read by server side cursor."""
+        patients_table = src.database.models.patients.Patients
+        select_query = select(*(getattr(patients_table, column) for column in columns)).order_by(
+            patients_table.create_date, patients_table.id)
+        return stream_partitions(self.db_session, select_query, partition_size)
+
+    async def get_many(self, pagination: dict[str, Any]) -> Page:
+        patients_table = src.database.models.patients.Patients
+        sort_columns = (patients_table.create_date, patients_table.id)
+        return await get_page(self.db_session, select(patients_table), sort_columns, pagination)
+
+    async def update(self, id_: UUID, patient: dict[str, Any]) -> src.database.models.patients.Patients:
+        update_query = update(src.database.models.patients.Patients).where(
+            src.database.models.patients.Patients.id == id_)\
+                       .values(patient).returning(src.database.models.patients.Patients)
         result = await self.db_session.scalar(update_query)
         await self.db_session.flush()
         return result
     
     async def delete_account(self, id_: UUID) -> int:
-        delete_query = delete(src.databases.models.patients.Patients).where(
-            src.databases.models.patients.Patients.id == id_)
+        delete_query = delete(src.database.models.patients.Patients).where(
+            src.database.models.patients.Patients.id == id_)
         delete_result = await self.db_session.execute(delete_query)
         await self.db_session.flush()
         number_deleted_rows: int = cast(delete_result.rowcount, int)
         return number_deleted_rows
 
-    async def get(self, patient_id) -> src.databases.models.patients.Patients:
-        select_query = select(src.databases.models.patients.Patients).where(
-            src.databases.models.patients.Patients.id == patient_id)
+    async def get_by_ids(self, patients_ids: Sequence[UUID]) -> Sequence[src.database.models.patients.Patients]:
+        select_query = select(src.database.models.patients.Patients).where(
+            src.database.models.patients.Patients.id.in_(patients_ids))
+        patients = await self.db_session.scalars(select_query)
+        return patients.all()
+
+    async def get(self, patient_id) -> src.database.models.patients.Patients:
+        select_query = select(src.database.models.patients.Patients).where(
+            src.database.models.patients.Patients.id == patient_id)
         patient = await self.db_session.scalars(select_query)
         patient = patient.first()
         return patient
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from typing import Sequence
+from uuid import UUID
+
+import src.database.models.employees as db_mod_emp
+import src.database.models.patients as db_mod_pat
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.data_access_layer.general import lock_id
+from src.data_access_layer.instrumentation import instrument_data_access
+
+MAX_VISIT_DURATION = timedelta(days=1)  # Lets appointments be filtered by start, which prunes partitions
+
+
+@instrument_data_access
+class Specialists:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def lock(self, specialist_id: UUID):
+        """Wait for other transactions booking the specialist, lock is released at the end of transaction."""
+        await lock_id(self.db_session, specialist_id)
+
+    async def exists(self, specialist_id: UUID) -> bool:
+        specialists_table = db_mod_emp.PatientsSpecialists
+        select_query = select(specialists_table.id).where(specialists_table.id == specialist_id)
+        return await self.db_session.scalar(select_query) is not None
+
+    async def get_ids_by_role(self, role_id: int) -> Sequence[UUID]:
+        specialists_table = db_mod_emp.PatientsSpecialists
+        select_query = select(specialists_table.id).where(specialists_table.role_id == role_id)
+        specialists_ids = await self.db_session.scalars(select_query)
+        return specialists_ids.all()
+
+    async def get_working_times(self, specialists_ids: Sequence[UUID]) \
+            -> Sequence[db_mod_emp.SpecialistsWorkingTime]:
+        select_query = select(db_mod_emp.SpecialistsWorkingTime).where(
+            db_mod_emp.SpecialistsWorkingTime.specialist_id.in_(specialists_ids),
+            db_mod_emp.SpecialistsWorkingTime.is_working_day.is_(True))
+        working_times = await self.db_session.scalars(select_query)
+        return working_times.all()
+
+    async def get_breaks(self, specialists_ids: Sequence[UUID], start: datetime, end: datetime) \
+            -> Sequence[tuple[UUID, datetime, datetime]]:
+        breaks_table = db_mod_emp.IndividualWorkingBreaks
+        select_query = (select(breaks_table.specialist_id, breaks_table.work_break_start, breaks_table.work_break_end).
+                        where(breaks_table.specialist_id.in_(specialists_ids),
+                              breaks_table.work_break_start < end, breaks_table.work_break_end > start))
+        breaks = await self.db_session.execute(select_query)
+        return breaks.all()
+
+    async def get_appointments(self, specialists_ids: Sequence[UUID], start: datetime, end: datetime) \
+            -> Sequence[tuple[UUID, datetime, datetime]]:
+        """Appointments overlapping time range, as specialist id, start and end."""
+        appointments_table = db_mod_pat.Appointments
+        select_query = (select(appointments_table.specialist_id, appointments_table.start, appointments_table.end).
+                        where(appointments_table.specialist_id.in_(specialists_ids),
+                              appointments_table.start >= start - MAX_VISIT_DURATION,
+                              appointments_table.start < end, appointments_table.end > start))
+        appointments = await self.db_session.execute(select_query)
+        return appointments.all()
@@ -16,7 +16,9 @@ class Employees(Base):
         sqla.UniqueConstraint('email'),
         sqla.UniqueConstraint('pesel_or_identifier'),
 
-        sqla.CheckConstraint('telephone is not null or business_telephone is not null')
+        sqla.CheckConstraint('telephone is not null or business_telephone is not null'),
+
+        sqla.Index('ix_employees_create_date_id', 'create_date', 'id'),  # Stable order for keyset pagination
     )
 
     id: Mapped[UUID] = mapped_column(primary_key=True, server_default=sqla.text('gen_random_uuid()'))
@@ -38,10 +40,19 @@ class Employees(Base):
 
 class EmployeesAccessTokens(Base):
     __tablename__ = 'employees_access_tokens'
+    # Daily partitions are managed by services.maintenance, expired ones are dropped as a whole
+    __table_args__ = {'postgresql_partition_by': 'RANGE (expiration_date)'}
 
     access_token: Mapped[str] = mapped_column(sqla.String(255), primary_key=True)
     id: Mapped[UUID] = mapped_column(sqla.ForeignKey('employees.id'))
     role_id: Mapped[int] = mapped_column(sqla.ForeignKey('dicts.application_roles.id'))
+    expiration_date: Mapped[datetime] = mapped_column(primary_key=True)
+
+
+class EmployeesRevokedTokens(Base):
+    __tablename__ = 'employees_revoked_tokens'
+
+    token_id: Mapped[str] = mapped_column(sqla.String(64), primary_key=True)
     expiration_date: Mapped[datetime]
 
 
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+import sqlalchemy as sqla
+from sqlalchemy.orm import Mapped, mapped_column
+from src.database.relational import Base
+
+
+class SchemaVersion(Base):
+    """Single row with hash of models, tables are created at startup only when it changes."""
+    __tablename__ = 'schema_version'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    schema_hash: Mapped[str] = mapped_column(sqla.String(64))
+    update_date: Mapped[datetime] = mapped_column(server_default=sqla.text('now()'))
@@ -18,6 +18,8 @@ class Patients(Base):
         sqla.UniqueConstraint('email', 'email_verified'),
         sqla.CheckConstraint('is_verified != false and telephone_verified != false and email_verified != false'),
 
+        sqla.Index('ix_patients_create_date_id', 'create_date', 'id'),  # Stable order for keyset pagination
+
         {'schema': 'patients'}
     )
 
@@ -109,3 +111,28 @@ class ExaminationsSchedule(Base):
     examination_id: Mapped[UUID] = mapped_column(sqla.ForeignKey('patients.examinations.id'))
     examination_date: Mapped[datetime]
     drawn_spot_id: Mapped[UUID] = mapped_column(sqla.ForeignKey('drawn_spots.id'))
+
+
+class EmailsOutbox(Base):
+    """Emails to patients, written in transaction of change they notify about and sent by background worker."""
+    __tablename__ = 'emails_outbox'
+    __table_args__ = (
+        sqla.UniqueConstraint('idempotency_key'),
+        sqla.CheckConstraint("status IN ('pending', 'sent', 'failed')"),
+
+        sqla.Index('ix_emails_outbox_pending', 'next_attempt_at', postgresql_where=sqla.text("status = 'pending'")),
+
+        {'schema': 'patients'}
+    )
+
+    id: Mapped[UUID] = mapped_column(server_default=sqla.text('gen_random_uuid()'), primary_key=True)
+    idempotency_key: Mapped[str] = mapped_column(sqla.String(255))  # Same message is queued and sent once
+    recipient: Mapped[str] = mapped_column(sqla.String(255))
+    subject: Mapped[str] = mapped_column(sqla.String(255))
+    body: Mapped[str]
+    status: Mapped[str] = mapped_column(sqla.String(10), server_default='pending')
+    attempts: Mapped[int] = mapped_column(server_default='0')
+    next_attempt_at: Mapped[datetime] = mapped_column(server_default=sqla.text('now()'))
+    last_error: Mapped[Optional[str]]
+    create_date: Mapped[datetime] = mapped_column(server_default=sqla.text('now()'))
+    sent_date: Mapped[Optional[datetime]]
@@ -0,0 +1,68 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class ExecutedQuery:
+    """Statement executed by cursor, timed once for all listeners of queries."""
+    statement: str
+    parameters: Any
+    executemany: bool
+    start_time: float
+    duration: float = 0.0
+    error: BaseException | None = None
+    span: Any = None  # Span of tracing, when statement runs in traced work
+
+
+QueryListener = Callable[[ExecutedQuery], None]
+
+_started_listeners: list[QueryListener] = []
+_finished_listeners: list[QueryListener] = []
+
+
+def add_listeners(started: QueryListener | None = None, finished: QueryListener | None = None):
+    """Listeners are called in order of adding, finished ones also for failed statements, with error set."""
+    if started is not None:
+        _started_listeners.append(started)
+    if finished is not None:
+        _finished_listeners.append(finished)
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    query = ExecutedQuery(statement, parameters, executemany, time.perf_counter())
+    context.executed_query = query  # Execution context is not reused, even if query fails
+    for listener in _started_listeners:
+        listener(query)
+
+
+def _finish(context, error: BaseException | None):
+    query = getattr(context, 'executed_query', None)
+    if query is None:  # Failed before execution, or error of fetching results after query was finished
+        return
+    context.executed_query = None
+    query.duration = time.perf_counter() - query.start_time
+    query.error = error
+    for listener in _finished_listeners:
+        listener(query)
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    _finish(context, None)
+
+
+def _handle_error(exception_context):
+    if exception_context.execution_context is not None:
+        _finish(exception_context.execution_context, exception_context.original_exception)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """One pair of cursor events of engine feeds all listeners of queries."""
+    if event.contains(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine.sync_engine, 'handle_error', _handle_error)
@@ -1,12 +1,24 @@
+import functools
 import os
+import statistics
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Literal
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 
-POSTGRES_PASSWORD_FILE = os.environ['POSTGRES_PASSWORD_FILE']
-with open(POSTGRES_PASSWORD_FILE, 'r') as file:
-    postgres_password = file.read()
+@functools.cache
+def get_postgres_password() -> str:
+    """Read at first connection, not at import, so modules can be imported without secrets."""
+    with open(os.environ['POSTGRES_PASSWORD_FILE'], 'r') as file:
+        return file.read()
+
 
 ENV = os.environ['ENV']
 if ENV == 'LOCAL':
@@ -19,11 +31,134 @@ else:
 user = 'postgres'
 driver = 'postgresql+asyncpg'
 
-DATABASE_URL = f'{driver}://{user}:{postgres_password}@{host}'
+DATABASE_URL = f'{driver}://{user}@{host}'  # Password is added by connect event
+
+# Optional streaming replica like replica_host/postgres, read only endpoints are routed to it
+POSTGRES_REPLICA_HOST = os.environ.get('POSTGRES_REPLICA_HOST')
+if POSTGRES_REPLICA_HOST:
+    REPLICA_DATABASE_URL = f'{driver}://{user}@{POSTGRES_REPLICA_HOST}'
+else:
+    REPLICA_DATABASE_URL = None
+
+
+def _echo_from_environment(value: str) -> bool | Literal['debug']:
+    value = value.lower()
+    if value == 'debug':
+        return 'debug'
+    return value == 'true'
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1_800  # Seconds, -1 to keep connections forever
+    pool_pre_ping: bool = False
+    statement_cache_size: int = 100  # Prepared statements cached per connection, 0 behind pgbouncer
+    connect_timeout: float = 10
+    echo: bool | Literal['debug'] = False  # True logs every statement, debug also result rows
+
+    @classmethod
+    def from_environment(cls, prefix: str = 'DB_') -> 'EngineSettings':
+        """Read settings from variables like DB_POOL_SIZE, not set variables keep defaults."""
+        defaults = cls()
+
+        def get(name: str, default: Any) -> str:
+            return os.environ.get(f'{prefix}{name}', str(default))
+
+        return cls(pool_size=int(get('POOL_SIZE', defaults.pool_size)),
+                   max_overflow=int(get('MAX_OVERFLOW', defaults.max_overflow)),
+                   pool_timeout=float(get('POOL_TIMEOUT', defaults.pool_timeout)),
+                   pool_recycle=int(get('POOL_RECYCLE', defaults.pool_recycle)),
+                   pool_pre_ping=get('POOL_PRE_PING', defaults.pool_pre_ping).lower() == 'true',
+                   statement_cache_size=int(get('STATEMENT_CACHE_SIZE', defaults.statement_cache_size)),
+                   connect_timeout=float(get('CONNECT_TIMEOUT', defaults.connect_timeout)),
+                   echo=_echo_from_environment(get('ECHO', defaults.echo)))
+
+
+class MeasuredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool remembering how long recent checkouts waited for connection."""
+
+    wait_samples = int(os.environ.get('DB_POOL_WAIT_SAMPLES', 1_000))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_waits: deque[float] = deque(maxlen=self.wait_samples)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkouts += 1
+            self.checkout_waits.append(time.perf_counter() - start)
 
-async_engine = create_async_engine(DATABASE_URL, echo=True)
+
+@dataclass
+class CheckoutsCounter:
+    checkouts: int = 0
+
+
+# Connections checked out from pool since start, and in current request when it is counted
+total_checkouts = CheckoutsCounter()
+request_checkouts: ContextVar[CheckoutsCounter | None] = ContextVar('request_checkouts', default=None)
+
+
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    total_checkouts.checkouts += 1
+    counter = request_checkouts.get()
+    if counter is not None:
+        counter.checkouts += 1
+
+
+def _add_password(dialect, connection_record, connection_args, connection_params):
+    connection_params['password'] = get_postgres_password()
+
+
+def create_engine(database_url: str, settings: EngineSettings) -> AsyncEngine:
+    connect_args = {'prepared_statement_cache_size': settings.statement_cache_size,  # SQLAlchemy adapter cache
+                    'statement_cache_size': settings.statement_cache_size,  # asyncpg cache
+                    'timeout': settings.connect_timeout}
+    engine = create_async_engine(database_url, poolclass=MeasuredQueuePool, pool_size=settings.pool_size,
+                                 max_overflow=settings.max_overflow, pool_timeout=settings.pool_timeout,
+                                 pool_recycle=settings.pool_recycle, pool_pre_ping=settings.pool_pre_ping,
+                                 echo=settings.echo, connect_args=connect_args)
+    event.listen(engine.sync_engine, 'checkout', _count_checkout)
+    event.listen(engine.sync_engine, 'do_connect', _add_password)
+    return engine
+
+
+def get_pool_status(engine: AsyncEngine) -> dict[str, Any]:
+    pool: MeasuredQueuePool = engine.pool  # bad type hint for sqlalchemy
+    waits_ms = sorted(wait * 1_000 for wait in pool.checkout_waits)
+    return {'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'checkouts': pool.checkouts,
+            'checkout_timeouts': pool.checkout_timeouts,
+            'wait_mean_ms': statistics.fmean(waits_ms) if waits_ms else 0.0,
+            'wait_p95_ms': waits_ms[int(0.95 * (len(waits_ms) - 1))] if waits_ms else 0.0,
+            'wait_max_ms': waits_ms[-1] if waits_ms else 0.0}
+
+
+engine_settings = EngineSettings.from_environment()
+async_engine = create_engine(DATABASE_URL, engine_settings)
 async_session = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
 
+if REPLICA_DATABASE_URL is not None:
+    replica_engine_settings = EngineSettings.from_environment('DB_REPLICA_')
+    replica_async_engine = create_engine(REPLICA_DATABASE_URL, replica_engine_settings)
+else:
+    replica_async_engine = None
+
 
 class Base(DeclarativeBase):
     pass
@@ -1,31 +1,90 @@
 from contextlib import asynccontextmanager
-import ssl
+import asyncio
 
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
+from src.services.startup import startup_report  # First, to measure imports of application
 from src.data_access_layer.general import init_relational_database, close_relational_database
+import src.data_access_layer.invalidation as invalidation
+from src.services.background import start_periodically, stop_tasks
+from src.services.middleware import PoolCheckoutsMiddleware, MetricsMiddleware, QueryTracerMiddleware, \
+    ProfilingMiddleware, TracingMiddleware
+import src.services.authentication as auth
+import src.services.maintenance as maintenance
+import src.services.emails as emails
+import src.services.hashing as hashing
+import src.services.metrics as metrics
+import src.services.query_tracer as query_tracer
+import src.tracing as tracing
+import src.database.query_listeners as query_listeners
+import src.database.relational as db_rel
 import src.routers.employees
 import src.routers.patients
 import src.routers.account
 import src.routers.dictionaries
+import src.routers.internal
+import src.routers.specialists
+import src.routers.appointments
+import src.routers.metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_relational_database()
+    startup_report.imports_done()
+    with startup_report.phase('database_schema'):
+        await init_relational_database()
+    with startup_report.phase('access_tokens_partitions'):
+        await maintenance.purge_access_tokens()  # Creates today partition of tokens before first login
+    with startup_report.phase('appointments_partitions'):
+        await maintenance.manage_appointments_partitions()  # Partitions have to exist before first booking
+    background_tasks = [start_periodically(maintenance.purge_access_tokens, maintenance.ACCESS_TOKENS_PURGE_INTERVAL),
+                        start_periodically(maintenance.manage_appointments_partitions,
+                                           maintenance.APPOINTMENTS_PARTITIONS_INTERVAL)]
+    if emails.EMAILS_OUTBOX_WORKER:
+        background_tasks.append(asyncio.create_task(emails.run_outbox_worker(), name='emails_outbox'))
+    if invalidation.CACHE_INVALIDATION_LISTENER:
+        background_tasks.append(asyncio.create_task(invalidation.listen(), name='cache_invalidation'))
+    if auth.ACCESS_TOKENS_MODE == 'signed':
+        with startup_report.phase('revoked_tokens'):
+            await auth.revocation_list.refresh()
+        background_tasks.append(start_periodically(auth.revocation_list.refresh, auth.REVOKED_TOKENS_REFRESH_INTERVAL))
+    if tracing.TRACING:
+        background_tasks.append(start_periodically(tracing.export_finished_spans, tracing.TRACING_EXPORT_INTERVAL,
+                                                   traced=False))  # Exporting spans doesn't make spans
+    startup_report.finish()
     yield
+    await stop_tasks(background_tasks)
+    await tracing.export_finished_spans()
     await close_relational_database()
+    hashing.shutdown()
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ProfilingMiddleware)  # Innermost, profile shows application without other middlewares
+app.add_middleware(PoolCheckoutsMiddleware)
+if query_tracer.QUERY_TRACER:
+    query_listeners.add_listeners(query_tracer.query_started, query_tracer.query_finished)
+    app.add_middleware(QueryTracerMiddleware)
+if metrics.METRICS_ENABLED:
+    query_listeners.add_listeners(finished=metrics.query_finished)
+    app.add_middleware(MetricsMiddleware)
+if tracing.TRACING:
+    query_listeners.add_listeners(tracing.query_started, tracing.query_finished)
+    app.add_middleware(TracingMiddleware)  # Outermost, request span includes other middlewares
+query_listeners.instrument_engine(db_rel.async_engine)  # Each statement is timed once for listeners above
+if db_rel.replica_async_engine is not None:
+    query_listeners.instrument_engine(db_rel.replica_async_engine)
 
-ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-ssl_context.load_cert_chain('./certificate.pem', keyfile='./privatekey.pem')
 
 app.include_router(src.routers.account.router)
 app.include_router(src.routers.employees.router)
 app.include_router(src.routers.dictionaries.router)
 app.include_router(src.routers.patients.router)
+app.include_router(src.routers.specialists.router)
+app.include_router(src.routers.appointments.router)
+app.include_router(src.routers.internal.router)
+if metrics.METRICS_ENABLED:
+    app.include_router(src.routers.metrics.router)
 
 
 @app.get('/', response_class=RedirectResponse)  # to see docs after click startup link
@@ -1,11 +1,26 @@
 from uuid import UUID
-from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, NaiveDatetime, model_validator
+
+from src.data_access_layer.specialists import MAX_VISIT_DURATION
 
 
 class Appointment(BaseModel):
-    employee_id: UUID
-    start: datetime
-    end: datetime
+    specialist_id: UUID
+    start: NaiveDatetime  # Local time of clinic, like working times of specialists
+    end: NaiveDatetime
     patient_id: UUID
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode='after')  # PyCharm raise warning, but it's follow Pydantic documentation
+    def valid_duration(self) -> 'Appointment':
+        if self.end <= self.start:
+            raise ValueError('Visit has to end after start!')
+        if self.end - self.start > MAX_VISIT_DURATION:
+            raise ValueError('Visit to long!')
+        return self
+
+
+class AppointmentLocation(Appointment):
+    location: str
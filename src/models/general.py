@@ -1,13 +1,70 @@
-from typing import Dict, Annotated
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Annotated, Literal, Optional
+from uuid import UUID
 
-from fastapi import Query, Depends
+from fastapi import Query, Depends, HTTPException, status
+from pydantic import BaseModel
 
 
-async def pagination(page_number: int = Query(1, gt=0),
-                     page_size: int = Query(10, gt=0)) -> Dict[str, int]:
-    page_size = min(100, page_size)
-    offset = page_size*(page_number - 1)
-    return {'offset': offset, 'page_size': page_size}
+def encode_cursor(sort_key: tuple[datetime, UUID]) -> str:
+    """Opaque cursor of last seen row, sort key is pair of sort value and row identifier."""
+    sort_value, id_ = sort_key
+    raw_cursor = json.dumps([sort_value.isoformat(), str(id_)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw_cursor).rstrip(b'=').decode('ascii')
 
-pagination_dependency = Annotated[dict[str, int], Depends(pagination)]
 
+def decode_cursor(cursor: str | None) -> tuple[datetime, UUID] | None:
+    if not cursor:
+        return None
+    try:
+        raw_cursor = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, id_ = json.loads(raw_cursor)
+        return datetime.fromisoformat(sort_value), UUID(id_)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid pagination cursor.')
+
+
+CountStrategy = Literal['exact', 'estimate', 'cached', 'none']
+
+
+def pagination_with_count(default_count: CountStrategy):
+    """Pagination dependency, endpoint chooses default count strategy, client can override it by count parameter."""
+
+    async def pagination(page_number: int = Query(1, gt=0),
+                         page_size: int = Query(10, gt=0),
+                         after: Optional[str] = Query(None, description='Cursor mode, empty value for first page.'),
+                         before: Optional[str] = Query(None),
+                         count: Optional[CountStrategy] = Query(None)) -> Dict[str, Any]:
+        page_size = min(100, page_size)
+        offset = page_size*(page_number - 1)
+        keyset = after is not None or before is not None
+        return {'offset': offset, 'page_size': page_size, 'keyset': keyset,
+                'after': decode_cursor(after), 'before': decode_cursor(before), 'count': count or default_count}
+
+    return pagination
+
+
+pagination = pagination_with_count('exact')
+
+pagination_dependency = Annotated[dict[str, Any], Depends(pagination)]
+# For big tables, where total number of rows from planner statistics is good enough
+estimated_pagination_dependency = Annotated[dict[str, Any], Depends(pagination_with_count('estimate'))]
+
+
+class ImportedRow(BaseModel):
+    row: int
+    location: str
+
+
+class RowErrors(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class ImportReport(BaseModel):
+    imported: int
+    rejected: int
+    rows: list[ImportedRow]
+    errors: list[RowErrors]
@@ -0,0 +1,44 @@
+from datetime import date, datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    size: int
+    max_overflow: int
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    checkout_timeouts: int
+    wait_mean_ms: float
+    wait_p95_ms: float
+    wait_max_ms: float
+
+
+class Partition(BaseModel):
+    name: str
+    start: Optional[date]  # Null for partitions not created by application
+    end: Optional[date]
+    rows: int
+
+
+class Profile(BaseModel):
+    id: str
+    method: str
+    path: str
+    route: Optional[str]  # Null when no route matched
+    status_code: int
+    duration_ms: float
+    create_date: datetime
+
+
+class StartupPhase(BaseModel):
+    name: str
+    duration_ms: float
+
+
+class StartupReport(BaseModel):
+    total_ms: float
+    phases: list[StartupPhase]
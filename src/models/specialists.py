@@ -0,0 +1,30 @@
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import BaseModel, Field, NaiveDatetime
+
+
+class FreeWindow(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class Availability(BaseModel):
+    specialist_id: UUID
+    duration: int
+    free_windows: list[FreeWindow]
+
+
+class FreeSlot(BaseModel):
+    specialist_id: UUID
+    start: datetime
+    end: datetime
+
+
+class CancelRange(BaseModel):
+    from_: NaiveDatetime = Field(alias='from')
+    to: NaiveDatetime
+
+
+class CancelledAppointments(BaseModel):
+    cancelled: int
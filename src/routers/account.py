@@ -3,22 +3,33 @@ from typing import Annotated
 from fastapi import APIRouter, status, HTTPException, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
-from src.services.authentication import authenticate, add_token
+from src.services.authentication import authenticate, add_token, validate_token, revoke_token, forget_token, Token
+from src.services.middleware import TracedRoute
 import src.data_access_layer.general as dal_gen
 
-router = APIRouter(tags=['employees_account'])
+router = APIRouter(tags=['employees_account'], route_class=TracedRoute)
 
 AsyncSessionDep = Annotated[dal_gen.db_rel.AsyncSession, Depends(dal_gen.get_relational_async_session)]
 AuthDep = Annotated[OAuth2PasswordRequestForm, Depends(OAuth2PasswordRequestForm)]
 
 
 @router.post('/employees/login')
-async def create_token(authentication_data: AuthDep, session: AsyncSessionDep):
+async def create_token(authentication_data: AuthDep):
     email = authentication_data.username
     password = authentication_data.password
-    async with session.begin():
-        id_, role_id = await authenticate(email, password, session)
-        if id_ is None:
+    # Not request scoped session, connection is taken only for transactions, not while password is hashed
+    async with dal_gen.create_relational_async_session() as session:
+        authenticated_employee = await authenticate(email, password, session)
+        if authenticated_employee is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-        access_token = await add_token(id_, role_id, session)
+        id_, role_id = authenticated_employee
+        async with session.begin():
+            access_token = await add_token(id_, role_id, session)
     return {'access_token': access_token, 'token_type': 'bearer'}
+
+
+@router.post('/employees/logout', status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(validate_token)])
+async def logout(token: Token, session: AsyncSessionDep):
+    async with session.begin():
+        await revoke_token(token, session)
+    forget_token(token)
@@ -1,43 +1,84 @@
-from typing import Annotated
+from typing import Annotated, Optional, Sequence
+from urllib.parse import urlencode
 from uuid import UUID
 
-from fastapi import APIRouter, status, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, status, Depends, HTTPException, Response, Query
+from pydantic import NaiveDatetime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import src.services.authentication as auth
 import src.data_access_layer.appointments as dal_appointments
 import src.data_access_layer.general as dal_gen
+import src.database.models.patients as db_mod_pat
 import src.models.general as mod_gen
+import src.models.appointments as mod_app
+from src.services.appointments import OutsideWorkingTime, SlotTaken, book_appointment
 from src.services.general import prepare_pagination_link
+from src.services.emails import wake_outbox_worker
 from src.services.patients import notify_cancel_visit
+from src.services.middleware import TracedRoute
 
-router = APIRouter(tags=['appointments'], dependencies=[Depends(auth.validate_token)])
+router = APIRouter(tags=['appointments'], route_class=TracedRoute, dependencies=[Depends(auth.validate_token)])
 AsyncSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_async_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_read_session)]
+
+FromQuery = Annotated[NaiveDatetime, Query(alias='from', description='Inclusive start of range.')]
+ToQuery = Annotated[NaiveDatetime, Query(description='Exclusive end of range.')]
+
+
+@router.post('/appointments', status_code=status.HTTP_201_CREATED, response_model=mod_app.AppointmentLocation)
+async def add_appointment(appointment: mod_app.Appointment, session: AsyncSessionDep, response: Response):
+    """Book visit, 409 when specialist or patient has other visit at this time."""
+    async with session.begin():
+        try:
+            new_appointment = await book_appointment(appointment.model_dump(), session)
+        except OutsideWorkingTime as error:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+        except SlotTaken as error:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+        except IntegrityError:
+            raise HTTPException(status_code=400, detail='introduced data violate database constraints.')
+    new_appointment.location = f'/appointments/{new_appointment.id}'
+    response.headers['Location'] = new_appointment.location
+    return new_appointment
 
 
 @router.delete('/appointments/{appointment_id}', status_code=status.HTTP_204_NO_CONTENT)
-async def cancel_appointment(appointment_id: UUID, session: AsyncSessionDep, background_task: BackgroundTasks):
+async def cancel_appointment(appointment_id: UUID, session: AsyncSessionDep):
     async with session.begin():
         data_access = dal_appointments.Appointments(session)
         deleted_rows, visit_data = await data_access.delete(appointment_id)
-    if deleted_rows == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    patient_id = visit_data.patient_id
-    visit_start = visit_data.start
-    background_task.add_task(notify_cancel_visit, patient_id, visit_start, session)
+        if deleted_rows == 0:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        await notify_cancel_visit(visit_data.id, visit_data.patient_id, visit_data.start, session)
+    wake_outbox_worker()
+
 
+@router.get('/appointments', status_code=status.HTTP_200_OK, response_model=list[mod_app.AppointmentLocation])
+async def get_appointments(session: ReadSessionDep, pagination: mod_gen.pagination_dependency, from_: FromQuery,
+                           to: ToQuery, response: Response, specialist_id: Optional[UUID] = None)\
+        -> Sequence[db_mod_pat.Appointments]:
+    """Appointments starting from from (inclusive) to to (exclusive), ordered by start.
 
-@router.get('/appointments')
-async def get_appointments(session: AsyncSessionDep, pagination: mod_gen.pagination_dependency,
-                           specialist_id: UUID, start, end, response):
+    Only monthly partitions overlapping the range are read, day of specialist is read from one partition.
+    """
+    if from_ >= to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='from must be before to.')
     async with session.begin():
         data_access = dal_appointments.Appointments(session)
-        appointments, appointments_number = await data_access.get_many(pagination, specialist_id, start, end)
+        appointments_page = await data_access.get_many(pagination, specialist_id, from_, to)
+    appointments = appointments_page.rows
     if not appointments:
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
     for appointment in appointments:
         appointment.location = f'/appointments/{appointment.id}'
-    link_base = '<appointments?page-number={0}&page-size={1}>; {2}'
-    links = prepare_pagination_link(link_base, pagination, appointments_number)
+    filters = {'from': from_.isoformat(), 'to': to.isoformat()}
+    if specialist_id is not None:
+        filters['specialist_id'] = str(specialist_id)
+    link_base = f'<appointments?{urlencode(filters)}&{{0}}&page_size={{1}}>; {{2}}'
+    links = prepare_pagination_link(link_base, pagination, appointments_page)
+    if appointments_page.rows_number is not None:
+        response.headers['X-Total-Count'] = str(appointments_page.rows_number)
     response.headers['Link'] = links
     return appointments
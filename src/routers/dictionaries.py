@@ -8,7 +8,8 @@ import src.services.authentication as auth
 import src.data_access_layer.dictionaries as dal_dict
 import src.data_access_layer.general as dal_gen
 import src.models.dictionaries as mod_dict
-from src.services.general import prepare_value_object, add_modification_info
+from src.services.general import prepare_value_object, add_modification_info, etag_matches
+from src.services.middleware import TracedRoute
 
 
 def get_dictionary(dictionary_name: str, request: Request):
@@ -19,8 +20,10 @@ def get_dictionary(dictionary_name: str, request: Request):
         request.state.dictionary = db_dictionary
 
 
+# Reads stay on primary too, snapshot loaded from lagging replica would be served until next change of dictionary
 AsyncSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_async_session)]
-router = APIRouter(tags=['dictionaries'], dependencies=[Depends(auth.validate_token), Depends(get_dictionary)])
+router = APIRouter(tags=['dictionaries'], route_class=TracedRoute,
+                   dependencies=[Depends(auth.validate_token), Depends(get_dictionary)])
 
 
 @router.post('/dictionaries/{dictionary_name}/{row_id}', status_code=status.HTTP_201_CREATED,
@@ -45,17 +48,18 @@ async def add_row(row_id: Annotated[int, Path(gt=0)], dictionary_name: str, dict
 
 @router.get('/dictionaries/{dictionary_name}', status_code=status.HTTP_200_OK,
             response_model=Sequence[mod_dict.RowLocation])
-async def get_rows(dictionary_name: str, session: AsyncSessionDep, request: Request, is_active: Optional[bool] = None)\
-                   -> Sequence[dal_dict.DbDictionary]:
+async def get_rows(dictionary_name: str, session: AsyncSessionDep, request: Request, response: Response,
+                   is_active: Optional[bool] = None) -> Sequence[dict[str, Any]] | Response:
     db_dictionary = request.state.dictionary
     async with session.begin():
         data_access = dal_dict.Dictionaries(session)
+        snapshot = await data_access.get_snapshot(db_dictionary)
+        if etag_matches(request.headers.get('If-None-Match', ''), snapshot.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': snapshot.etag})
         dictionary_rows = await data_access.get_rows(db_dictionary, is_active)
-    if dictionary_rows is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    for row in dictionary_rows:
-        row.location = f'/dictionaries/{dictionary_name}/{row.id}'
-    return dictionary_rows
+    response.headers['ETag'] = snapshot.etag
+    # Rows are shared by snapshot, so location is added to copies
+    return [{**row._asdict(), 'location': f'/dictionaries/{dictionary_name}/{row.id}'} for row in dictionary_rows]
 
 
 @router.delete('/dictionaries/{dictionary_name}/{row_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -69,7 +73,7 @@ async def delete_row(row_id: int, session: AsyncSessionDep, request: Request) ->
         else:
             if dictionary_row.is_system_value:
                 message = 'Can not remove system value contact with developer team to make changes in application.'
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST(message))
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
             else:
                 await data_access.delete_row(db_dictionary, row_id)
 
@@ -2,27 +2,33 @@ from typing import Annotated, Any, Sequence
 from uuid import UUID
 
 import src.database.models.employees
-from fastapi import APIRouter, status, Depends, HTTPException, Response, Request
+from fastapi import APIRouter, status, Depends, HTTPException, Response, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 import src.services.authentication as auth
+from src.services.query_tracer import set_query_budget
 import src.data_access_layer.employees as dal_employees
 import src.data_access_layer.general as dal_gen
 import src.models.employees as mod_emp
 import src.models.general as mod_gen
 from src.services.general import prepare_new_user, prepare_pagination_link, add_modification_info
+from src.services.imports import get_import_format, iterate_records, import_employees
+from src.services.exports import ExportFormat, EXPORT_MEDIA_TYPES, accepts_gzip, export_employees
+from src.services.middleware import TracedRoute
 
-router = APIRouter(tags=['employees'], dependencies=[Depends(auth.validate_token)])
+router = APIRouter(tags=['employees'], route_class=TracedRoute, dependencies=[Depends(auth.validate_token)])
 AsyncSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_async_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_read_session)]
 
 
 @router.post('/employees', status_code=status.HTTP_201_CREATED, response_model=mod_emp.Employee)
 async def add_employee(employee: mod_emp.NewEmployee, session: AsyncSessionDep, response: Response, request: Request)\
-                       -> src.databases.models.employees.Employees:
+                       -> src.database.models.employees.Employees:
     employee: dict[str, Any] = employee.model_dump()
     user_id = request.state.token.id
-    employee = prepare_new_user(employee, user_id)
+    employee = await prepare_new_user(employee, user_id)
     async with session.begin():
         employee_data_access = dal_employees.Employees(session)
         try:
@@ -34,26 +40,57 @@ async def add_employee(employee: mod_emp.NewEmployee, session: AsyncSessionDep,
     return new_employee
 
 
+@router.post('/employees/import', status_code=status.HTTP_200_OK, response_model=mod_gen.ImportReport)
+async def import_employees_rows(session: AsyncSessionDep, request: Request) -> dict[str, Any]:
+    """Add employees from NDJSON or CSV body, rows violating constraints are skipped and listed in errors."""
+    import_format = get_import_format(request.headers.get('Content-Type'))
+    if import_format is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail='Send application/x-ndjson or text/csv.')
+    set_query_budget(0)  # Statements grow with number of uploaded rows
+    user_id = request.state.token.id
+    records = iterate_records(request.stream(), import_format)
+    async with session.begin():
+        import_report = await import_employees(records, user_id, session)
+    return import_report
+
+
 @router.get("/employees", status_code=status.HTTP_200_OK, response_model=list[mod_emp.EmployeeLocation])
-async def get_employees(session: AsyncSessionDep, pagination: mod_gen.pagination_dependency, response: Response)\
-                        -> Sequence[src.databases.models.employees.Employees]:
+async def get_employees(session: ReadSessionDep, pagination: mod_gen.pagination_dependency, response: Response)\
+                        -> Sequence[src.database.models.employees.Employees]:
     async with session.begin():
         data_access = dal_employees.Employees(session)
-        employees, employees_number = await data_access.get_many(pagination)
+        employees_page = await data_access.get_many(pagination)
+    employees = employees_page.rows
     if not employees:
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
     for employee in employees:
         employee.location = f'/employees/{employee.id}'
-    link_base = '<employees?page-number={0}&page-size={1}>; {2}'
-    links = prepare_pagination_link(link_base, pagination, employees_number)
+    link_base = '<employees?{0}&page_size={1}>; {2}'
+    links = prepare_pagination_link(link_base, pagination, employees_page)
+    if employees_page.rows_number is not None:
+        response.headers['X-Total-Count'] = str(employees_page.rows_number)
     response.headers["Link"] = links
     return employees
 
 
+@router.get('/employees/export', status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_all_employees(request: Request,
+                               export_format: Annotated[ExportFormat, Query(alias='format')] = 'ndjson')\
+        -> StreamingResponse:
+    """All employees streamed by server side cursor, gzip compressed when client accepts it."""
+    compress = accepts_gzip(request.headers.get('Accept-Encoding'))
+    headers = {'Content-Disposition': f'attachment; filename="employees.{export_format}"', 'Vary': 'Accept-Encoding'}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(export_employees(export_format, compress), media_type=EXPORT_MEDIA_TYPES[export_format],
+                             headers=headers)
+
+
 @router.patch("/employees/{employee_id}", status_code=status.HTTP_200_OK,
               response_model=mod_emp.EmployeeUpdate)
 async def update_employee(employee_id: UUID, employee_update: mod_emp.EmployeeUpdate, session: AsyncSessionDep,
-                          request: Request) -> src.databases.models.employees.Employees:
+                          request: Request) -> src.database.models.employees.Employees:
     employee_update: dict[str, Any] = employee_update.model_dump(exclude_none=True)
     user_id = request.state.token.id
     employee_update = add_modification_info(employee_update, user_id)
@@ -0,0 +1,57 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, status, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import src.data_access_layer.general as dal_gen
+import src.database.relational as db_rel
+import src.models.internal as mod_int
+import src.services.authentication as auth
+import src.services.maintenance as maintenance
+import src.services.profiling as profiling
+from src.services.startup import startup_report
+from src.services.middleware import TracedRoute
+
+router = APIRouter(tags=['internal'], route_class=TracedRoute,
+                   dependencies=[Depends(auth.validate_token), Depends(auth.validate_administrator)])
+AsyncSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_async_session)]
+
+
+@router.get('/internal/pool', status_code=status.HTTP_200_OK, response_model=dict[str, mod_int.PoolStatus])
+async def get_pool_status():
+    pools_status = {'primary': db_rel.get_pool_status(db_rel.async_engine)}
+    if db_rel.replica_async_engine is not None:
+        pools_status['replica'] = db_rel.get_pool_status(db_rel.replica_async_engine)
+    return pools_status
+
+
+@router.get('/internal/startup', status_code=status.HTTP_200_OK, response_model=mod_int.StartupReport)
+async def get_startup_report():
+    """Durations of startup phases of this worker."""
+    return startup_report.to_dict()
+
+
+@router.get('/internal/appointments/partitions', status_code=status.HTTP_200_OK,
+            response_model=list[mod_int.Partition])
+async def get_appointments_partitions(session: AsyncSessionDep):
+    async with session.begin():
+        return await maintenance.get_appointments_partitions(session)
+
+
+@router.get('/internal/profiles', status_code=status.HTTP_200_OK, response_model=list[mod_int.Profile])
+async def get_profiles():
+    """Profiles of requests sent with X-Profile header, newest first."""
+    return await profiling.list_profiles()
+
+
+@router.get('/internal/profiles/{profile_id}', status_code=status.HTTP_200_OK, response_class=FileResponse)
+async def get_profile(profile_id: str, format_: Annotated[Literal['pstats', 'text'], Query(alias='format')] = 'pstats',
+                      limit: Annotated[int, Query(ge=1, le=1_000)] = 50):
+    """Profile in pstats format, for pstats module or snakeviz, or text with functions of highest cumulative time."""
+    profile_path = profiling.get_profile_path(profile_id)
+    if profile_path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if format_ == 'text':
+        return PlainTextResponse(await profiling.summarize_profile(profile_path, limit))
+    return FileResponse(profile_path, media_type='application/octet-stream', filename=profile_path.name)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from src.services.metrics import render_metrics
+
+router = APIRouter(tags=['metrics'])
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@router.get('/metrics', status_code=status.HTTP_200_OK, response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """Metrics for Prometheus scraping, not authenticated, it should be reachable from internal network only."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,25 +1,44 @@
+import json
 from uuid import UUID
 from typing import Annotated, Sequence, Any
 
 import src.database.models.patients
-from fastapi import APIRouter, status, Depends, HTTPException, Response
+from fastapi import APIRouter, status, Depends, HTTPException, Response, Request, Query
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 import src.services.authentication as auth
+from src.services.query_tracer import set_query_budget
 from src.services.general import prepare_pagination_link, prepare_new_patient
+from src.services.imports import get_import_format, iterate_records, register_patients
+from src.services.exports import ExportFormat, EXPORT_MEDIA_TYPES, accepts_gzip, export_patients
+from src.services.middleware import TracedRoute
 import src.data_access_layer.patients as dal_pat
 import src.data_access_layer.general as dal_gen
 import src.models.patients as mod_pat
 import src.models.general as mod_gen
 
-router = APIRouter(tags=['patients'], dependencies=[Depends(auth.validate_token)])
+router = APIRouter(tags=['patients'], route_class=TracedRoute, dependencies=[Depends(auth.validate_token)])
 
 AsyncSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_async_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_read_session)]
+
+
+class UploadResultsResponse(StreamingResponse):
+    """Streamed response sent while request body is still read by its iterator.
+
+    StreamingResponse listens for disconnect by receive, which would take chunks of body from the iterator.
+    Disconnected client is noticed by failed send instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.stream_response(send)
 
 
 @router.patch('/verify/patients/{patient_id}', status_code=status.HTTP_200_OK, response_model=mod_pat.Patient)
-async def verify_patient(patient_id: UUID, session: AsyncSessionDep) -> src.databases.models.patients.Patients:
+async def verify_patient(patient_id: UUID, session: AsyncSessionDep) -> src.database.models.patients.Patients:
     async with session.begin():
         patient_data_access = dal_pat.Patients(session)
         patient = await patient_data_access.update(patient_id, {'is_verified': True})
@@ -30,26 +49,30 @@ async def verify_patient(patient_id: UUID, session: AsyncSessionDep) -> src.data
 
 
 @router.get('/patients', status_code=status.HTTP_200_OK, response_model=list[mod_pat.PatientLocation])
-async def get_patients(session: AsyncSessionDep, pagination: mod_gen.pagination_dependency, response: Response)\
-                        -> Sequence[src.databases.models.patients.Patients]:
+async def get_patients(session: ReadSessionDep, pagination: mod_gen.estimated_pagination_dependency,
+                       response: Response)\
+                        -> Sequence[src.database.models.patients.Patients]:
     async with session.begin():
         data_access = dal_pat.Patients(session)
-        patients, patients_number = await data_access.get_many(pagination)
+        patients_page = await data_access.get_many(pagination)
+    patients = patients_page.rows
     if not patients:
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
     for patient in patients:
         patient.location = f'/patients/{patient.id}'
-    link_base = '<patients?page-number={0}&page-size={1}>; {2}'
-    links = prepare_pagination_link(link_base, pagination, patients_number)
+    link_base = '<patients?{0}&page_size={1}>; {2}'
+    links = prepare_pagination_link(link_base, pagination, patients_page)
+    if patients_page.rows_number is not None:
+        response.headers['X-Total-Count'] = str(patients_page.rows_number)
     response.headers['Link'] = links
     return patients
 
 
 @router.post('/patients', status_code=status.HTTP_201_CREATED, response_model=mod_pat.PatientPassword)
 async def add_patient(patient: mod_pat.Patient, session: AsyncSessionDep, response: Response) \
-                      -> src.databases.models.patients.Patients:
+                      -> src.database.models.patients.Patients:
     patient: dict[str, Any] = patient.model_dump()
-    patient, password = prepare_new_patient(patient)
+    patient, password = await prepare_new_patient(patient)
     async with session.begin():
         patient_data_access = dal_pat.Patients(session)
         try:
@@ -60,3 +83,39 @@ async def add_patient(patient: mod_pat.Patient, session: AsyncSessionDep, respon
     response.headers['Location'] = f'/patients/{patient_id}'
     new_patient.password = password
     return new_patient
+
+
+@router.post('/patients/bulk', status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def register_patients_rows(request: Request) -> StreamingResponse:
+    """Register patients from NDJSON or CSV body, streams NDJSON with result of every row in the same order.
+
+    Results of batch are sent when it is committed, so passwords are only in memory of one batch. Upload is read while
+    response is sent, clients which don't read response before finishing request get results after the upload.
+    """
+    import_format = get_import_format(request.headers.get('Content-Type'))
+    if import_format is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail='Send application/x-ndjson or text/csv.')
+    set_query_budget(0)  # Statements grow with number of uploaded rows
+    records = iterate_records(request.stream(), import_format)
+
+    async def stream_results():
+        # Own session, session dependency is closed before streamed response is sent
+        async with dal_gen.create_relational_async_session() as session:
+            async for result in register_patients(records, session):
+                yield json.dumps(result) + '\n'
+
+    return UploadResultsResponse(stream_results(), media_type='application/x-ndjson')
+
+
+@router.get('/patients/export', status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_all_patients(request: Request,
+                              export_format: Annotated[ExportFormat, Query(alias='format')] = 'ndjson')\
+        -> StreamingResponse:
+    """All patients streamed by server side cursor, gzip compressed when client accepts it."""
+    compress = accepts_gzip(request.headers.get('Accept-Encoding'))
+    headers = {'Content-Disposition': f'attachment; filename="patients.{export_format}"', 'Vary': 'Accept-Encoding'}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(export_patients(export_format, compress), media_type=EXPORT_MEDIA_TYPES[export_format],
+                             headers=headers)
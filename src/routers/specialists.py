@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, status, Depends, HTTPException, Query
+from pydantic import NaiveDatetime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import src.services.authentication as auth
+import src.data_access_layer.general as dal_gen
+import src.models.specialists as mod_spec
+from src.data_access_layer.appointments import Appointments
+from src.data_access_layer.specialists import Specialists
+from src.services.availability import get_availability, get_first_free_slot
+from src.services.emails import wake_outbox_worker
+from src.services.patients import notify_cancel_visits
+from src.services.middleware import TracedRoute
+
+router = APIRouter(tags=['specialists'], route_class=TracedRoute, dependencies=[Depends(auth.validate_token)])
+AsyncSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_async_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(dal_gen.get_relational_read_session)]
+
+MAX_AVAILABILITY_RANGE = timedelta(days=92)
+
+FromQuery = Annotated[NaiveDatetime, Query(alias='from', description='Inclusive start of range.')]
+ToQuery = Annotated[NaiveDatetime, Query(description='Exclusive end of range.')]
+DurationQuery = Annotated[int, Query(gt=0, le=24 * 60, description='Visit duration in minutes.')]
+
+
+def validate_range(start: datetime, end: datetime):
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='from must be before to.')
+    if end - start > MAX_AVAILABILITY_RANGE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f'Range can\'t be longer than {MAX_AVAILABILITY_RANGE.days} days.')
+
+
+@router.get('/specialists/first-free-slot', status_code=status.HTTP_200_OK, response_model=mod_spec.FreeSlot)
+async def get_specialists_first_free_slot(role_id: int, from_: FromQuery, to: ToQuery, duration: DurationQuery,
+                                          session: ReadSessionDep) -> dict:
+    """Earliest free visit with any specialist of role, like first free cardiologist."""
+    validate_range(from_, to)
+    async with session.begin():
+        free_slot = await get_first_free_slot(role_id, from_, to, duration, session)
+    if free_slot is None:
+        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
+    specialist_id, start, end = free_slot
+    return {'specialist_id': specialist_id, 'start': start, 'end': end}
+
+
+@router.get('/specialists/{specialist_id}/availability', status_code=status.HTTP_200_OK,
+            response_model=mod_spec.Availability)
+async def get_specialist_availability(specialist_id: UUID, from_: FromQuery, to: ToQuery, duration: DurationQuery,
+                                      session: ReadSessionDep) -> dict:
+    validate_range(from_, to)
+    async with session.begin():
+        if not await Specialists(session).exists(specialist_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        free_windows = await get_availability(specialist_id, from_, to, duration, session)
+    return {'specialist_id': specialist_id, 'duration': duration,
+            'free_windows': [{'start': start, 'end': end} for start, end in free_windows]}
+
+
+@router.post('/specialists/{specialist_id}/cancel-range', status_code=status.HTTP_200_OK,
+             response_model=mod_spec.CancelledAppointments)
+async def cancel_specialist_appointments(specialist_id: UUID, cancel_range: mod_spec.CancelRange,
+                                         session: AsyncSessionDep) -> dict:
+    """Cancel all visits of specialist starting in range, like when doctor calls in sick.
+
+    Visits are deleted by one statement and patients are notified by one batch, whatever number of visits.
+    Lock of specialist waits for bookings in progress, so none of them is added to the range after deletion.
+    """
+    validate_range(cancel_range.from_, cancel_range.to)
+    async with session.begin():
+        data_access = Specialists(session)
+        if not await data_access.exists(specialist_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        await data_access.lock(specialist_id)
+        cancelled_visits = await Appointments(session).delete_range(specialist_id, cancel_range.from_, cancel_range.to)
+        if cancelled_visits:
+            await notify_cancel_visits(cancelled_visits, session)
+    wake_outbox_worker()
+    return {'cancelled': len(cancelled_visits)}
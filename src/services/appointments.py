@@ -0,0 +1,56 @@
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.data_access_layer.appointments import Appointments
+from src.data_access_layer.specialists import Specialists
+from src.database.models.patients import Appointments as AppointmentsTable
+from src.services.availability import get_working_intervals, merge_intervals, subtract_intervals
+from src.tracing import traced
+
+UNIQUE_VIOLATION = '23505'
+
+
+class OutsideWorkingTime(Exception):
+    pass
+
+
+class SlotTaken(Exception):
+    pass
+
+
+@traced()
+async def book_appointment(appointment: dict[str, Any], session: AsyncSession) -> AppointmentsTable:
+    """Add appointment in current transaction of session, when it fits working time of specialist and is free.
+
+    Bookings of the same specialist or patient wait for each other on advisory locks, others are booked in parallel.
+    Partitioned table can't have exclusion constraint, so overlaps are checked under the locks.
+    """
+    specialist_id, start, end = appointment['specialist_id'], appointment['start'], appointment['end']
+    duration = (end - start) / timedelta(minutes=1)
+    if not duration.is_integer():
+        raise OutsideWorkingTime('Visit duration has to be whole minutes.')
+    data_access = Specialists(session)
+    await data_access.lock(specialist_id)
+    working_times = await data_access.get_working_times([specialist_id])
+    breaks = await data_access.get_breaks([specialist_id], start, end)
+    working_intervals = subtract_intervals(get_working_intervals(working_times, start, end, int(duration)),
+                                           merge_intervals((break_start, break_end)
+                                                           for _, break_start, break_end in breaks))
+    if working_intervals != [(start, end)]:
+        raise OutsideWorkingTime('Specialist doesn\'t accept this visit at this time.')
+    if await data_access.get_appointments([specialist_id], start, end):
+        raise SlotTaken('Specialist has other visit at this time.')
+    appointments_access = Appointments(session)
+    await appointments_access.lock_patient(appointment['patient_id'])  # Always after specialist, so no deadlock
+    if await appointments_access.get_patient_appointments(appointment['patient_id'], start, end):
+        raise SlotTaken('Patient has other visit at this time.')
+    try:
+        async with session.begin_nested():
+            return await appointments_access.add(appointment)
+    except IntegrityError as error:
+        if getattr(error.orig, 'sqlstate', None) == UNIQUE_VIOLATION:  # Patient has other visit at the same start
+            raise SlotTaken('Patient has other visit at this time.')
+        raise
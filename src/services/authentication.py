@@ -1,3 +1,5 @@
+import os
+from datetime import datetime
 from uuid import UUID
 from typing import Annotated
 
@@ -5,34 +7,142 @@ from fastapi import Depends, status, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.data_access_layer.employees import Employees, EmployeesTokens
-from src.data_access_layer.general import get_relational_async_session
-from src.services.security import verify_password, generate_token, get_expiration_date
+from src.data_access_layer.employees import Employees, EmployeesTokens, EmployeesRevokedTokens, TokenData
+from src.data_access_layer.general import get_relational_async_session, create_relational_async_session
+from src.data_access_layer.invalidation import register_invalidator
+import src.services.hashing as hashing
+from src.services.security import (generate_token, get_expiration_date, generate_token_id, generate_signed_token,
+                                   decode_signed_token, needs_rehash)
+from src.tracing import traced
 
 Token = Annotated[str, Depends(OAuth2PasswordBearer(tokenUrl='/employees/login'))]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_relational_async_session)]
 
+# database - random tokens checked in employees_access_tokens, signed - HMAC signed tokens checked in process
+ACCESS_TOKENS_MODE = os.environ.get('ACCESS_TOKENS_MODE', 'database').lower()
+if ACCESS_TOKENS_MODE not in ('database', 'signed'):
+    raise Exception('Invalid access tokens mode config!')
+REVOKED_TOKENS_REFRESH_INTERVAL = float(os.environ.get('REVOKED_TOKENS_REFRESH_INTERVAL', 30))
 
-async def authenticate(email: str, password: str, session: AsyncSession) -> tuple[int, int] | None:
-    data_access = Employees(session)
-    employee = await data_access.get_by_email(email)
-    if verify_password(password, employee.hashed_password):
-        return employee.id, employee.role_id
+ADMINISTRATOR_ROLE_ID = 1
+
+
+class RevocationList:
+    """Identifiers of revoked signed tokens, reloaded periodically from employees_revoked_tokens."""
+
+    def __init__(self):
+        self.__revoked: dict[str, datetime] = {}
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self.__revoked
+
+    def add(self, token_id: str, expiration_date: datetime):
+        self.__revoked[token_id] = expiration_date
+
+    async def refresh(self):
+        async with create_relational_async_session() as session, session.begin():
+            data_access = EmployeesRevokedTokens(session)
+            revoked_tokens = await data_access.get_active()
+        self.__revoked = {token.token_id: token.expiration_date for token in revoked_tokens}
+
+
+revocation_list = RevocationList()
+
+
+def _revoke_in_other_worker(token_id: str | None):
+    if token_id is not None:  # Real expiration date is loaded on next refresh
+        revocation_list.add(token_id, datetime.max)
+
+
+register_invalidator('revoked_tokens', _revoke_in_other_worker)
+
+
+@traced()
+async def authenticate(email: str, password: str, session: AsyncSession) -> tuple[UUID, int] | None:
+    """Id and role of employee with valid password, hash of older algorithm or parameters is replaced.
+
+    Password is hashed outside of transactions, session not bound to connection doesn't hold one meanwhile.
+    """
+    async with session.begin():
+        employee = await Employees(session).get_by_email(email)
+    if employee is None:
+        await hashing.verify_dummy_password(password)  # Response time doesn't tell whether email is registered
+        return None
+    if not await hashing.verify_password(password, employee.hashed_password):
+        return None
+    if needs_rehash(employee.hashed_password):
+        hashed_password = await hashing.hash_password(password)
+        async with session.begin():
+            await Employees(session).update(employee.id, {'hashed_password': hashed_password})
+    return employee.id, employee.role_id
 
 
 async def add_token(id_: UUID, role_id: int, session: AsyncSession) -> str:
+    expiration_date = get_expiration_date()
+    if ACCESS_TOKENS_MODE == 'signed':
+        claims = {'sub': str(id_), 'role': role_id, 'exp': int(expiration_date.timestamp()),
+                  'jti': generate_token_id()}
+        return generate_signed_token(claims)
     data_access = EmployeesTokens(session)
     new_token = generate_token()
-    expiration_date = get_expiration_date()
     token_data = {'id': id_, 'access_token': new_token, 'role_id': role_id, 'expiration_date': expiration_date}
     await data_access.add(token_data)
     return new_token
 
 
-async def validate_token(token: Token, request: Request):
-    session = get_relational_async_session()
+def verify_signed_token(token: str) -> TokenData | None:
+    claims = decode_signed_token(token)
+    if claims is None or claims['jti'] in revocation_list:
+        return None
+    return TokenData(UUID(claims['sub']), claims['role'], datetime.fromtimestamp(claims['exp']))
+
+
+async def check_token(token: str, session: AsyncSession) -> TokenData | None:
+    if ACCESS_TOKENS_MODE == 'signed':
+        return verify_signed_token(token)
     async with session.begin():
         data_access = EmployeesTokens(session)
-        token_data = await data_access.check(token)
+        return await data_access.check(token)
+
+
+async def validate_token(token: Token, request: Request, session: AsyncSessionDep):
+    token_data = await check_token(token, session)
     if token_data is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     request.state.token = token_data
+
+
+async def validate_administrator(request: Request):
+    """Use after validate_token."""
+    if request.state.token.role_id != ADMINISTRATOR_ROLE_ID:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+
+async def is_administrator_token(token: str) -> bool:
+    """Check outside of dependencies, like in middleware, session is opened only in database tokens mode."""
+    if ACCESS_TOKENS_MODE == 'signed':
+        token_data = verify_signed_token(token)
+    else:
+        async with create_relational_async_session() as session:
+            token_data = await check_token(token, session)
+    return token_data is not None and token_data.role_id == ADMINISTRATOR_ROLE_ID
+
+
+async def revoke_token(token: str, session: AsyncSession):
+    if ACCESS_TOKENS_MODE == 'signed':
+        claims = decode_signed_token(token)
+        if claims is not None:  # Token expired since it was validated isn't accepted anyway
+            revoked_token = {'token_id': claims['jti'], 'expiration_date': datetime.fromtimestamp(claims['exp'])}
+            await EmployeesRevokedTokens(session).add(revoked_token)
+    else:
+        await EmployeesTokens(session).delete(token)
+
+
+def forget_token(token: str):
+    """Stop accepting revoked token in this process, call it after revoking transaction is committed."""
+    if ACCESS_TOKENS_MODE == 'signed':
+        claims = decode_signed_token(token)
+        if claims is not None:
+            revocation_list.add(claims['jti'], datetime.fromtimestamp(claims['exp']))
+    else:
+        EmployeesTokens.evict(token)
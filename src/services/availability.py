@@ -0,0 +1,110 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, Sequence
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.data_access_layer.specialists import Specialists
+from src.database.models.employees import SpecialistsWorkingTime
+
+Interval = tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> list[Interval]:
+    """Sorted, not overlapping union of intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals: Sequence[Interval], busy: Sequence[Interval]) -> list[Interval]:
+    """Parts of sorted, disjoint intervals not covered by sorted, merged busy intervals, in one linear sweep."""
+    free = []
+    busy_index = 0
+    for start, end in intervals:
+        while busy_index < len(busy) and busy[busy_index][1] <= start:
+            busy_index += 1
+        cursor = start
+        index = busy_index
+        while index < len(busy) and busy[index][0] < end:
+            busy_start, busy_end = busy[index]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            index += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
+def get_working_intervals(working_times: Sequence[SpecialistsWorkingTime], start: datetime, end: datetime,
+                          duration: int) -> list[Interval]:
+    """Working hours without weekly break between start and end, on days accepting visits of duration minutes."""
+    working_times_by_day = {working_time.day_of_week_id: working_time for working_time in working_times
+                            if not working_time.accepted_visit_duration
+                            or duration in working_time.accepted_visit_duration}
+    intervals = []
+    day = start.date()
+    while day < end.date() + timedelta(days=1):
+        working_time = working_times_by_day.get(day.isoweekday())
+        if working_time is not None:
+            day_intervals = [(datetime.combine(day, working_time.work_start),
+                              datetime.combine(day, working_time.work_end))]
+            if working_time.work_break_start is not None and working_time.work_break_end is not None:
+                work_break = (datetime.combine(day, working_time.work_break_start),
+                              datetime.combine(day, working_time.work_break_end))
+                day_intervals = subtract_intervals(day_intervals, [work_break])
+            intervals.extend(day_intervals)
+        day += timedelta(days=1)
+    return [(max(interval_start, start), min(interval_end, end)) for interval_start, interval_end in intervals
+            if interval_start < end and interval_end > start]
+
+
+def get_free_windows(working_times: Sequence[SpecialistsWorkingTime], busy: Iterable[Interval], start: datetime,
+                     end: datetime, duration: int) -> list[Interval]:
+    """Free time between start and end, long enough for visit of duration minutes."""
+    working_intervals = get_working_intervals(working_times, start, end, duration)
+    free = subtract_intervals(working_intervals, merge_intervals(busy))
+    visit_duration = timedelta(minutes=duration)
+    return [(free_start, free_end) for free_start, free_end in free if free_end - free_start >= visit_duration]
+
+
+async def _get_free_windows_by_specialists(specialists_ids: Sequence[UUID], start: datetime, end: datetime,
+                                           duration: int, session: AsyncSession) -> dict[UUID, list[Interval]]:
+    data_access = Specialists(session)
+    working_times = defaultdict(list)
+    for working_time in await data_access.get_working_times(specialists_ids):
+        working_times[working_time.specialist_id].append(working_time)
+    busy = defaultdict(list)
+    for specialist_id, busy_start, busy_end in await data_access.get_breaks(specialists_ids, start, end):
+        busy[specialist_id].append((busy_start, busy_end))
+    for specialist_id, busy_start, busy_end in await data_access.get_appointments(specialists_ids, start, end):
+        busy[specialist_id].append((busy_start, busy_end))
+    return {specialist_id: get_free_windows(working_times[specialist_id], busy[specialist_id], start, end, duration)
+            for specialist_id in specialists_ids}
+
+
+async def get_availability(specialist_id: UUID, start: datetime, end: datetime, duration: int,
+                           session: AsyncSession) -> list[Interval]:
+    free_windows = await _get_free_windows_by_specialists([specialist_id], start, end, duration, session)
+    return free_windows[specialist_id]
+
+
+async def get_first_free_slot(role_id: int, start: datetime, end: datetime, duration: int,
+                              session: AsyncSession) -> tuple[UUID, datetime, datetime] | None:
+    """Earliest visit of duration minutes with any specialist of role, as specialist id, start and end."""
+    specialists_ids = await Specialists(session).get_ids_by_role(role_id)
+    if not specialists_ids:
+        return None
+    free_windows = await _get_free_windows_by_specialists(specialists_ids, start, end, duration, session)
+    first_windows = [(windows[0][0], specialist_id) for specialist_id, windows in free_windows.items() if windows]
+    if not first_windows:
+        return None
+    slot_start, specialist_id = min(first_windows)
+    return specialist_id, slot_start, slot_start + timedelta(minutes=duration)
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import src.tracing as tracing
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(job: Callable[[], Awaitable[None]], interval_in_seconds: float, traced: bool = True):
+    """Every run of traced job is one trace, with spans of its data access methods and queries as children."""
+    while True:
+        await asyncio.sleep(interval_in_seconds)
+        try:
+            if traced:
+                with tracing.span(job.__qualname__, 'background'):
+                    await job()
+            else:
+                await job()
+        except Exception:
+            logger.exception('Periodic job %s failed.', job.__qualname__)
+
+
+def start_periodically(job: Callable[[], Awaitable[None]], interval_in_seconds: float,
+                       traced: bool = True) -> asyncio.Task:
+    return asyncio.create_task(run_periodically(job, interval_in_seconds, traced), name=job.__qualname__)
+
+
+async def stop_tasks(tasks: list[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
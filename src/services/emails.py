@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+from datetime import timedelta
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from src.data_access_layer.general import create_relational_async_session
+from src.data_access_layer.outbox import EmailsOutbox
+from src.database.models.patients import EmailsOutbox as EmailsOutboxTable
+import src.tracing as tracing
+
+logger = logging.getLogger(__name__)
+
+# Defaults send through Gmail, local stand-in like aiosmtpd needs SMTP_HOST, SMTP_PORT, SMTP_TLS=none, SMTP_AUTH=false
+SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 465))
+SMTP_TLS = os.environ.get('SMTP_TLS', 'implicit')  # implicit, starttls or none
+SMTP_AUTH = os.environ.get('SMTP_AUTH', 'true').lower() == 'true'
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME')  # Email from secrets file by default
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+
+EMAILS_OUTBOX_WORKER = os.environ.get('EMAILS_OUTBOX_WORKER', 'true').lower() == 'true'
+EMAILS_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAILS_OUTBOX_BATCH_SIZE', 100))
+EMAILS_OUTBOX_POLL_INTERVAL = float(os.environ.get('EMAILS_OUTBOX_POLL_INTERVAL', 5))
+EMAILS_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAILS_OUTBOX_MAX_ATTEMPTS', 8))
+EMAILS_OUTBOX_RETRY_DELAY = float(os.environ.get('EMAILS_OUTBOX_RETRY_DELAY', 30))  # Doubled after every attempt
+EMAILS_OUTBOX_MAX_RETRY_DELAY = float(os.environ.get('EMAILS_OUTBOX_MAX_RETRY_DELAY', 3_600))
+
+outbox_wakeup = asyncio.Event()
+outbox_wakeup_links: list[dict[str, str]] = []  # Spans of requests which queued emails, linked to sending batch
+
+
+@functools.cache
+def get_email_secrets() -> dict[str, str]:
+    """Email and password of sending account, read when first email is sent."""
+    with open(os.environ['MED_APP_EMAIL_SECRETS_FILE'], 'r') as file:
+        return json.load(file)
+
+
+class Mailer:
+    """One authenticated SMTP connection reused for many emails, opened again when server closes it."""
+
+    def __init__(self):
+        self.smtp: aiosmtplib.SMTP | None = None
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, use_tls=SMTP_TLS == 'implicit',
+                               start_tls=SMTP_TLS == 'starttls', timeout=SMTP_TIMEOUT)
+        await smtp.connect()
+        if SMTP_AUTH:
+            email_secrets = get_email_secrets()
+            await smtp.login(SMTP_USERNAME or email_secrets['email'], email_secrets['password'])
+        self.smtp = smtp
+
+    async def send(self, message: EmailMessage):
+        if self.smtp is None or not self.smtp.is_connected:
+            await self._connect()
+        try:
+            await self.smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:  # Idle connection closed by server
+            await self._connect()
+            await self.smtp.send_message(message)
+
+    async def close(self):
+        smtp, self.smtp = self.smtp, None
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            smtp.close()
+
+
+def wake_outbox_worker():
+    """Send queued emails now instead of after poll interval, call it after commit of transaction queuing them."""
+    link = tracing.current_link()
+    if link is not None and EMAILS_OUTBOX_WORKER:
+        outbox_wakeup_links.append(link)
+    outbox_wakeup.set()
+
+
+def _prepare_message(email: EmailsOutboxTable) -> EmailMessage:
+    sender = get_email_secrets()['email']
+    message = EmailMessage()
+    message['Subject'] = email.subject
+    message['From'] = sender
+    message['To'] = email.recipient
+    # The same for every attempt, receiving server can drop copy sent again after lost confirmation
+    message['Message-ID'] = f"<{email.id}@{sender.rpartition('@')[2] or 'medapp'}>"
+    message.set_content(email.body)
+    return message
+
+
+def _prepare_failure(email: EmailsOutboxTable, error: Exception, permanent: bool = False) -> dict:
+    attempts = email.attempts + 1
+    failed = permanent or attempts >= EMAILS_OUTBOX_MAX_ATTEMPTS
+    retry_delay = min(EMAILS_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), EMAILS_OUTBOX_MAX_RETRY_DELAY)
+    return {'email_id': email.id, 'status': 'failed' if failed else 'pending', 'attempts': attempts,
+            'retry_delay': timedelta(seconds=retry_delay), 'last_error': repr(error)[:1_000]}
+
+
+async def send_outbox_batch(mailer: Mailer) -> bool:
+    """Send one batch of due emails, returns True when batch was full and more emails may be waiting.
+
+    Emails are locked by FOR UPDATE SKIP LOCKED until their status is saved, so many workers send different emails.
+    Tracing span of batch is linked to requests which woke the worker, emails queued by other workers aren't linked.
+    """
+    links = outbox_wakeup_links[:]
+    outbox_wakeup_links.clear()
+    with tracing.span('send_outbox_batch', 'background', links=links) as batch_span:
+        async with create_relational_async_session() as session, session.begin():
+            data_access = EmailsOutbox(session)
+            emails = await data_access.lock_pending(EMAILS_OUTBOX_BATCH_SIZE)
+            sent_ids, failures = [], []
+            connection_failed = False
+            for email in emails:
+                try:
+                    await mailer.send(_prepare_message(email))
+                except aiosmtplib.SMTPResponseException as error:  # Rejected by server, 5xx codes are permanent
+                    failures.append(_prepare_failure(email, error, permanent=error.code >= 500))
+                except aiosmtplib.SMTPRecipientsRefused as error:  # Rejected recipient, raised by send_message
+                    permanent = all(refused.code >= 500 for refused in error.recipients)
+                    failures.append(_prepare_failure(email, error, permanent=permanent))
+                except (aiosmtplib.SMTPException, OSError, TimeoutError) as error:
+                    logger.warning('SMTP connection failed, rest of batch is sent later: %r', error)
+                    failures.append(_prepare_failure(email, error))
+                    connection_failed = True
+                    await mailer.close()
+                    break
+                else:
+                    sent_ids.append(email.id)
+            if sent_ids:
+                await data_access.mark_sent(sent_ids)
+            if failures:
+                await data_access.mark_failed(failures)
+        if batch_span is not None:
+            batch_span.attributes.update({'emails.sent': len(sent_ids), 'emails.failed': len(failures)})
+    if emails:
+        logger.info('Emails outbox sent %s emails, %s failed.', len(sent_ids), len(failures))
+    return len(emails) == EMAILS_OUTBOX_BATCH_SIZE and not connection_failed
+
+
+async def run_outbox_worker():
+    """Drain emails outbox until cancelled, connection is kept open while emails are waiting."""
+    mailer = Mailer()
+    try:
+        while True:
+            try:
+                more_waiting = await send_outbox_batch(mailer)
+            except Exception:
+                logger.exception('Sending emails from outbox failed.')
+                more_waiting = False
+            if more_waiting:
+                continue
+            await mailer.close()
+            try:
+                await asyncio.wait_for(outbox_wakeup.wait(), EMAILS_OUTBOX_POLL_INTERVAL)
+            except TimeoutError:
+                pass
+            outbox_wakeup.clear()
+    finally:
+        if mailer.smtp is not None:
+            mailer.smtp.close()
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Literal, Sequence
+
+import src.data_access_layer.employees as dal_employees
+import src.data_access_layer.patients as dal_pat
+import src.models.employees as mod_emp
+import src.models.patients as mod_pat
+from src.data_access_layer.general import create_relational_async_session
+
+EXPORT_PARTITION_SIZE = int(os.environ.get('EXPORT_PARTITION_SIZE', 1_000))
+
+ExportFormat = Literal['ndjson', 'csv']
+EXPORT_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Passwords hashes are never exported
+EMPLOYEES_EXPORT_COLUMNS = ('id', *mod_emp.Employee.model_fields, 'create_date')
+PATIENTS_EXPORT_COLUMNS = ('id', *mod_pat.Patient.model_fields, 'create_date')
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+def _encode_partition(partition: Sequence[Sequence[Any]], columns: Sequence[str], export_format: ExportFormat) -> bytes:
+    if export_format == 'ndjson':
+        lines = (json.dumps(dict(zip(columns, row)), default=_json_default) for row in partition)
+        return ''.join(f'{line}\n' for line in lines).encode('utf-8')
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(partition)
+    return buffer.getvalue().encode('utf-8')
+
+
+async def _encode(partitions: AsyncIterator[Sequence[Sequence[Any]]], columns: Sequence[str],
+                  export_format: ExportFormat, compress: bool) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits 31 writes gzip header
+    if export_format == 'csv':
+        header = _encode_partition([columns], columns, export_format)
+        yield compressor.compress(header) if compressor else header
+    async for partition in partitions:
+        chunk = _encode_partition(partition, columns, export_format)
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+async def export_employees(export_format: ExportFormat, compress: bool) -> AsyncIterator[bytes]:
+    # Sent after request session is closed, so it uses own session for whole stream
+    async with create_relational_async_session() as session, session.begin():
+        data_access = dal_employees.Employees(session)
+        partitions = data_access.stream_all(EMPLOYEES_EXPORT_COLUMNS, EXPORT_PARTITION_SIZE)
+        async for chunk in _encode(partitions, EMPLOYEES_EXPORT_COLUMNS, export_format, compress):
+            yield chunk
+
+
+async def export_patients(export_format: ExportFormat, compress: bool) -> AsyncIterator[bytes]:
+    async with create_relational_async_session() as session, session.begin():
+        data_access = dal_pat.Patients(session)
+        partitions = data_access.stream_all(PATIENTS_EXPORT_COLUMNS, EXPORT_PARTITION_SIZE)
+        async for chunk in _encode(partitions, PATIENTS_EXPORT_COLUMNS, export_format, compress):
+            yield chunk
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    for encoding in (accept_encoding or '').split(','):
+        name, _, parameters = encoding.strip().partition(';')
+        if name.strip().lower() == 'gzip':
+            return parameters.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
@@ -3,50 +3,65 @@ from uuid import UUID
 from math import ceil
 from datetime import datetime
 
-from src.services.security import hash_password, create_and_hash_random_password
+from src.data_access_layer.general import Page
+from src.models.general import encode_cursor
+import src.services.hashing as hashing
+from src.tracing import traced
 
 
-def prepare_new_user(user: dict[str, Any], user_id: UUID) -> dict[str, Any]:
+@traced()
+async def prepare_new_user(user: dict[str, Any], user_id: UUID) -> dict[str, Any]:
     user['created_by_id'] = user_id
-    hashed_password = hash_password(user['password'])
+    hashed_password = await hashing.hash_password(user['password'])
     user['hashed_password'] = hashed_password
     del user['password']
     del user['confirm_password']
     return user
 
 
-def prepare_new_patient(patient: dict[str, Any]) -> tuple[dict[str, Any], str]:
+@traced()
+async def prepare_new_patient(patient: dict[str, Any]) -> tuple[dict[str, Any], str]:
     patient['is_verified'] = True
-    password, hashed_password = create_and_hash_random_password()
+    password, hashed_password = await hashing.create_and_hash_random_password()
     patient['hashed_password'] = hashed_password
     return patient, password
 
 
-def prepare_pagination_link(link_base: str, pagination, employees_number: int) -> str:
-    links = ''
+def prepare_pagination_link(link_base: str, pagination: dict[str, Any], page: Page) -> str:
+    """Link header value, link base has placeholders for position parameter, page size and relation."""
+    links = []
     page_size = pagination['page_size']
-    offset = pagination['offset']
-    if offset != 0:
-        page_number = 1
-        relation = 'rel=\"first\"'
-        links += link_base.format(page_number, page_size, relation)
-    prev_page_number = int(offset / page_size)
-    if prev_page_number != 1:
-        page_number = prev_page_number
-        relation = 'rel=\"prev\"'
-        links += link_base.format(page_number, page_size, relation)
-    page_number = offset / page_size + 1
-    next_page_number = page_number + 1
-    last_page_number = ceil(employees_number / page_size)
-    if next_page_number < last_page_number:
-        page_number = next_page_number
-        relation = 'rel=\"next\"'
-        links += link_base.format(page_number, page_size, relation)
+    if pagination['keyset']:
+        if page.has_previous:
+            links.append(link_base.format('after=', page_size, 'rel="first"'))
+            links.append(link_base.format(f'before={encode_cursor(page.first_key)}', page_size, 'rel="prev"'))
+        if page.has_next:
+            links.append(link_base.format(f'after={encode_cursor(page.last_key)}', page_size, 'rel="next"'))
+        return ', '.join(links)
+
+    page_number = pagination['offset'] // page_size + 1
+    if page_number > 1:
+        links.append(link_base.format('page_number=1', page_size, 'rel="first"'))
+    if page_number > 2:
+        links.append(link_base.format(f'page_number={page_number - 1}', page_size, 'rel="prev"'))
+    if page.rows_number is None:  # Not counted, last page is unknown
+        if page.has_next:
+            links.append(link_base.format(f'page_number={page_number + 1}', page_size, 'rel="next"'))
+        return ', '.join(links)
+    last_page_number = ceil(page.rows_number / page_size)
+    if page_number + 1 < last_page_number:
+        links.append(link_base.format(f'page_number={page_number + 1}', page_size, 'rel="next"'))
     if page_number < last_page_number:
-        page_number = last_page_number
-        relation = 'rel=\"last\"'
-        links += link_base.format(page_number, page_size, relation)
-    return links
+        links.append(link_base.format(f'page_number={last_page_number}', page_size, 'rel="last"'))
+    return ', '.join(links)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match header lists etag, compared weakly as for GET, so W/ prefix is ignored on both sides."""
+    if if_none_match.strip() == '*':
+        return True
+    weak_etag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == weak_etag for tag in if_none_match.split(','))
 
 
 def add_modification_info(data: [str, Any], user_id: UUID):
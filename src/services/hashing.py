@@ -0,0 +1,45 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import src.services.security as security
+from src.tracing import traced
+
+# hashlib releases GIL while hashing, so threads hash in parallel and event loop keeps serving other requests
+PASSWORD_HASHING_THREADS = int(os.environ.get('PASSWORD_HASHING_THREADS', min(4, os.cpu_count() or 1)))
+# Hashes waiting above limit are not queued in executor, so requests cancelled meanwhile don't take CPU
+PASSWORD_HASHING_CONCURRENCY = int(os.environ.get('PASSWORD_HASHING_CONCURRENCY', PASSWORD_HASHING_THREADS))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASHING_THREADS, thread_name_prefix='password_hashing')
+_concurrency_limit = asyncio.Semaphore(PASSWORD_HASHING_CONCURRENCY)
+
+T = TypeVar('T')
+
+
+async def _run(function: Callable[..., T], *args) -> T:
+    async with _concurrency_limit:
+        return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+
+
+@traced()
+async def hash_password(password: str) -> bytes:
+    return await _run(security.hash_password, password)
+
+
+@traced()
+async def verify_password(password: str, hashed_password: bytes) -> bool:
+    return await _run(security.verify_password, password, hashed_password)
+
+
+@traced()
+async def verify_dummy_password(password: str) -> bool:
+    return await _run(security.verify_dummy_password, password)
+
+
+async def create_and_hash_random_password() -> tuple[str, bytes]:
+    return await _run(security.create_and_hash_random_password)
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,236 @@
+import asyncio
+import codecs
+import csv
+import json
+import os
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import src.data_access_layer.employees as dal_employees
+import src.data_access_layer.patients as dal_pat
+import src.models.employees as mod_emp
+import src.models.patients as mod_pat
+from src.services.general import prepare_new_user, prepare_new_patient
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1_000))
+# Patients are added by multi row insert, Postgres accepts up to 32767 parameters in statement
+REGISTRATION_BATCH_SIZE = min(int(os.environ.get('REGISTRATION_BATCH_SIZE', 500)), 2_500)
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+CSV_CONTENT_TYPES = ('text/csv',)
+
+
+class InvalidRecord(Exception):
+    def __init__(self, errors: list[str]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def get_import_format(content_type: str | None) -> str | None:
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        return 'ndjson'
+    if media_type in CSV_CONTENT_TYPES:
+        return 'csv'
+    return None
+
+
+async def _iterate_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    rest = ''
+    async for chunk in stream:
+        lines = (rest + decoder.decode(chunk)).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line.removesuffix('\r')
+    rest += decoder.decode(b'', final=True)
+    if rest:
+        yield rest.removesuffix('\r')
+
+
+async def _iterate_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[list[str]]:
+    record = None
+    async for line in lines:
+        record = line if record is None else f'{record}\n{line}'
+        if record.count('"') % 2:  # Quoted field with new line is continued in next line
+            continue
+        if record:
+            yield next(csv.reader([record]))
+        record = None
+    if record:
+        yield next(csv.reader([record]))
+
+
+async def iterate_records(stream: AsyncIterator[bytes], import_format: str) \
+        -> AsyncIterator[dict[str, Any] | InvalidRecord]:
+    """Parse uploaded NDJSON or CSV with header row as it arrives, one record is kept in memory at once.
+
+    Not parsable record is yielded as InvalidRecord, so numbers of following records are not shifted.
+    Empty CSV values are read as null.
+    """
+    lines = _iterate_lines(stream)
+    if import_format == 'ndjson':
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield InvalidRecord([f'Invalid JSON: {error}'])
+                continue
+            yield record if isinstance(record, dict) else InvalidRecord(['Record is not JSON object.'])
+        return
+    header = None
+    async for values in _iterate_csv_records(lines):
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield InvalidRecord([f'Expected {len(header)} values, got {len(values)}.'])
+            continue
+        yield {name: value if value != '' else None for name, value in zip(header, values)}
+
+
+def validate_record(record: dict[str, Any] | InvalidRecord, model: type[BaseModel]) -> BaseModel:
+    if isinstance(record, InvalidRecord):
+        raise record
+    try:
+        return model.model_validate(record)
+    except ValidationError as error:
+        messages = [f"{'.'.join(str(location) for location in detail['loc']) or 'record'}: {detail['msg']}"
+                    for detail in error.errors()]
+        raise InvalidRecord(messages)
+
+
+async def _copy_employees(batch: list[tuple[int, dict[str, Any]]], user_id: UUID,
+                          data_access: dal_employees.EmployeesImport):
+    # Passwords of batch are hashed in parallel by hashing threads
+    employees = await asyncio.gather(*(prepare_new_user(employee, user_id) for _, employee in batch))
+    await data_access.copy([(row_number, *(employee[column] for column in data_access.columns[1:]))
+                            for (row_number, _), employee in zip(batch, employees)])
+
+
+async def import_employees(records: AsyncIterator[dict[str, Any] | InvalidRecord], user_id: UUID,
+                           session: AsyncSession) -> dict[str, Any]:
+    """Validate and stage employees in batches, then add all valid rows in current transaction of session."""
+    data_access = dal_employees.EmployeesImport(session)
+    await data_access.create_staging()
+    errors: dict[int, list[str]] = {}
+    batch = []
+    row_number = 0
+    async for record in records:
+        row_number += 1
+        try:
+            employee = validate_record(record, mod_emp.NewEmployee)
+        except InvalidRecord as invalid_record:
+            errors[row_number] = invalid_record.errors
+            continue
+        batch.append((row_number, employee.model_dump()))
+        if len(batch) == IMPORT_BATCH_SIZE:
+            await _copy_employees(batch, user_id, data_access)
+            batch = []
+    if batch:
+        await _copy_employees(batch, user_id, data_access)
+    for violation_row_number, violation in await data_access.get_violations():
+        errors.setdefault(violation_row_number, []).append(violation)
+    imported_rows = []
+    for merged_row_number, employee_id in await data_access.merge(list(errors)):
+        if employee_id is None:
+            errors[merged_row_number] = ['Conflicts with employee added in meantime.']
+        else:
+            imported_rows.append({'row': merged_row_number, 'location': f'/employees/{employee_id}'})
+    return {'imported': len(imported_rows), 'rejected': len(errors), 'rows': imported_rows,
+            'errors': [{'row': error_row_number, 'errors': errors[error_row_number]}
+                       for error_row_number in sorted(errors)]}
+
+
+def _describe_violation(error: IntegrityError) -> str:
+    database_error = error.orig.__cause__  # asyncpg exception, wrapped by SQLAlchemy adapter
+    return getattr(database_error, 'message', None) or 'Violates database constraint.'
+
+
+async def _add_patients_one_by_one(patients: list[tuple[int, dict[str, Any]]], session: AsyncSession)\
+        -> tuple[dict[str, UUID], dict[int, list[str]]]:
+    data_access = dal_pat.Patients(session)
+    added_patients, errors = {}, {}
+    for row_number, patient in patients:
+        try:
+            async with session.begin_nested():
+                added_patients.update(await data_access.add_many([patient]))
+        except IntegrityError as error:
+            errors[row_number] = [_describe_violation(error)]
+    return added_patients, errors
+
+
+async def _register_patients_batch(batch: list[tuple[int, dict[str, Any] | None, list[str] | None]],
+                                   session: AsyncSession) -> list[dict[str, Any]]:
+    patients = [(row_number, patient) for row_number, patient, _ in batch if patient is not None]
+    # Passwords are generated and hashed by hashing threads, not to block other requests for whole batch
+    prepared_patients = await asyncio.gather(*(prepare_new_patient(patient) for _, patient in patients))
+    passwords = {row_number: password for (row_number, _), (_, password) in zip(patients, prepared_patients)}
+    errors = {row_number: row_errors for row_number, patient, row_errors in batch if patient is None}
+    data_access = dal_pat.Patients(session)
+    async with session.begin():
+        taken = await data_access.get_taken([patient['login'] for _, patient in patients],
+                                            [patient['pesel_or_identifier'] for _, patient in patients])
+        taken = {tuple(taken_value) for taken_value in taken}
+        seen, new_patients = set(), []
+        for row_number, patient in patients:
+            row_errors = []
+            for column in ('login', 'pesel_or_identifier'):
+                if (column, patient[column]) in taken:
+                    row_errors.append(f'{column} already exists')
+                elif (column, patient[column]) in seen:  # Accepted in first row only
+                    row_errors.append(f'{column} repeated in upload')
+                seen.add((column, patient[column]))
+            if row_errors:
+                errors[row_number] = row_errors
+            else:
+                new_patients.append((row_number, patient))
+        added_patients = {}
+        if new_patients:
+            try:
+                async with session.begin_nested():
+                    added_patients = await data_access.add_many([patient for _, patient in new_patients])
+            except IntegrityError:  # Not unique constraint, rows are added separately to find violating ones
+                added_patients, insert_errors = await _add_patients_one_by_one(new_patients, session)
+                errors.update(insert_errors)
+    results = []
+    for row_number, patient, _ in batch:
+        if row_number in errors:
+            results.append({'row': row_number, 'errors': errors[row_number]})
+        elif patient['login'] not in added_patients:
+            results.append({'row': row_number, 'errors': ['Conflicts with patient registered in meantime.']})
+        else:
+            results.append({'row': row_number, 'id': str(added_patients[patient['login']]),
+                            'password': passwords[row_number]})
+    return results
+
+
+async def register_patients(records: AsyncIterator[dict[str, Any] | InvalidRecord], session: AsyncSession)\
+        -> AsyncIterator[dict[str, Any]]:
+    """Register patients in batches as they are uploaded, every batch in own transaction.
+
+    Yields result of every row in order, id and password of registered patient or errors of rejected row.
+    """
+    batch = []
+    row_number = 0
+    async for record in records:
+        row_number += 1
+        try:
+            patient = validate_record(record, mod_pat.Patient)
+        except InvalidRecord as invalid_record:
+            batch.append((row_number, None, invalid_record.errors))
+        else:
+            batch.append((row_number, patient.model_dump(), None))
+        if len(batch) == REGISTRATION_BATCH_SIZE:
+            for result in await _register_patients_batch(batch, session):
+                yield result
+            batch = []
+    if batch:
+        for result in await _register_patients_batch(batch, session):
+            yield result
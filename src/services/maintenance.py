@@ -0,0 +1,174 @@
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.data_access_layer.employees import EmployeesTokens, EmployeesRevokedTokens
+from src.data_access_layer.general import create_relational_async_session
+from src.data_access_layer.partitions import Partitions
+from src.database.models.employees import EmployeesAccessTokens
+from src.database.models.patients import Appointments
+
+logger = logging.getLogger(__name__)
+
+ACCESS_TOKENS_PURGE_INTERVAL = float(os.environ.get('ACCESS_TOKENS_PURGE_INTERVAL', 3_600))
+ACCESS_TOKENS_PURGE_BATCH_SIZE = int(os.environ.get('ACCESS_TOKENS_PURGE_BATCH_SIZE', 5_000))
+ACCESS_TOKENS_PARTITIONS_AHEAD = int(os.environ.get('ACCESS_TOKENS_PARTITIONS_AHEAD', 3))
+
+APPOINTMENTS_PARTITIONS_INTERVAL = float(os.environ.get('APPOINTMENTS_PARTITIONS_INTERVAL', 86_400))
+APPOINTMENTS_PARTITIONS_AHEAD = int(os.environ.get('APPOINTMENTS_PARTITIONS_AHEAD', 12))  # Months
+APPOINTMENTS_RETENTION_MONTHS = int(os.environ.get('APPOINTMENTS_RETENTION_MONTHS', 24))
+
+ACCESS_TOKENS_TABLE = EmployeesAccessTokens.__table__
+ACCESS_TOKENS_DEFAULT_PARTITION = f'{ACCESS_TOKENS_TABLE.name}_default'
+APPOINTMENTS_TABLE = Appointments.__table__
+APPOINTMENTS_INDEX_COLUMNS = ('specialist_id', 'start')  # Specialist's day view reads one partition by index
+
+
+@dataclass
+class PurgeReport:
+    rows_removed: int = 0
+    partitions_removed: int = 0
+    revoked_rows_removed: int = 0
+
+
+@dataclass
+class AppointmentsPartitionsReport:
+    partitions_created: int = 0
+    partitions_detached: int = 0
+
+
+last_purge_report: PurgeReport | None = None
+last_appointments_partitions_report: AppointmentsPartitionsReport | None = None
+
+
+def access_tokens_partition_name(day: date) -> str:
+    return f'{ACCESS_TOKENS_TABLE.name}_p{day:%Y%m%d}'
+
+
+def access_tokens_partition_day(partition_name: str) -> date | None:
+    prefix = f'{ACCESS_TOKENS_TABLE.name}_p'
+    if not partition_name.startswith(prefix):
+        return None
+    return datetime.strptime(partition_name.removeprefix(prefix), '%Y%m%d').date()
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def appointments_partition_name(month: date) -> str:
+    return f'{APPOINTMENTS_TABLE.name}_p{month:%Y%m}'
+
+
+def appointments_partition_month(partition_name: str) -> date | None:
+    prefix = f'{APPOINTMENTS_TABLE.name}_p'
+    if not partition_name.startswith(prefix):
+        return None
+    return datetime.strptime(partition_name.removeprefix(prefix), '%Y%m').date()
+
+
+async def _rotate_access_tokens_partitions(report: PurgeReport):
+    today = date.today()
+    async with create_relational_async_session() as session:
+        async with session.begin():
+            data_access = Partitions(session)
+            if not await data_access.is_partitioned(ACCESS_TOKENS_TABLE):
+                return
+            for days in range(ACCESS_TOKENS_PARTITIONS_AHEAD + 1):
+                day = today + timedelta(days=days)
+                await data_access.create_range(ACCESS_TOKENS_TABLE, access_tokens_partition_name(day), day,
+                                               day + timedelta(days=1))
+            await data_access.create_default(ACCESS_TOKENS_TABLE, ACCESS_TOKENS_DEFAULT_PARTITION)
+            partitions_names = await data_access.get_names(ACCESS_TOKENS_TABLE)
+        for partition_name in partitions_names:
+            day = access_tokens_partition_day(partition_name)
+            if day is None or day >= today:
+                continue
+            async with session.begin():
+                data_access = Partitions(session)
+                report.rows_removed += await data_access.count_rows(ACCESS_TOKENS_TABLE, partition_name)
+                await data_access.drop(ACCESS_TOKENS_TABLE, partition_name)
+            report.partitions_removed += 1
+
+
+async def _delete_expired_access_tokens(report: PurgeReport):
+    async with create_relational_async_session() as session:
+        deleted_rows = ACCESS_TOKENS_PURGE_BATCH_SIZE
+        while deleted_rows == ACCESS_TOKENS_PURGE_BATCH_SIZE:  # Every batch in own short transaction
+            async with session.begin():
+                data_access = EmployeesTokens(session)
+                deleted_rows = await data_access.delete_expired(ACCESS_TOKENS_PURGE_BATCH_SIZE)
+            report.rows_removed += deleted_rows
+        async with session.begin():
+            data_access = EmployeesRevokedTokens(session)
+            report.revoked_rows_removed = await data_access.delete_expired()
+
+
+async def purge_access_tokens() -> PurgeReport:
+    """Drop partitions of expired access tokens, and remove remaining expired rows in bounded batches.
+
+    Tables created before partitioning was introduced are not partitioned, then only batches are used.
+    """
+    global last_purge_report
+    report = PurgeReport()
+    await _rotate_access_tokens_partitions(report)
+    await _delete_expired_access_tokens(report)
+    logger.info('Access tokens purge removed %s rows, %s partitions and %s revoked tokens.',
+                report.rows_removed, report.partitions_removed, report.revoked_rows_removed)
+    last_purge_report = report
+    return report
+
+
+async def manage_appointments_partitions() -> AppointmentsPartitionsReport:
+    """Create monthly partitions of appointments ahead with their indexes, detach ones older than retention.
+
+    There is no default partition, then creating partition never has to move rows, and visits booked after last
+    partition are rejected.
+    """
+    global last_appointments_partitions_report
+    report = AppointmentsPartitionsReport()
+    current_month = date.today().replace(day=1)
+    oldest_kept_month = add_months(current_month, -APPOINTMENTS_RETENTION_MONTHS)
+    async with create_relational_async_session() as session:
+        async with session.begin():
+            data_access = Partitions(session)
+            if not await data_access.is_partitioned(APPOINTMENTS_TABLE):
+                return report
+            partitions_names = set(await data_access.get_names(APPOINTMENTS_TABLE))
+        for months in range(APPOINTMENTS_PARTITIONS_AHEAD + 1):
+            month = add_months(current_month, months)
+            partition_name = appointments_partition_name(month)
+            async with session.begin():  # Every partition in own short transaction, it locks parent table
+                data_access = Partitions(session)
+                await data_access.create_range(APPOINTMENTS_TABLE, partition_name, month, add_months(month, 1))
+                await data_access.create_index(APPOINTMENTS_TABLE, partition_name, APPOINTMENTS_INDEX_COLUMNS)
+            if partition_name not in partitions_names:
+                report.partitions_created += 1
+        for partition_name in sorted(partitions_names):
+            month = appointments_partition_month(partition_name)
+            if month is None or month >= oldest_kept_month:
+                continue
+            async with session.begin():
+                await Partitions(session).detach(APPOINTMENTS_TABLE, partition_name)
+            report.partitions_detached += 1
+    logger.info('Appointments partitions manager created %s and detached %s partitions.',
+                report.partitions_created, report.partitions_detached)
+    last_appointments_partitions_report = report
+    return report
+
+
+async def get_appointments_partitions(session: AsyncSession) -> list[dict]:
+    """Attached partitions of appointments with their months and exact numbers of rows."""
+    data_access = Partitions(session)
+    partitions = []
+    rows = await data_access.count_rows_by_partition(APPOINTMENTS_TABLE)
+    for partition_name in await data_access.get_names(APPOINTMENTS_TABLE):
+        month = appointments_partition_month(partition_name)
+        partitions.append({'name': partition_name, 'start': month,
+                           'end': add_months(month, 1) if month is not None else None,
+                           'rows': rows.get(partition_name, 0)})
+    return partitions
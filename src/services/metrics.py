@@ -0,0 +1,121 @@
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Sequence
+
+from src.data_access_layer.instrumentation import data_access_method
+from src.database.query_listeners import ExecutedQuery
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(label_names: Sequence[str], labels: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Sequence[str]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...], amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        for labels, value in self.values.items():
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    """Prometheus histogram, observation is one bisect and few additions, cheap enough for every query."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.series: dict[tuple[str, ...], list[float]] = {}  # Buckets counts, then +Inf count and sum
+
+    def observe(self, labels: tuple[str, ...], value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for labels, series in self.series.items():
+            cumulative_count = 0
+            for bucket, count in zip((*self.buckets, '+Inf'), series[:-1]):
+                cumulative_count += count
+                bucket_label = _format_labels(self.label_names, labels, f'le="{bucket}"')
+                lines.append(f'{self.name}_bucket{bucket_label} {cumulative_count}')
+            series_labels = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{series_labels} {series[-1]}')
+            lines.append(f'{self.name}_count{series_labels} {cumulative_count}')
+        return lines
+
+
+http_requests = Counter('http_requests_total', 'Requests by route template and status code.',
+                        ('method', 'route', 'status'))
+http_request_duration = Histogram('http_request_duration_seconds', 'Request latency by route template.',
+                                  ('method', 'route'), DURATION_BUCKETS)
+http_request_queries = Histogram('http_request_db_queries', 'Database queries executed by request.',
+                                 ('method', 'route'), QUERIES_BUCKETS)
+http_request_queries_duration = Histogram('http_request_db_duration_seconds',
+                                          'Time of database queries executed by request.', ('method', 'route'),
+                                          DURATION_BUCKETS)
+db_query_duration = Histogram('db_query_duration_seconds', 'Query time by data access method.', ('method',),
+                              QUERY_DURATION_BUCKETS)
+
+registry = [http_requests, http_request_duration, http_request_queries, http_request_queries_duration,
+            db_query_duration]
+
+
+@dataclass
+class RequestQueries:
+    queries: int = 0
+    duration: float = 0.0
+
+
+request_queries: ContextVar[RequestQueries | None] = ContextVar('request_queries', default=None)
+
+
+def observe_request(method: str, route: str, status_code: int, duration: float, queries: RequestQueries):
+    http_requests.inc((method, route, str(status_code)))
+    http_request_duration.observe((method, route), duration)
+    http_request_queries.observe((method, route), queries.queries)
+    http_request_queries_duration.observe((method, route), queries.duration)
+
+
+def query_finished(query: ExecutedQuery):
+    db_query_duration.observe((data_access_method.get() or 'other',), query.duration)
+    queries = request_queries.get()
+    if queries is not None:
+        queries.queries += 1
+        queries.duration += query.duration
+
+
+def render_metrics() -> str:
+    """All metrics in Prometheus text format."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,202 @@
+import cProfile
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import src.database.relational as db_rel
+import src.services.metrics as metrics
+import src.services.query_tracer as query_tracer
+import src.services.profiling as profiling
+import src.tracing as tracing
+import src.services.authentication as auth
+
+logger = logging.getLogger(__name__)
+
+
+class PoolCheckoutsMiddleware:
+    """Count connections checked out from pool by request, and return the number in X-Pool-Checkouts header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        counter = db_rel.CheckoutsCounter()
+        context_token = db_rel.request_checkouts.set(counter)
+
+        async def send_with_checkouts(message: Message):
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                headers.append('X-Pool-Checkouts', str(counter.checkouts))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_checkouts)
+        finally:
+            db_rel.request_checkouts.reset(context_token)
+
+
+class MetricsMiddleware:
+    """Record latency and status of requests by route template, with number and time of their queries."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        queries = metrics.RequestQueries()
+        context_token = metrics.request_queries.set(queries)
+        status_code = 500  # Not sent, when exception is raised before response
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.request_queries.reset(context_token)
+            route = scope.get('route')  # Set by router, template keeps number of series bounded
+            route_path = route.path if route is not None else 'unmatched'
+            metrics.observe_request(scope['method'], route_path, status_code, time.perf_counter() - start, queries)
+
+
+class QueryTracerMiddleware:
+    """Trace statements of request, return their number in X-Query-Count header and warn when over budget."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        trace = query_tracer.QueryTrace(scope)
+        context_token = query_tracer.request_trace.set(trace)
+
+        async def send_with_query_count(message: Message):
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                headers.append('X-Query-Count', str(trace.queries))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_query_count)
+        finally:
+            query_tracer.request_trace.reset(context_token)
+            query_tracer.finish_request(trace)
+
+
+class ProfilingMiddleware:
+    """Profile request of administrator sending X-Profile header, id of saved profile is in X-Profile-Id header.
+
+    Requests without the header only pass by one headers lookup. Profile records whole worker thread, so it includes
+    other requests served concurrently, and not work of threads like password hashing.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or profiling.PROFILE_HEADER not in Headers(scope=scope):
+            await self.app(scope, receive, send)
+            return
+        scheme, _, token = Headers(scope=scope).get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or profiling.profiling_lock.locked() \
+                or not await auth.is_administrator_token(token):
+            await self.app(scope, receive, send)
+            return
+        async with profiling.profiling_lock:
+            await self._profile(scope, receive, send)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send):
+        profile_id = profiling.new_profile_id()
+        profiler = cProfile.Profile()
+        create_date = datetime.now()
+        start = time.perf_counter()
+        status_code = 500
+        saved = False
+
+        async def save():
+            nonlocal saved
+            profiler.disable()
+            saved = True
+            route = scope.get('route')
+            metadata = {'method': scope['method'], 'path': scope['path'],
+                        'route': route.path if route is not None else None, 'status_code': status_code,
+                        'duration_ms': round((time.perf_counter() - start) * 1_000, 3),
+                        'create_date': create_date.isoformat()}
+            try:
+                await profiling.save_profile(profile_id, profiler, metadata)
+            except OSError:
+                logger.exception('Saving profile %s failed.', profile_id)
+
+        async def send_with_profile_id(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append(profiling.PROFILE_ID_HEADER, profile_id)
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                await save()  # Before last part, so profile can be downloaded once response is received
+            await send(message)
+
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if not saved:
+                await save()
+
+
+class TracedRoute(APIRoute):
+    """Route running its handler in span, use it as route_class of routers."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        super().__init__(path, tracing.traced(f'handler {endpoint.__name__}', 'handler')(endpoint), **kwargs)
+
+
+class TracingMiddleware:
+    """Start trace of request, continued from W3C traceparent header when client sends it, id is in X-Trace-Id."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request_span = tracing.start_span('request', 'server', traceparent=Headers(scope=scope).get('traceparent'))
+        context_token = tracing.current_span.set(request_span)
+
+        async def send_with_trace_id(message: Message):
+            if message['type'] == 'http.response.start':
+                request_span.attributes['http.status_code'] = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append('X-Trace-Id', request_span.trace_id)
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as request_error:
+            error = request_error
+            raise
+        finally:
+            tracing.current_span.reset(context_token)
+            route = scope.get('route')
+            request_span.name = f"{scope['method']} {route.path if route is not None else 'unmatched'}"
+            request_span.attributes['http.target'] = scope['path']
+            tracing.end_span(request_span, error)
@@ -0,0 +1,78 @@
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+PROFILE_HEADER = 'X-Profile'  # Any value, accepted with administrator token only
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILES_DIRECTORY = Path(os.environ.get('PROFILES_DIRECTORY', os.path.join(tempfile.gettempdir(), 'medapp_profiles')))
+PROFILES_KEPT = int(os.environ.get('PROFILES_KEPT', 20))  # Oldest profiles are removed above it
+
+PROFILE_ID_PATTERN = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+# cProfile records whole thread, one profile at a time, requests asking meanwhile are served without profiling
+profiling_lock = asyncio.Lock()
+
+
+def _profile_path(profile_id: str, suffix: str) -> Path:
+    return PROFILES_DIRECTORY / f'{profile_id}{suffix}'
+
+
+def new_profile_id() -> str:
+    """Known before profiled response is sent, to be returned in its header."""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(4)}"
+
+
+def _save(profile_id: str, profiler: cProfile.Profile, metadata: dict[str, Any]):
+    PROFILES_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(_profile_path(profile_id, '.prof'))
+    _profile_path(profile_id, '.json').write_text(json.dumps({'id': profile_id, **metadata}))
+    for old_profile in sorted(PROFILES_DIRECTORY.glob('*.prof'))[:-PROFILES_KEPT]:  # Ids start with time
+        old_profile.unlink(missing_ok=True)
+        old_profile.with_suffix('.json').unlink(missing_ok=True)
+
+
+async def save_profile(profile_id: str, profiler: cProfile.Profile, metadata: dict[str, Any]):
+    """Write profile and its metadata (route, status, duration) to ring directory."""
+    await asyncio.to_thread(_save, profile_id, profiler, metadata)
+
+
+def _list() -> list[dict[str, Any]]:
+    profiles = []
+    for metadata_path in sorted(PROFILES_DIRECTORY.glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(metadata_path.read_text()))
+        except (OSError, ValueError):  # Removed by other worker meanwhile
+            continue
+    return profiles
+
+
+async def list_profiles() -> list[dict[str, Any]]:
+    """Stored profiles, newest first."""
+    return await asyncio.to_thread(_list)
+
+
+def get_profile_path(profile_id: str) -> Path | None:
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    profile_path = _profile_path(profile_id, '.prof')
+    return profile_path if profile_path.is_file() else None
+
+
+def _summarize(profile_path: Path, limit: int) -> str:
+    summary = io.StringIO()
+    pstats.Stats(str(profile_path), stream=summary).sort_stats('cumulative').print_stats(limit)
+    return summary.getvalue()
+
+
+async def summarize_profile(profile_path: Path, limit: int) -> str:
+    """Functions with highest cumulative time, as printed by pstats."""
+    return await asyncio.to_thread(_summarize, profile_path, limit)
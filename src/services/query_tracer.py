@@ -0,0 +1,94 @@
+import logging
+import os
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from starlette.types import Scope
+
+from src.data_access_layer.instrumentation import data_access_method
+from src.database.query_listeners import ExecutedQuery
+
+logger = logging.getLogger(__name__)
+
+QUERY_TRACER = os.environ.get('QUERY_TRACER', 'true').lower() == 'true'
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.25))  # Seconds
+SLOW_QUERY_MAX_LENGTH = int(os.environ.get('SLOW_QUERY_MAX_LENGTH', 2_000))  # Characters of logged statement
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 25))  # Statements per request, 0 disables
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'warn')  # warn, or raise in tests
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class QueryTrace:
+    """Statements of one request, counted by data access method, which shows repeated queries of N+1 pattern."""
+    scope: Scope
+    budget: int = QUERY_BUDGET
+    queries: int = 0
+    methods: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get('route')  # Set by router before dependencies run
+        return f"{self.scope['method']} {route.path if route is not None else self.scope['path']}"
+
+    @property
+    def over_budget(self) -> bool:
+        return 0 < self.budget < self.queries
+
+
+request_trace: ContextVar[QueryTrace | None] = ContextVar('request_trace', default=None)
+
+
+def set_query_budget(budget: int):
+    """Allow more statements in current request, for endpoints working in batches, like bulk registration."""
+    trace = request_trace.get()
+    if trace is not None:
+        trace.budget = budget
+
+
+def _value_shape(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+
+def _parameters_shape(parameters: Any, executemany: bool) -> str:
+    """Types of bound parameters instead of their values, which can be personal data."""
+    if executemany:
+        rows = list(parameters)
+        return f'{len(rows)} x {_parameters_shape(rows[0], False)}' if rows else '0 rows'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {_value_shape(value)}' for name, value in parameters.items()) + '}'
+    return '(' + ', '.join(_value_shape(value) for value in parameters or ()) + ')'
+
+
+def query_started(query: ExecutedQuery):
+    trace = request_trace.get()
+    if trace is None:
+        return
+    trace.queries += 1
+    trace.methods[data_access_method.get() or 'other'] += 1
+    if trace.over_budget and QUERY_BUDGET_MODE == 'raise':
+        raise QueryBudgetExceeded(f'{trace.route} executed more than {trace.budget} statements: '
+                                  f'{dict(trace.methods)}')
+
+
+def query_finished(query: ExecutedQuery):
+    if query.duration < SLOW_QUERY_THRESHOLD:
+        return
+    trace = request_trace.get()
+    logger.warning('Slow query %.3f s in %s by %s: %s parameters %s', query.duration,
+                   trace.route if trace is not None else 'background task', data_access_method.get() or 'other',
+                   ' '.join(query.statement.split())[:SLOW_QUERY_MAX_LENGTH],
+                   _parameters_shape(query.parameters, query.executemany))
+
+
+def finish_request(trace: QueryTrace):
+    if trace.over_budget:
+        logger.warning('%s executed %s statements over budget of %s: %s', trace.route, trace.queries, trace.budget,
+                       ', '.join(f'{method} x {count}' for method, count in trace.methods.most_common()))
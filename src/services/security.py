@@ -1,34 +1,144 @@
+import base64
+import functools
 import hashlib
+import hmac
+import json
 import os
 import secrets
 import datetime
 import random
 import string
+import time
+from typing import Any
 
-salt_file = os.environ['SALT_FILE']
-with open(salt_file, 'r') as file:
-    salt = file.read()
+# scrypt - salted per password, parameters are stored with hash, sha256 - legacy hash with shared salt
+PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt').lower()
+if PASSWORD_HASH_ALGORITHM not in ('scrypt', 'sha256'):
+    raise Exception('Invalid password hash algorithm config!')
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
 
+_SCRYPT_PREFIX = b'scrypt$'
 
-def hash_password(password: str) -> bytes:
-    password_with_salt = salt + password
+
+@functools.cache
+def get_salt() -> str:
+    """Shared salt of legacy sha256 hashes, read when first needed."""
+    with open(os.environ['SALT_FILE'], 'r') as file:
+        return file.read()
+
+
+def _hash_password_sha256(password: str) -> bytes:
+    password_with_salt = get_salt() + password
     hash_ = hashlib.sha256(password_with_salt.encode('utf-8'), usedforsecurity=True)
     hashed_password = hash_.digest()
     return hashed_password
 
 
+def _scrypt(password: str, password_salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode('utf-8'), salt=password_salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2), dklen=32)  # Memory needed by OpenSSL for parameters
+
+
+def hash_password(password: str) -> bytes:
+    """Hash with configured algorithm, scrypt hash is stored as scrypt$n$r$p$salt$hash."""
+    if PASSWORD_HASH_ALGORITHM == 'sha256':
+        return _hash_password_sha256(password)
+    password_salt = os.urandom(16)
+    hash_ = _scrypt(password, password_salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    hashed_password = (f'{PASSWORD_SCRYPT_N}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}$'
+                       f'{_base64_encode(password_salt)}${_base64_encode(hash_)}')
+    return _SCRYPT_PREFIX + hashed_password.encode('ascii')
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """Hash was made by other algorithm or parameters than configured ones."""
+    if not hashed_password.startswith(_SCRYPT_PREFIX):
+        return PASSWORD_HASH_ALGORITHM != 'sha256'
+    n, r, p = bytes(hashed_password).decode('ascii').split('$')[1:4]
+    return (PASSWORD_HASH_ALGORITHM != 'scrypt'
+            or (int(n), int(r), int(p)) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P))
+
+
 def generate_token() -> str:
     token = secrets.token_urlsafe(32)
     return token
 
 
+def generate_token_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def _base64_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _base64_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+# Only this header is accepted, so token can not choose other signing algorithm
+_SIGNED_TOKEN_HEADER = _base64_encode(b'{"alg":"HS256","typ":"JWT"}')
+
+
+@functools.cache
+def get_jwt_secret() -> bytes:
+    jwt_secrets_file = os.environ['JWT_SECRETS_FILE']
+    with open(jwt_secrets_file, 'r') as file:
+        jwt_secrets = json.load(file)
+    return jwt_secrets['secret_key'].encode('utf-8')
+
+
+def _sign(signing_input: str) -> bytes:
+    return hmac.new(get_jwt_secret(), signing_input.encode('ascii'), hashlib.sha256).digest()
+
+
+def generate_signed_token(claims: dict[str, Any]) -> str:
+    payload = _base64_encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    signing_input = f'{_SIGNED_TOKEN_HEADER}.{payload}'
+    signature = _base64_encode(_sign(signing_input))
+    return f'{signing_input}.{signature}'
+
+
+def decode_signed_token(token: str) -> dict[str, Any] | None:
+    """Return claims of HS256 token with valid signature and not passed expiration time."""
+    try:
+        header, payload, signature = token.split('.')
+        if header != _SIGNED_TOKEN_HEADER:
+            return None
+        if not hmac.compare_digest(_sign(f'{header}.{payload}'), _base64_decode(signature)):
+            return None
+        claims = json.loads(_base64_decode(payload))
+    except ValueError:
+        return None
+    if claims['exp'] <= time.time():
+        return None
+    return claims
+
+
 def get_expiration_date(expiration_in_minutes: int = 1_440) -> datetime.datetime:
     return datetime.datetime.now() + datetime.timedelta(minutes=expiration_in_minutes)
 
 
 def verify_password(password: str, hashed_password: bytes) -> bool:
-    to_check = hash_password(password)
-    return secrets.compare_digest(hashed_password, to_check)
+    """Check password against hash of any supported algorithm, with parameters stored in the hash."""
+    if not hashed_password.startswith(_SCRYPT_PREFIX):
+        return secrets.compare_digest(bytes(hashed_password), _hash_password_sha256(password))
+    n, r, p, password_salt, hash_ = bytes(hashed_password).decode('ascii').split('$')[1:]
+    to_check = _scrypt(password, _base64_decode(password_salt), int(n), int(r), int(p))
+    return secrets.compare_digest(_base64_decode(hash_), to_check)
+
+
+@functools.cache
+def _get_dummy_password_hash() -> bytes:
+    return hash_password(secrets.token_urlsafe(16))
+
+
+def verify_dummy_password(password: str) -> bool:
+    """Check password against hash of random password, for unknown account to take as long as wrong password."""
+    verify_password(password, _get_dummy_password_hash())
+    return False
 
 
 def create_and_hash_random_password() -> tuple[str, bytes]:
@@ -0,0 +1,40 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Durations of startup phases, in order they ran."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.total = 0.0
+        self.start = time.perf_counter()
+
+    def imports_done(self):
+        """Time from import of this module, imported first by main, to start of lifespan."""
+        self.phases['imports'] = time.perf_counter() - self.start
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+        logger.info('Startup took %.3f s: %s', self.total,
+                    ', '.join(f'{name} {duration:.3f} s' for name, duration in self.phases.items()))
+
+    def to_dict(self) -> dict:
+        return {'total_ms': round(self.total * 1_000, 3),
+                'phases': [{'name': name, 'duration_ms': round(duration * 1_000, 3)}
+                           for name, duration in self.phases.items()]}
+
+
+startup_report = StartupReport()
@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Protocol, Sequence, TypeVar
+
+from src.database.query_listeners import ExecutedQuery
+
+logger = logging.getLogger(__name__)
+
+TRACING = os.environ.get('TRACING', 'false').lower() == 'true'
+TRACING_FILE = os.environ.get('TRACING_FILE', 'traces.jsonl')
+TRACING_EXPORT_INTERVAL = float(os.environ.get('TRACING_EXPORT_INTERVAL', 1))
+TRACING_QUEUE_SIZE = int(os.environ.get('TRACING_QUEUE_SIZE', 10_000))  # Oldest spans are dropped above it
+TRACING_STATEMENT_MAX_LENGTH = int(os.environ.get('TRACING_STATEMENT_MAX_LENGTH', 500))
+
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')  # W3C Trace Context
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str  # server, handler, service, data_access, db or background
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    links: list[dict[str, str]] = field(default_factory=list)  # Spans which caused this one, in other traces
+    status: str = 'ok'
+    start_time: float = field(default_factory=time.time)
+    start_counter: float = field(default_factory=time.perf_counter)
+    duration: float | None = None
+
+    @property
+    def link(self) -> dict[str, str]:
+        return {'trace_id': self.trace_id, 'span_id': self.span_id}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {'trace_id': self.trace_id, 'span_id': self.span_id, 'parent_id': self.parent_id, 'name': self.name,
+                'kind': self.kind, 'start_time': self.start_time, 'duration_ms': round(self.duration * 1_000, 3),
+                'status': self.status, 'attributes': self.attributes, 'links': self.links}
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: Sequence[Span]):
+        """Called in thread, with batch of finished spans."""
+
+
+class JsonlFileExporter:
+    """Appends spans to file as JSON lines, batch is written at once, so workers can share the file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: Sequence[Span]):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(span.to_dict(), default=str) + '\n' for span in spans))
+
+
+current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+exporter: SpanExporter = JsonlFileExporter(TRACING_FILE)
+_finished_spans: deque[Span] = deque(maxlen=TRACING_QUEUE_SIZE)
+
+
+def set_exporter(span_exporter: SpanExporter):
+    global exporter
+    exporter = span_exporter
+
+
+def _new_id(bits: int) -> str:
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+
+def start_span(name: str, kind: str, parent: Span | None = None, attributes: dict[str, Any] | None = None,
+               links: list[dict[str, str]] | None = None, traceparent: str | None = None) -> Span:
+    """Span has to be finished by end_span, span() context manager also makes it current."""
+    parent = parent or current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    elif traceparent is not None and (match := TRACEPARENT_PATTERN.match(traceparent)):  # Continued from client
+        trace_id, parent_id = match.groups()
+    else:
+        trace_id, parent_id = _new_id(128), None
+    return Span(name, kind, trace_id, _new_id(64), parent_id, attributes or {}, links or [])
+
+
+def end_span(span: Span, error: BaseException | None = None):
+    span.duration = time.perf_counter() - span.start_counter
+    if error is not None:
+        span.status = 'error'
+        span.attributes['error'] = repr(error)[:1_000]
+    _finished_spans.append(span)
+
+
+@contextmanager
+def span(name: str, kind: str = 'service', attributes: dict[str, Any] | None = None,
+         links: list[dict[str, str]] | None = None) -> Iterator[Span | None]:
+    """Child of current span, yields None when tracing is disabled."""
+    if not TRACING:
+        yield None
+        return
+    new_span = start_span(name, kind, attributes=attributes, links=links)
+    context_token = current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as error:
+        end_span(new_span, error)
+        raise
+    else:
+        end_span(new_span)
+    finally:
+        current_span.reset(context_token)
+
+
+def traced(name: str | None = None, kind: str = 'service') -> Callable[[F], F]:
+    """Decorator running function in span named by its qualified name, function is unchanged when tracing is off."""
+
+    def decorator(function: F) -> F:
+        if not TRACING or hasattr(function, 'span_name'):  # Routes are created again by include_router
+            return function
+        span_name = name or function.__qualname__
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def traced_coroutine(*args, **kwargs):
+                with span(span_name, kind):
+                    return await function(*args, **kwargs)
+
+            traced_coroutine.span_name = span_name
+            return traced_coroutine
+
+        @functools.wraps(function)
+        def traced_function(*args, **kwargs):
+            with span(span_name, kind):
+                return function(*args, **kwargs)
+
+        traced_function.span_name = span_name
+        return traced_function
+
+    return decorator
+
+
+def current_link() -> dict[str, str] | None:
+    """Link to current span, for work it causes later, like sending queued emails."""
+    current = current_span.get()
+    return current.link if current is not None else None
+
+
+def query_started(query: ExecutedQuery):
+    if current_span.get() is None:  # Queries outside of traced work, like startup, are skipped
+        return
+    attributes = {'db.statement': ' '.join(query.statement.split())[:TRACING_STATEMENT_MAX_LENGTH]}
+    if query.executemany:
+        attributes['db.rows'] = len(query.parameters)
+    query.span = start_span('db.query', 'db', attributes=attributes)
+
+
+def query_finished(query: ExecutedQuery):
+    if query.span is not None:
+        end_span(query.span, query.error)
+
+
+def _export_finished_spans():
+    spans = []
+    while _finished_spans:
+        spans.append(_finished_spans.popleft())
+    if spans:
+        exporter.export(spans)
+
+
+async def export_finished_spans():
+    """Hand finished spans to exporter in thread, run periodically and at shutdown."""
+    try:
+        await asyncio.to_thread(_export_finished_spans)
+    except Exception:
+        logger.exception('Exporting spans failed.')
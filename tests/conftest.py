@@ -1,3 +1,4 @@
+import os
 from asyncio import DefaultEventLoopPolicy, new_event_loop, set_event_loop
 
 import pytest
@@ -5,6 +6,11 @@ import pytest_asyncio
 import httpx
 from authlib.integrations.httpx_client import AsyncOAuth2Client
 
+# Read by src.database.relational imported by unit tests of services and database fixtures, tested server runs locally
+os.environ.setdefault('ENV', 'LOCAL')
+
+pytest_plugins = ['tests.database_fixtures']
+
 
 @pytest.fixture(scope="session")
 def event_loop_policy(request):
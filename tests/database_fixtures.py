@@ -0,0 +1,123 @@
+import uuid
+from datetime import date, time, timedelta
+from typing import Any
+
+import pytest_asyncio
+from sqlalchemy import delete, insert, select
+
+import src.database.relational as db_rel
+import src.database.dicts_models as db_dicts
+import src.database.models.employees as db_mod_emp
+import src.database.models.patients as db_mod_pat
+from tests.application_roles import DOCTOR_ID
+from tests.data_fixtures import secrets
+
+WORKING_DAYS = range(1, 6)  # Monday to Friday, 8:00-16:00 with break 12:00-12:30
+VISITS_DAY = date.today() + timedelta(weeks=2, days=-date.today().weekday())  # Monday, in created partitions
+
+
+@pytest_asyncio.fixture
+async def database_session():
+    """Session of own engine, for data without API, like working times of specialists."""
+    engine = db_rel.create_engine(db_rel.DATABASE_URL, db_rel.EngineSettings(pool_size=1, max_overflow=0))
+    async with db_rel.AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def add_specialist(database_session) -> dict[str, Any]:
+    async with database_session.begin():
+        administrator_id = await database_session.scalar(
+            select(db_mod_emp.Employees.id).where(db_mod_emp.Employees.email == secrets['administrator_login']))
+        role_id = await database_session.scalar(
+            insert(db_dicts.SpecialistsRoles).values(display_name=f'role {uuid.uuid4().hex[:8]}', is_active=True,
+                                                     created_by_id=administrator_id).
+            returning(db_dicts.SpecialistsRoles.id))
+        identifier = uuid.uuid4().hex[:12]
+        specialist_id = await database_session.scalar(
+            insert(db_mod_emp.Employees).values(name='Lisa', surname='Cuddy', pesel_or_identifier=identifier,
+                                                birth_date=date(1968, 8, 1), role_id=DOCTOR_ID, hashed_password=b'',
+                                                business_telephone=identifier, email=f'{identifier}@medapp.com',
+                                                address='Princeton', created_by_id=administrator_id).
+            returning(db_mod_emp.Employees.id))
+        await database_session.execute(insert(db_mod_emp.PatientsSpecialists).values(id=specialist_id,
+                                                                                      role_id=role_id))
+        await database_session.execute(insert(db_mod_emp.SpecialistsWorkingTime), [
+            {'specialist_id': specialist_id, 'day_of_week_id': day, 'accepted_visit_duration': [30, 60],
+             'work_start': time(8), 'work_end': time(16), 'work_break_start': time(12),
+             'work_break_end': time(12, 30), 'is_working_day': True} for day in WORKING_DAYS])
+    return {'id': specialist_id, 'role_id': role_id}
+
+
+async def remove_specialist(database_session, specialist: dict[str, Any]):
+    async with database_session.begin():
+        await database_session.execute(delete(db_mod_pat.Appointments).
+                                       where(db_mod_pat.Appointments.specialist_id == specialist['id']))
+        await database_session.execute(delete(db_mod_emp.SpecialistsWorkingTime).
+                                       where(db_mod_emp.SpecialistsWorkingTime.specialist_id == specialist['id']))
+        await database_session.execute(delete(db_mod_emp.PatientsSpecialists).
+                                       where(db_mod_emp.PatientsSpecialists.id == specialist['id']))
+        await database_session.execute(delete(db_mod_emp.Employees).
+                                       where(db_mod_emp.Employees.id == specialist['id']))
+        await database_session.execute(delete(db_dicts.SpecialistsRoles).
+                                       where(db_dicts.SpecialistsRoles.id == specialist['role_id']))
+
+
+@pytest_asyncio.fixture
+async def specialist(database_session) -> dict[str, Any]:
+    """Specialist of new role, working on weekdays, removed with appointments after test."""
+    new_specialist = await add_specialist(database_session)
+    yield new_specialist
+    await remove_specialist(database_session, new_specialist)
+
+
+@pytest_asyncio.fixture
+async def other_specialist(database_session) -> dict[str, Any]:
+    new_specialist = await add_specialist(database_session)
+    yield new_specialist
+    await remove_specialist(database_session, new_specialist)
+
+
+async def add_patient(database_session) -> uuid.UUID:
+    login = f'patient_{uuid.uuid4().hex[:12]}'
+    async with database_session.begin():
+        return await database_session.scalar(
+            insert(db_mod_pat.Patients).values(login=login, hashed_password=b'', name='John', surname='Doe',
+                                               sex='male', pesel_or_identifier=login, birth_date=date(1980, 1, 1),
+                                               email=f'{login}@example.com', address='', email_verified=True).
+            returning(db_mod_pat.Patients.id))
+
+
+async def remove_patient(database_session, patient_id: uuid.UUID):
+    async with database_session.begin():
+        email = await database_session.scalar(select(db_mod_pat.Patients.email).
+                                              where(db_mod_pat.Patients.id == patient_id))
+        await database_session.execute(delete(db_mod_pat.EmailsOutbox).
+                                       where(db_mod_pat.EmailsOutbox.recipient == email))
+        await database_session.execute(delete(db_mod_pat.Appointments).
+                                       where(db_mod_pat.Appointments.patient_id == patient_id))
+        await database_session.execute(delete(db_mod_pat.Patients).where(db_mod_pat.Patients.id == patient_id))
+
+
+@pytest_asyncio.fixture
+async def patient_id(database_session) -> uuid.UUID:
+    """Patient with verified email, so cancelled visits are notified, removed with visits and emails after test."""
+    new_patient_id = await add_patient(database_session)
+    yield new_patient_id
+    await remove_patient(database_session, new_patient_id)
+
+
+@pytest_asyncio.fixture
+async def other_patient_id(database_session) -> uuid.UUID:
+    new_patient_id = await add_patient(database_session)
+    yield new_patient_id
+    await remove_patient(database_session, new_patient_id)
+
+
+@pytest_asyncio.fixture
+async def added_patients_ids(database_session) -> list[uuid.UUID]:
+    """Test appends ids of patients it registered by API, they are removed after test, so it can run again."""
+    patients_ids = []
+    yield patients_ids
+    async with database_session.begin():
+        await database_session.execute(delete(db_mod_pat.Patients).where(db_mod_pat.Patients.id.in_(patients_ids)))
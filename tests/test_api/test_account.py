@@ -0,0 +1,21 @@
+import httpx
+import pytest
+from fastapi import status
+
+from tests.data_fixtures import secrets
+
+
+@pytest.mark.asyncio
+class TestAccountEndpoints:
+
+    async def test_logout_revoke_token(self, test_client: httpx.AsyncClient, log_as):
+        login_data = await log_as(secrets['administrator_login'], secrets['administrator_password'])
+        auth_header = {'Authorization': 'Bearer ' + login_data['access_token']}
+        response = await test_client.get("/employees", headers=auth_header)
+        assert response.status_code == status.HTTP_200_OK
+
+        response = await test_client.post("/employees/logout", headers=auth_header)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        response = await test_client.get("/employees", headers=auth_header)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
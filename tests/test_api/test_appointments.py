@@ -0,0 +1,172 @@
+import uuid
+from datetime import datetime, time, timedelta
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import status
+
+from src.database.models.patients import Appointments
+from tests.data_fixtures import secrets
+from tests.database_fixtures import VISITS_DAY
+
+
+def visit_time(hour: int, minute: int = 0) -> str:
+    return datetime.combine(VISITS_DAY, time(hour, minute)).isoformat()
+
+
+async def add_patient_appointment(database_session, patient_id, specialist_id):
+    """Visit 10:00-10:30 on day of visits."""
+    async with database_session.begin():
+        database_session.add(Appointments(patient_id=patient_id, specialist_id=specialist_id,
+                                          start=datetime.combine(VISITS_DAY, time(10)),
+                                          end=datetime.combine(VISITS_DAY, time(10, 30))))
+
+
+async def add_visits(database_session, patient_id, specialist_id, *starts: time):
+    """Half an hour visits on day of visits."""
+    async with database_session.begin():
+        database_session.add_all([Appointments(patient_id=patient_id, specialist_id=specialist_id,
+                                               start=datetime.combine(VISITS_DAY, start),
+                                               end=datetime.combine(VISITS_DAY, start) + timedelta(minutes=30))
+                                  for start in starts])
+
+
+@pytest.mark.asyncio
+class TestAppointmentsEndpoints:
+
+    @staticmethod
+    @pytest_asyncio.fixture(autouse=True, scope='class')
+    async def log_as_administrator(log_as):
+        administrator_login = secrets['administrator_login']
+        administrator_password = secrets['administrator_password']
+        login_data = await log_as(administrator_login, administrator_password)
+        admin_token = login_data['access_token']
+        TestAppointmentsEndpoints.admin_token = admin_token
+
+    @pytest.mark.parametrize("start, end", [("2030-01-07T10:30", "2030-01-07T10:00"),
+                                            ("2030-01-07T10:00", "2030-01-09T10:00"),
+                                            ("2030-01-07T10:00+01:00", "2030-01-07T10:30+01:00")])
+    async def test_add_invalid_time(self, start, end, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        appointment = {'patient_id': str(uuid.uuid4()), 'specialist_id': str(uuid.uuid4()), 'start': start,
+                       'end': end}
+        response = await test_client.post("/appointments", json=appointment,
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_add_outside_working_time(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        appointment = {'patient_id': str(uuid.uuid4()), 'specialist_id': str(uuid.uuid4()),
+                       'start': "2030-01-07T10:00", 'end': "2030-01-07T10:30"}
+        response = await test_client.post("/appointments", json=appointment,
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_get_appointments_of_specialist_day(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/appointments", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"specialist_id": str(uuid.uuid4()), "from": "2030-01-07T00:00",
+                                                 "to": "2030-01-08T00:00", "after": ""})
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    @pytest.mark.parametrize("params, status_code",
+                             [({"from": "2030-01-08T00:00", "to": "2030-01-07T00:00"}, status.HTTP_400_BAD_REQUEST),
+                              ({"from": "2030-01-07T00:00", "to": "2030-01-07T00:00"}, status.HTTP_400_BAD_REQUEST),
+                              ({"from": "2030-01-07T00:00"}, status.HTTP_422_UNPROCESSABLE_ENTITY)])
+    async def test_get_appointments_invalid_range(self, params, status_code, test_client: httpx.AsyncClient,
+                                                  request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/appointments", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params=params)
+        assert response.status_code == status_code
+
+    async def test_get_appointments_in_range(self, specialist, other_specialist, patient_id, other_patient_id,
+                                             database_session, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        await add_visits(database_session, patient_id, specialist['id'], time(11), time(9), time(12), time(8, 30))
+        await add_visits(database_session, other_patient_id, other_specialist['id'], time(10), time(9))
+        response = await test_client.get("/appointments", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"from": visit_time(9), "to": visit_time(12)})
+        assert response.status_code == status.HTTP_200_OK
+        visits = [(appointment['start'], appointment['specialist_id']) for appointment in response.json()]
+        # Visits starting at from are included, at to excluded, sorted by start and specialist like primary key
+        specialist_id, other_specialist_id = str(specialist['id']), str(other_specialist['id'])
+        assert visits == sorted([(visit_time(9), specialist_id), (visit_time(9), other_specialist_id),
+                                 (visit_time(10), other_specialist_id), (visit_time(11), specialist_id)])
+
+    async def test_cancel_unknown_appointment(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.delete(f"/appointments/{uuid.uuid4()}",
+                                            headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_add_appointment(self, specialist, patient_id, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        appointment = {'patient_id': str(patient_id), 'specialist_id': str(specialist['id']),
+                       'start': visit_time(10), 'end': visit_time(10, 30)}
+        response = await test_client.post("/appointments", json=appointment,
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.headers['Location'].startswith('/appointments/')
+
+    @pytest.mark.parametrize("start, end", [((10, 0), (10, 30)), ((9, 45), (10, 15))])
+    async def test_add_appointment_of_busy_specialist(self, start, end, specialist, patient_id, database_session,
+                                                      test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        await add_patient_appointment(database_session, patient_id, specialist['id'])
+        other_patient = {'patient_id': str(uuid.uuid4()), 'specialist_id': str(specialist['id']),
+                         'start': visit_time(*start), 'end': visit_time(*end)}
+        response = await test_client.post("/appointments", json=other_patient,
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+    @pytest.mark.parametrize("start, end", [((10, 0), (10, 30)), ((10, 15), (11, 15))])
+    async def test_add_appointment_of_busy_patient(self, start, end, specialist, other_specialist, patient_id,
+                                                   database_session, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        await add_patient_appointment(database_session, patient_id, specialist['id'])
+        appointment = {'patient_id': str(patient_id), 'specialist_id': str(other_specialist['id']),
+                       'start': visit_time(*start), 'end': visit_time(*end)}
+        response = await test_client.post("/appointments", json=appointment,
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.json()['detail'] == 'Patient has other visit at this time.'
+
+    @pytest.mark.parametrize("count, total_count", [("exact", "3"), ("none", None)])
+    async def test_get_appointments_count(self, count, total_count, specialist, other_specialist, patient_id,
+                                          database_session, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        async with database_session.begin():
+            database_session.add_all(
+                [Appointments(patient_id=patient_id, specialist_id=specialist['id'],
+                              start=datetime.combine(VISITS_DAY, time(hour)),
+                              end=datetime.combine(VISITS_DAY, time(hour, 30))) for hour in (9, 10, 11)] +
+                [Appointments(patient_id=patient_id, specialist_id=other_specialist['id'],
+                              start=datetime.combine(VISITS_DAY, time(13)),
+                              end=datetime.combine(VISITS_DAY, time(13, 30)))])
+        response = await test_client.get("/appointments", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"specialist_id": str(specialist['id']), "from": visit_time(0),
+                                                 "to": visit_time(23), "page_size": 2, "count": count})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 2
+        assert response.headers.get('X-Total-Count') == total_count
+
+    async def test_get_appointments_by_cursor(self, specialist, patient_id, database_session,
+                                              test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        await add_visits(database_session, patient_id, specialist['id'], time(9), time(10), time(11))
+        filters = {"specialist_id": str(specialist['id']), "from": visit_time(0), "to": visit_time(23)}
+        first_page = await test_client.get("/appointments", headers={'Authorization': 'Bearer ' + auth_token},
+                                           params={**filters, "after": "", "page_size": 2})
+        assert first_page.status_code == status.HTTP_200_OK
+        assert [appointment['start'] for appointment in first_page.json()] == [visit_time(9), visit_time(10)]
+        next_page = await test_client.get(first_page.links['next']['url'],
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert next_page.status_code == status.HTTP_200_OK
+        assert [appointment['start'] for appointment in next_page.json()] == [visit_time(11)]
+        assert 'next' not in next_page.links
+        previous_page = await test_client.get(next_page.links['prev']['url'],
+                                              headers={'Authorization': 'Bearer ' + auth_token})
+        assert previous_page.status_code == status.HTTP_200_OK
+        assert previous_page.json() == first_page.json()
@@ -88,6 +88,25 @@ class TestDictionariesEndpoints:
                                          headers={'Authorization': 'Bearer ' + auth_token})
         assert response.status_code == status.HTTP_200_OK
 
+    @pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other",{etag}', '"other" ,  W/{etag}', "*"])
+    async def test_get_not_modified_dictionary_rows(self, if_none_match, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/dictionaries/application_roles",
+                                         headers={'Authorization': 'Bearer ' + auth_token})
+        etag = response.headers['ETag']
+        response = await test_client.get("/dictionaries/application_roles",
+                                         headers={'Authorization': 'Bearer ' + auth_token,
+                                                  'If-None-Match': if_none_match.format(etag=etag)})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers['ETag'] == etag
+
+    async def test_get_modified_dictionary_rows(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/dictionaries/application_roles",
+                                         headers={'Authorization': 'Bearer ' + auth_token,
+                                                  'If-None-Match': '"other", W/"another"'})
+        assert response.status_code == status.HTTP_200_OK
+
     async def test_update_dictionary_row(self, test_client: httpx.AsyncClient, request):
         auth_token = request.cls.admin_token
         dictionary_row_location = request.cls.added_dictionary_rows[0]
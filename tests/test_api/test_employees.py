@@ -1,10 +1,13 @@
+import json
 from typing import Any
 
 import httpx
 import pytest
 import pytest_asyncio
 from fastapi import status
+from sqlalchemy import func, select
 
+from src.database.models.employees import Employees
 from tests.data_fixtures import employee_data, secrets, string_creator
 
 
@@ -103,6 +106,100 @@ class TestEmployeesEndpoints:
                                          params={"pagination": {"page-number": 1, "page-size": 10}})
         assert response.status_code == status.HTTP_200_OK
 
+    async def test_get_employees_by_cursor(self, specialist, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        first_page = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token},
+                                           params={"after": "", "page_size": 1})
+        assert first_page.status_code == status.HTTP_200_OK
+        [first_employee] = first_page.json()
+        next_page = await test_client.get(first_page.links['next']['url'],
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert next_page.status_code == status.HTTP_200_OK
+        [next_employee] = next_page.json()
+        assert next_employee['location'] != first_employee['location']
+        previous_page = await test_client.get(next_page.links['prev']['url'],
+                                              headers={'Authorization': 'Bearer ' + auth_token})
+        assert previous_page.status_code == status.HTTP_200_OK
+        assert previous_page.json() == [first_employee]
+
+    @pytest.mark.parametrize("count", ["estimate", "cached"])
+    async def test_get_employees_count(self, count, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"count": count})
+        assert response.status_code == status.HTTP_200_OK
+        assert int(response.headers['X-Total-Count']) >= 0
+
+    async def test_get_employees_exact_count(self, specialist, database_session, test_client: httpx.AsyncClient,
+                                             request):
+        auth_token = request.cls.admin_token
+        async with database_session.begin():
+            employees_number = await database_session.scalar(select(func.count()).select_from(Employees))
+        response = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"count": "exact", "page_size": 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 1
+        assert int(response.headers['X-Total-Count']) == employees_number >= 2
+
+    async def test_get_employees_without_count(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"count": "none"})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'X-Total-Count' not in response.headers
+
+    async def test_get_employees_invalid_cursor(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"after": "not a cursor"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_get_employees_single_connection(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['X-Pool-Checkouts'] == '1'
+
+    async def test_get_employees_from_primary(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/employees", headers={'Authorization': 'Bearer ' + auth_token,
+                                                                'X-Read-From': 'primary'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['X-Pool-Checkouts'] == '1'  # Same connection as token check
+
+    async def test_import_employees(self, test_client: httpx.AsyncClient, request, employee_data: dict[str, Any]):
+        auth_token = request.cls.admin_token
+        employee_data.update({'email': 'james.wilson@medapp.com', 'telephone': '740504106',
+                              'business_telephone': None, 'pesel_or_identifier': 'Dr Wilson'})
+        repeated_email = {**employee_data, 'telephone': '740504107', 'pesel_or_identifier': 'Dr Wilson 2'}
+        invalid_password = {**employee_data, 'password': 'password', 'confirm_password': 'password'}
+        rows = [employee_data, repeated_email, invalid_password]
+        body = '\n'.join(json.dumps(row) for row in rows)
+        response = await test_client.post("/employees/import", content=body,
+                                          headers={'Authorization': 'Bearer ' + auth_token,
+                                                   'Content-Type': 'application/x-ndjson'})
+        assert response.status_code == status.HTTP_200_OK
+        import_report = response.json()
+        assert import_report['imported'] == 1
+        assert [row_errors['row'] for row_errors in import_report['errors']] == [2, 3]
+        imported_location = import_report['rows'][0]['location']
+        response = await test_client.delete(imported_location, headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    @pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+    async def test_export_employees(self, export_format, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/employees/export", params={"format": export_format},
+                                         headers={'Authorization': 'Bearer ' + auth_token, 'Accept-Encoding': 'gzip'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['Content-Encoding'] == 'gzip'
+        lines = response.text.splitlines()
+        if export_format == 'ndjson':
+            assert all('hashed_password' not in json.loads(line) for line in lines)
+        else:
+            assert lines[0].startswith('id,name,surname')
+            assert len(lines) >= 2
+
     async def test_update_employee(self, test_client: httpx.AsyncClient, request):
         auth_token = request.cls.admin_token
         employee_update_location = request.cls.added_employees[0]
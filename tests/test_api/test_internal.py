@@ -0,0 +1,94 @@
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import status
+
+from tests.data_fixtures import secrets
+
+
+@pytest.mark.asyncio
+class TestInternalEndpoints:
+
+    @staticmethod
+    @pytest_asyncio.fixture(autouse=True, scope='class')
+    async def log_as_administrator(log_as):
+        administrator_login = secrets['administrator_login']
+        administrator_password = secrets['administrator_password']
+        login_data = await log_as(administrator_login, administrator_password)
+        admin_token = login_data['access_token']
+        TestInternalEndpoints.admin_token = admin_token
+
+    async def test_get_pool_status(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/internal/pool", headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_200_OK
+        primary_pool = response.json()['primary']
+        assert primary_pool['checked_out'] >= 1  # Connection of this request
+        assert primary_pool['checkouts'] >= 1
+
+    async def test_query_count_header(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/internal/appointments/partitions",
+                                         headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_200_OK
+        assert 1 <= int(response.headers['X-Query-Count']) <= 3  # Token check, partitions and their rows
+
+    async def test_get_pool_status_unauthorized(self, test_client: httpx.AsyncClient):
+        response = await test_client.get("/internal/pool")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_get_startup_report(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/internal/startup", headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_200_OK
+        report = response.json()
+        phases = [phase['name'] for phase in report['phases']]
+        assert phases[:2] == ['imports', 'database_schema']
+        assert report['total_ms'] >= sum(phase['duration_ms'] for phase in report['phases'][1:])
+
+    async def test_get_appointments_partitions(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/internal/appointments/partitions",
+                                         headers={'Authorization': 'Bearer ' + auth_token})
+        assert response.status_code == status.HTTP_200_OK
+        partitions = response.json()
+        assert partitions  # Current month is created at startup
+        assert all(partition['rows'] >= 0 for partition in partitions)
+
+    async def test_get_metrics(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        await test_client.get("/internal/pool", headers={'Authorization': 'Bearer ' + auth_token})
+        response = await test_client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['content-type'].startswith('text/plain')
+        metrics = response.text
+        assert 'http_requests_total{method="GET",route="/internal/pool",status="200"}' in metrics
+        assert 'db_query_duration_seconds_count{method="EmployeesTokens.check"}' in metrics
+
+    async def test_profile_request(self, test_client: httpx.AsyncClient, request):
+        auth_headers = {'Authorization': 'Bearer ' + request.cls.admin_token}
+        response = await test_client.get("/internal/pool", headers={**auth_headers, 'X-Profile': '1'})
+        assert response.status_code == status.HTTP_200_OK
+        profile_id = response.headers['X-Profile-Id']
+        response = await test_client.get("/internal/profiles", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        profile = next(profile for profile in response.json() if profile['id'] == profile_id)
+        assert profile['route'] == '/internal/pool'
+        assert profile['status_code'] == status.HTTP_200_OK
+        response = await test_client.get(f"/internal/profiles/{profile_id}", params={'format': 'text'},
+                                         headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert 'function calls' in response.text
+        response = await test_client.get(f"/internal/profiles/{profile_id}", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content
+
+    async def test_profile_request_without_administrator_token(self, test_client: httpx.AsyncClient):
+        response = await test_client.get("/internal/pool", headers={'X-Profile': '1'})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert 'X-Profile-Id' not in response.headers
+
+    async def test_get_profile_not_found(self, test_client: httpx.AsyncClient, request):
+        response = await test_client.get("/internal/profiles/..%2Fsecrets",
+                                         headers={'Authorization': 'Bearer ' + request.cls.admin_token})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
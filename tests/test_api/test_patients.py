@@ -1,4 +1,6 @@
+import json
 from typing import Any
+from uuid import UUID
 
 import httpx
 import pytest
@@ -27,6 +29,25 @@ class TestPatientsEndpoints:
                                          params={"pagination": {"page-number": 1, "page-size": 10}})
         assert response.status_code == status.HTTP_204_NO_CONTENT
 
+    async def test_get_patients_by_cursor(self, patient_id, other_patient_id, test_client: httpx.AsyncClient,
+                                          request):
+        auth_token = request.cls.admin_token
+        first_page = await test_client.get("/patients", headers={'Authorization': 'Bearer ' + auth_token},
+                                           params={"after": "", "page_size": 1})
+        assert first_page.status_code == status.HTTP_200_OK
+        [first_patient] = first_page.json()
+        next_page = await test_client.get(first_page.links['next']['url'],
+                                          headers={'Authorization': 'Bearer ' + auth_token})
+        assert next_page.status_code == status.HTTP_200_OK
+        [next_patient] = next_page.json()
+        assert {first_patient['location'], next_patient['location']} == {f'/patients/{patient_id}',
+                                                                          f'/patients/{other_patient_id}'}
+        assert 'next' not in next_page.links
+        previous_page = await test_client.get(next_page.links['prev']['url'],
+                                              headers={'Authorization': 'Bearer ' + auth_token})
+        assert previous_page.status_code == status.HTTP_200_OK
+        assert previous_page.json() == [first_patient]
+
     async def test_add_patient(self, test_client: httpx.AsyncClient, request, patient_data: dict[str, Any]):
         auth_token = request.cls.admin_token
         response = await test_client.post("/patients", json=patient_data,
@@ -35,3 +56,20 @@ class TestPatientsEndpoints:
         request.cls.added_employees.append(location)
         assert response.status_code == status.HTTP_201_CREATED
 
+    async def test_register_patients(self, test_client: httpx.AsyncClient, request, patient_data: dict[str, Any],
+                                     added_patients_ids: list[UUID]):
+        auth_token = request.cls.admin_token
+        patient_data.update({'login': 'chory_piesek', 'pesel_or_identifier': 'Psy też nie mają peselu'})
+        repeated_login = {**patient_data, 'pesel_or_identifier': 'Inny pies'}
+        invalid_birth_date = {**patient_data, 'login': 'zdrowy_piesek', 'birth_date': 'wczoraj'}
+        body = '\n'.join(json.dumps(row) for row in [patient_data, repeated_login, invalid_birth_date])
+        response = await test_client.post("/patients/bulk", content=body,
+                                          headers={'Authorization': 'Bearer ' + auth_token,
+                                                   'Content-Type': 'application/x-ndjson'})
+        assert response.status_code == status.HTTP_200_OK
+        results = [json.loads(line) for line in response.text.splitlines()]
+        added_patients_ids.extend(UUID(result['id']) for result in results if 'id' in result)
+        assert [result['row'] for result in results] == [1, 2, 3]
+        assert 'id' in results[0] and 'password' in results[0]
+        assert results[1]['errors'] == ['login repeated in upload']
+        assert 'errors' in results[2]
@@ -0,0 +1,98 @@
+import uuid
+from datetime import datetime, time, timedelta
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import insert, select
+
+from src.database.models.patients import Appointments, EmailsOutbox
+from tests.data_fixtures import secrets
+from tests.database_fixtures import VISITS_DAY
+
+
+@pytest.mark.asyncio
+class TestSpecialistsEndpoints:
+
+    @staticmethod
+    @pytest_asyncio.fixture(autouse=True, scope='class')
+    async def log_as_administrator(log_as):
+        administrator_login = secrets['administrator_login']
+        administrator_password = secrets['administrator_password']
+        login_data = await log_as(administrator_login, administrator_password)
+        admin_token = login_data['access_token']
+        TestSpecialistsEndpoints.admin_token = admin_token
+
+    async def test_get_unknown_specialist_availability(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get(f"/specialists/{uuid.uuid4()}/availability",
+                                         headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"from": "2030-01-07T00:00", "to": "2030-01-14T00:00", "duration": 30})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize("time_range", [("2030-01-14T00:00", "2030-01-07T00:00"),
+                                            ("2030-01-01T00:00", "2030-12-31T00:00")])
+    async def test_get_availability_invalid_range(self, time_range, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        start, end = time_range
+        response = await test_client.get(f"/specialists/{uuid.uuid4()}/availability",
+                                         headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"from": start, "to": end, "duration": 30})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_get_first_free_slot_of_unknown_role(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get("/specialists/first-free-slot",
+                                         headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"role_id": 999_999, "from": "2030-01-07T00:00",
+                                                 "to": "2030-01-14T00:00", "duration": 30})
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    async def test_cancel_range_of_unknown_specialist(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.post(f"/specialists/{uuid.uuid4()}/cancel-range",
+                                          headers={'Authorization': 'Bearer ' + auth_token},
+                                          json={"from": "2030-01-07T00:00", "to": "2030-01-08T00:00"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_cancel_invalid_range(self, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.post(f"/specialists/{uuid.uuid4()}/cancel-range",
+                                          headers={'Authorization': 'Bearer ' + auth_token},
+                                          json={"from": "2030-01-08T00:00", "to": "2030-01-07T00:00"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize("endpoint", ["/specialists/first-free-slot", f"/specialists/{uuid.uuid4()}/availability"])
+    async def test_get_availability_with_timezone(self, endpoint, test_client: httpx.AsyncClient, request):
+        auth_token = request.cls.admin_token
+        response = await test_client.get(endpoint, headers={'Authorization': 'Bearer ' + auth_token},
+                                         params={"role_id": 1, "from": "2030-01-07T00:00+02:00",
+                                                 "to": "2030-01-14T00:00Z", "duration": 30})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_cancel_range(self, specialist, patient_id, database_session, test_client: httpx.AsyncClient,
+                                request):
+        auth_token = request.cls.admin_token
+        visits_starts = [datetime.combine(VISITS_DAY, time(hour)) for hour in (9, 10, 11)]
+        next_day_start = datetime.combine(VISITS_DAY + timedelta(days=1), time(9))
+        async with database_session.begin():
+            appointments_ids = await database_session.scalars(
+                insert(Appointments).returning(Appointments.id, sort_by_parameter_order=True),
+                [{'patient_id': patient_id, 'specialist_id': specialist['id'], 'start': start,
+                  'end': start + timedelta(minutes=30)} for start in visits_starts + [next_day_start]])
+            cancelled_ids = appointments_ids.all()[:len(visits_starts)]
+        response = await test_client.post(f"/specialists/{specialist['id']}/cancel-range",
+                                          headers={'Authorization': 'Bearer ' + auth_token},
+                                          json={"from": VISITS_DAY.isoformat() + "T00:00",
+                                                "to": (VISITS_DAY + timedelta(days=1)).isoformat() + "T00:00"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'cancelled': len(visits_starts)}
+        async with database_session.begin():
+            remaining_starts = await database_session.scalars(
+                select(Appointments.start).where(Appointments.specialist_id == specialist['id']))
+            assert remaining_starts.all() == [next_day_start]
+            queued_keys = await database_session.scalars(
+                select(EmailsOutbox.idempotency_key).where(EmailsOutbox.idempotency_key.in_(
+                    [f'cancel-visit.{appointment_id}' for appointment_id in cancelled_ids])))
+            assert len(queued_keys.all()) == len(visits_starts)
@@ -0,0 +1,22 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+
+class FakeSession:
+    """Session for data access faked in memory, its transactions do nothing."""
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+@pytest.fixture
+def fake_session() -> FakeSession:
+    return FakeSession()
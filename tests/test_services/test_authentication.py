@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import src.services.authentication as auth
+import src.services.hashing as hashing
+import src.services.security as security
+
+EMAIL = 'gregory.house@medapp.com'
+
+
+class FakeEmployees:
+    """Data access of employees, with one employee in memory and saved updates."""
+
+    def __init__(self):
+        self.employee: SimpleNamespace | None = None
+        self.updates: list[tuple[uuid.UUID, dict]] = []
+
+    async def get_by_email(self, email: str):
+        return self.employee if self.employee is not None and self.employee.email == email else None
+
+    async def update(self, id_: uuid.UUID, values: dict):
+        self.updates.append((id_, values))
+
+
+class FakeRevokedTokens:
+    """Data access of revoked tokens, with rows in memory."""
+
+    def __init__(self):
+        self.revoked: list[SimpleNamespace] = []
+
+    async def get_active(self):
+        return self.revoked
+
+    async def add(self, revoked_token: dict):
+        self.revoked.append(SimpleNamespace(**revoked_token))
+
+
+def encode(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).rstrip(b'=').decode('ascii')
+
+
+@pytest.mark.asyncio
+class TestAuthenticate:
+
+    @pytest.fixture(autouse=True)
+    def employees(self, monkeypatch) -> FakeEmployees:
+        employees = FakeEmployees()
+        monkeypatch.setattr(auth, 'Employees', lambda db_session: employees)
+        monkeypatch.setattr(security, 'PASSWORD_HASH_ALGORITHM', 'scrypt')
+        monkeypatch.setattr(security, 'PASSWORD_SCRYPT_N', 2 ** 10)
+        monkeypatch.setattr(security, 'get_salt', lambda: 'legacy salt')
+        return employees
+
+    @staticmethod
+    def add_employee(employees: FakeEmployees, hashed_password: bytes) -> SimpleNamespace:
+        employees.employee = SimpleNamespace(id=uuid.uuid4(), role_id=2, email=EMAIL, hashed_password=hashed_password)
+        return employees.employee
+
+    async def test_valid_password(self, employees, fake_session):
+        employee = self.add_employee(employees, security.hash_password('Correct horse 1'))
+        assert await auth.authenticate(EMAIL, 'Correct horse 1', fake_session) == (employee.id, 2)
+        assert employees.updates == []
+
+    async def test_wrong_password(self, employees, fake_session):
+        self.add_employee(employees, security.hash_password('Correct horse 1'))
+        assert await auth.authenticate(EMAIL, 'Correct horse 2', fake_session) is None
+
+    async def test_legacy_hash_is_replaced_at_login(self, employees, fake_session):
+        employee = self.add_employee(employees, hashlib.sha256(b'legacy saltCorrect horse 1').digest())
+        assert await auth.authenticate(EMAIL, 'Correct horse 1', fake_session) == (employee.id, 2)
+        [(updated_id, values)] = employees.updates
+        assert updated_id == employee.id
+        assert values['hashed_password'].startswith(b'scrypt$')
+        assert security.verify_password('Correct horse 1', values['hashed_password'])
+
+    async def test_unknown_email_verifies_dummy_hash(self, monkeypatch, fake_session):
+        verified = []
+
+        async def verify_dummy_password(password: str) -> bool:
+            verified.append(password)
+            return False
+
+        monkeypatch.setattr(hashing, 'verify_dummy_password', verify_dummy_password)
+        assert await auth.authenticate(EMAIL, 'Correct horse 1', fake_session) is None
+        assert verified == ['Correct horse 1']
+
+
+@pytest.mark.asyncio
+class TestSignedTokens:
+    employee_id = uuid.uuid4()
+
+    @pytest.fixture(autouse=True)
+    def signing_secret(self, monkeypatch):
+        monkeypatch.setattr(security, 'get_jwt_secret', lambda: b'test secret')
+        monkeypatch.setattr(auth, 'revocation_list', auth.RevocationList())
+
+    @pytest.fixture
+    def revoked_tokens(self, monkeypatch, fake_session) -> FakeRevokedTokens:
+        revoked_tokens = FakeRevokedTokens()
+        monkeypatch.setattr(auth, 'ACCESS_TOKENS_MODE', 'signed')
+        monkeypatch.setattr(auth, 'EmployeesRevokedTokens', lambda db_session: revoked_tokens)
+        monkeypatch.setattr(auth, 'create_relational_async_session', lambda: fake_session)
+        return revoked_tokens
+
+    def make_token(self, expires_in: float = 60, token_id: str = 'token-1') -> str:
+        return security.generate_signed_token({'sub': str(self.employee_id), 'role': 2,
+                                               'exp': int(time.time() + expires_in), 'jti': token_id})
+
+    async def test_valid_token(self):
+        token_data = auth.verify_signed_token(self.make_token())
+        assert (token_data.id, token_data.role_id) == (self.employee_id, 2)
+        assert token_data.expiration_date > datetime.now()
+
+    async def test_expired_token(self):
+        assert auth.verify_signed_token(self.make_token(expires_in=-1)) is None
+
+    async def test_tampered_claims(self):
+        header, _, signature = self.make_token().split('.')
+        payload = encode({'sub': str(self.employee_id), 'role': 1, 'exp': int(time.time() + 60), 'jti': 'token-1'})
+        assert auth.verify_signed_token(f'{header}.{payload}.{signature}') is None
+
+    async def test_tampered_signature(self):
+        header, payload, signature = self.make_token().split('.')
+        tampered_signature = ('A' if signature[0] != 'A' else 'B') + signature[1:]
+        assert auth.verify_signed_token(f'{header}.{payload}.{tampered_signature}') is None
+
+    async def test_token_signed_with_other_secret(self, monkeypatch):
+        token = self.make_token()
+        monkeypatch.setattr(security, 'get_jwt_secret', lambda: b'other secret')
+        assert auth.verify_signed_token(token) is None
+
+    async def test_unsigned_token(self):
+        _, payload, _ = self.make_token().split('.')
+        assert auth.verify_signed_token(f"{encode({'alg': 'none', 'typ': 'JWT'})}.{payload}.") is None
+
+    @pytest.mark.parametrize("token", ["", "not a token", "a.b.c"])
+    async def test_malformed_token(self, token):
+        assert auth.verify_signed_token(token) is None
+
+    async def test_revoked_token(self):
+        token = self.make_token(token_id='revoked')
+        auth.revocation_list.add('revoked', datetime.max)
+        assert auth.verify_signed_token(token) is None
+        assert auth.verify_signed_token(self.make_token(token_id='other')) is not None
+
+    async def test_revoked_token_of_other_worker(self, revoked_tokens):
+        revoked_tokens.revoked.append(SimpleNamespace(token_id='revoked', expiration_date=datetime.max))
+        token = self.make_token(token_id='revoked')
+        assert auth.verify_signed_token(token) is not None
+        await auth.revocation_list.refresh()
+        assert auth.verify_signed_token(token) is None
+
+    async def test_logout_revokes_token(self, revoked_tokens, fake_session):
+        await auth.revoke_token(self.make_token(token_id='logged-out'), fake_session)
+        assert [token.token_id for token in revoked_tokens.revoked] == ['logged-out']
+
+    async def test_logout_with_expired_token(self, revoked_tokens, fake_session):
+        expired_token = self.make_token(expires_in=-1)
+        await auth.revoke_token(expired_token, fake_session)
+        auth.forget_token(expired_token)
+        assert revoked_tokens.revoked == []
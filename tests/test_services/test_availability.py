@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime, time
+
+import pytest
+
+import src.services.availability as availability
+from src.database.models.employees import SpecialistsWorkingTime
+
+MONDAY = datetime(2030, 1, 7)
+
+
+def at(hour: int, minute: int = 0, day: int = 7) -> datetime:
+    return datetime(2030, 1, day, hour, minute)
+
+
+def working_time(specialist_id: uuid.UUID, day_of_week_id: int, break_start: time | None = None,
+                 break_end: time | None = None, accepted_visit_duration: list[int] | None = None):
+    return SpecialistsWorkingTime(specialist_id=specialist_id, day_of_week_id=day_of_week_id,
+                                  accepted_visit_duration=accepted_visit_duration, work_start=time(8),
+                                  work_end=time(16), work_break_start=break_start, work_break_end=break_end,
+                                  is_working_day=True)
+
+
+class FakeSpecialists:
+    """Data access of specialists with working times, breaks and appointments kept in memory."""
+
+    def __init__(self, working_times: list[SpecialistsWorkingTime], breaks: list[tuple[uuid.UUID, datetime, datetime]],
+                 appointments: list[tuple[uuid.UUID, datetime, datetime]]):
+        self.working_times = working_times
+        self.breaks = breaks
+        self.appointments = appointments
+
+    async def get_ids_by_role(self, role_id: int):
+        return list(dict.fromkeys(working_time.specialist_id for working_time in self.working_times))
+
+    async def get_working_times(self, specialists_ids):
+        return [working_time for working_time in self.working_times if working_time.specialist_id in specialists_ids]
+
+    async def get_breaks(self, specialists_ids, start, end):
+        return [row for row in self.breaks if row[0] in specialists_ids]
+
+    async def get_appointments(self, specialists_ids, start, end):
+        return [row for row in self.appointments if row[0] in specialists_ids]
+
+
+class TestIntervals:
+
+    def test_merge_intervals(self):
+        intervals = [(at(12), at(13)), (at(8), at(9)), (at(8, 30), at(10)), (at(10), at(11)), (at(12, 15), at(12, 45))]
+        assert availability.merge_intervals(intervals) == [(at(8), at(11)), (at(12), at(13))]
+
+    def test_merge_no_intervals(self):
+        assert availability.merge_intervals([]) == []
+
+    def test_subtract_intervals(self):
+        intervals = [(at(8), at(12)), (at(13), at(16))]
+        busy = [(at(7), at(8, 30)), (at(10), at(10, 30)), (at(11, 30), at(13, 30)), (at(15), at(17))]
+        assert availability.subtract_intervals(intervals, busy) == [(at(8, 30), at(10)), (at(10, 30), at(11, 30)),
+                                                                    (at(13, 30), at(15))]
+
+    def test_subtract_covering_interval(self):
+        assert availability.subtract_intervals([(at(8), at(12))], [(at(7), at(13))]) == []
+
+    def test_subtract_nothing(self):
+        assert availability.subtract_intervals([(at(8), at(12))], []) == [(at(8), at(12))]
+
+
+class TestFreeWindows:
+    specialist_id = uuid.uuid4()
+
+    def test_free_windows_skip_break_and_visits(self):
+        working_times = [working_time(self.specialist_id, 1, time(12), time(12, 30))]
+        busy = [(at(9), at(9, 30)), (at(9, 15), at(10)), (at(15, 45), at(16))]
+        free_windows = availability.get_free_windows(working_times, busy, MONDAY, at(0, day=8), 30)
+        assert free_windows == [(at(8), at(9)), (at(10), at(12)), (at(12, 30), at(15, 45))]
+
+    def test_free_windows_shorter_than_visit_are_skipped(self):
+        working_times = [working_time(self.specialist_id, 1)]
+        busy = [(at(8, 15), at(15, 30))]
+        assert availability.get_free_windows(working_times, busy, MONDAY, at(0, day=8), 30) == [(at(15, 30), at(16))]
+
+    def test_free_windows_are_clipped_to_range(self):
+        working_times = [working_time(self.specialist_id, 1), working_time(self.specialist_id, 2)]
+        free_windows = availability.get_free_windows(working_times, [], at(14), at(10, day=8), 30)
+        assert free_windows == [(at(14), at(16)), (at(8, day=8), at(10, day=8))]
+
+    def test_day_not_accepting_visit_duration(self):
+        working_times = [working_time(self.specialist_id, 1, accepted_visit_duration=[15]),
+                         working_time(self.specialist_id, 2, accepted_visit_duration=[15, 60])]
+        free_windows = availability.get_free_windows(working_times, [], MONDAY, at(0, day=9), 60)
+        assert free_windows == [(at(8, day=8), at(16, day=8))]
+
+
+@pytest.mark.asyncio
+class TestFirstFreeSlot:
+    busy_specialist_id = uuid.uuid4()
+    free_specialist_id = uuid.uuid4()
+
+    @pytest.fixture(autouse=True)
+    def specialists(self, monkeypatch) -> FakeSpecialists:
+        specialists = FakeSpecialists(working_times=[working_time(self.busy_specialist_id, 1),
+                                                     working_time(self.free_specialist_id, 1)],
+                                      breaks=[(self.free_specialist_id, at(8), at(10))],
+                                      appointments=[(self.busy_specialist_id, at(8), at(11))])
+        monkeypatch.setattr(availability, 'Specialists', lambda db_session: specialists)
+        return specialists
+
+    async def test_earliest_slot_of_any_specialist(self):
+        free_slot = await availability.get_first_free_slot(1, MONDAY, at(0, day=8), 30, None)
+        assert free_slot == (self.free_specialist_id, at(10), at(10, 30))
+
+    async def test_no_free_slot_in_range(self):
+        assert await availability.get_first_free_slot(1, at(8), at(9, 30), 30, None) is None
+
+    async def test_role_without_specialists(self, specialists):
+        specialists.working_times = []
+        assert await availability.get_first_free_slot(1, MONDAY, at(0, day=8), 30, None) is None
@@ -0,0 +1,217 @@
+import asyncio
+import socket
+import uuid
+from datetime import timedelta
+from typing import Iterator
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+import src.services.emails as emails
+from src.database.models.patients import EmailsOutbox as EmailsOutboxTable
+
+
+def outbox_email(recipient: str, attempts: int = 0) -> EmailsOutboxTable:
+    return EmailsOutboxTable(id=uuid.uuid4(), idempotency_key=f'test.{recipient}', recipient=recipient,
+                             subject='Subject', body='Body', status='pending', attempts=attempts)
+
+
+class FakeMailer:
+    """Sends emails to recipients with no error assigned, raises assigned error otherwise."""
+
+    def __init__(self, errors: dict[str, Exception]):
+        self.errors = errors
+        self.sent: list[str] = []
+        self.closed = False
+
+    async def send(self, message):
+        error = self.errors.get(message['To'])
+        if error is not None:
+            raise error
+        self.sent.append(message['To'])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeOutbox:
+    """Data access of outbox, with emails due in memory and saved results."""
+
+    def __init__(self):
+        self.emails: list[EmailsOutboxTable] = []
+        self.sent_ids: list[uuid.UUID] = []
+        self.failures: list[dict] = []
+
+    async def lock_pending(self, limit: int):
+        return self.emails[:limit]
+
+    async def mark_sent(self, emails_ids):
+        self.sent_ids.extend(emails_ids)
+
+    async def mark_failed(self, failures):
+        self.failures.extend(failures)
+
+
+class RecordingHandler:
+    """Handler of local SMTP server, keeps delivered emails and logins with server connection of each."""
+
+    def __init__(self):
+        self.delivered: list[tuple[object, str]] = []
+        self.logins: list[str] = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.append((server, envelope.rcpt_tos[0]))
+        return '250 OK'
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        self.logins.append(auth_data.login.decode())
+        return AuthResult(success=auth_data.password == b'app password')
+
+    @property
+    def connections(self) -> int:
+        return len({id(server) for server, _ in self.delivered})
+
+
+def free_port() -> int:
+    with socket.socket() as listening_socket:
+        listening_socket.bind(('127.0.0.1', 0))
+        return listening_socket.getsockname()[1]
+
+
+def refused(code: int) -> aiosmtplib.SMTPRecipientsRefused:
+    return aiosmtplib.SMTPRecipientsRefused([aiosmtplib.SMTPRecipientRefused(code, 'Refused', 'patient@example.com')])
+
+
+class TestPrepareFailure:
+
+    @pytest.mark.parametrize("attempts, retry_delay", [(0, 30), (1, 60), (3, 240), (6, 1_920)])
+    def test_retry_delay_doubles(self, attempts, retry_delay, monkeypatch):
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_MAX_ATTEMPTS', 8)
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_RETRY_DELAY', 30)
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_MAX_RETRY_DELAY', 3_600)
+        failure = emails._prepare_failure(outbox_email('patient@example.com', attempts), TimeoutError())
+        assert failure['status'] == 'pending'
+        assert failure['attempts'] == attempts + 1
+        assert failure['retry_delay'] == timedelta(seconds=retry_delay)
+
+    def test_retry_delay_is_limited(self, monkeypatch):
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_MAX_ATTEMPTS', 20)
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_MAX_RETRY_DELAY', 3_600)
+        failure = emails._prepare_failure(outbox_email('patient@example.com', 12), TimeoutError())
+        assert failure['retry_delay'] == timedelta(seconds=3_600)
+
+    def test_last_attempt_fails(self, monkeypatch):
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_MAX_ATTEMPTS', 8)
+        failure = emails._prepare_failure(outbox_email('patient@example.com', 7), TimeoutError())
+        assert failure['status'] == 'failed'
+
+    def test_permanent_failure(self):
+        failure = emails._prepare_failure(outbox_email('patient@example.com'), refused(550), permanent=True)
+        assert failure['status'] == 'failed'
+        assert 'SMTPRecipientsRefused' in failure['last_error']
+
+
+@pytest.mark.asyncio
+class TestSendOutboxBatch:
+
+    @pytest.fixture(autouse=True)
+    def fake_outbox(self, monkeypatch, fake_session) -> FakeOutbox:
+        fake_outbox = FakeOutbox()
+        monkeypatch.setattr(emails, 'EmailsOutbox', lambda db_session: fake_outbox)
+        monkeypatch.setattr(emails, 'create_relational_async_session', lambda: fake_session)
+        monkeypatch.setattr(emails, 'get_email_secrets', lambda: {'email': 'clinic@medapp.com', 'password': ''})
+        return fake_outbox
+
+    async def test_rejected_emails(self, fake_outbox):
+        outbox = [outbox_email(recipient) for recipient in ('sent@example.com', 'unknown@example.com',
+                                                            'full@example.com', 'spam@example.com')]
+        fake_outbox.emails = outbox
+        mailer = FakeMailer({'unknown@example.com': refused(550), 'full@example.com': refused(452),
+                             'spam@example.com': aiosmtplib.SMTPDataError(554, 'Spam')})
+        assert not await emails.send_outbox_batch(mailer)
+        assert fake_outbox.sent_ids == [outbox[0].id]
+        assert [(failure['email_id'], failure['status']) for failure in fake_outbox.failures] == [
+            (outbox[1].id, 'failed'), (outbox[2].id, 'pending'), (outbox[3].id, 'failed')]
+        assert not mailer.closed
+
+    async def test_connection_failure_stops_batch(self, fake_outbox):
+        outbox = [outbox_email(recipient) for recipient in ('sent@example.com', 'lost@example.com',
+                                                            'later@example.com')]
+        fake_outbox.emails = outbox
+        mailer = FakeMailer({'lost@example.com': aiosmtplib.SMTPServerDisconnected('Closed')})
+        assert not await emails.send_outbox_batch(mailer)
+        assert mailer.sent == ['sent@example.com']
+        assert [(failure['email_id'], failure['status']) for failure in fake_outbox.failures] == [
+            (outbox[1].id, 'pending')]
+        assert mailer.closed
+
+    async def test_full_batch_asks_for_more(self, monkeypatch, fake_outbox):
+        monkeypatch.setattr(emails, 'EMAILS_OUTBOX_BATCH_SIZE', 2)
+        fake_outbox.emails = [outbox_email(f'patient{index}@example.com') for index in range(3)]
+        mailer = FakeMailer({})
+        assert await emails.send_outbox_batch(mailer)
+        assert mailer.sent == ['patient0@example.com', 'patient1@example.com']
+
+
+@pytest.mark.asyncio
+class TestMailer:
+
+    @pytest.fixture
+    def smtp_server(self, monkeypatch) -> Iterator[Controller]:
+        """Local SMTP server without TLS, with AUTH offered on plain connection for tests of login."""
+        handler = RecordingHandler()
+        controller = Controller(handler, hostname='127.0.0.1', port=free_port(), authenticator=handler.authenticate,
+                                auth_require_tls=False)
+        controller.start()
+        monkeypatch.setattr(emails, 'SMTP_HOST', controller.hostname)
+        monkeypatch.setattr(emails, 'SMTP_PORT', controller.port)
+        monkeypatch.setattr(emails, 'SMTP_TLS', 'none')
+        monkeypatch.setattr(emails, 'SMTP_AUTH', False)
+        monkeypatch.setattr(emails, 'SMTP_TIMEOUT', 5)
+        monkeypatch.setattr(emails, 'get_email_secrets', lambda: {'email': 'clinic@medapp.com',
+                                                                  'password': 'app password'})
+        yield controller
+        controller.stop()
+
+    @staticmethod
+    def message(recipient: str):
+        return emails._prepare_message(outbox_email(recipient))
+
+    async def test_emails_share_connection(self, smtp_server):
+        mailer = emails.Mailer()
+        for index in range(3):
+            await mailer.send(self.message(f'patient{index}@example.com'))
+        await mailer.close()
+        assert [recipient for _, recipient in smtp_server.handler.delivered] == [
+            'patient0@example.com', 'patient1@example.com', 'patient2@example.com']
+        assert smtp_server.handler.connections == 1
+        assert smtp_server.handler.logins == []  # SMTP_AUTH=false
+
+    async def test_reconnect_after_server_disconnected(self, smtp_server):
+        mailer = emails.Mailer()
+        await mailer.send(self.message('first@example.com'))
+        [(server, _)] = smtp_server.handler.delivered
+
+        async def close_connection():
+            server.transport.close()
+            await asyncio.sleep(0.1)
+
+        # Blocks loop of test, so mailer still considers connection open and learns otherwise when sending
+        asyncio.run_coroutine_threadsafe(close_connection(), smtp_server.loop).result(5)
+        assert mailer.smtp.is_connected
+        await mailer.send(self.message('second@example.com'))
+        await mailer.close()
+        assert [recipient for _, recipient in smtp_server.handler.delivered] == ['first@example.com',
+                                                                                  'second@example.com']
+        assert smtp_server.handler.connections == 2
+
+    async def test_login_with_email_of_secrets(self, smtp_server, monkeypatch):
+        monkeypatch.setattr(emails, 'SMTP_AUTH', True)
+        mailer = emails.Mailer()
+        await mailer.send(self.message('patient@example.com'))
+        await mailer.send(self.message('other@example.com'))
+        await mailer.close()
+        assert smtp_server.handler.logins == ['clinic@medapp.com']
+        assert smtp_server.handler.connections == 1
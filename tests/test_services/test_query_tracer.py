@@ -0,0 +1,60 @@
+import logging
+import time
+
+import pytest
+
+import src.services.query_tracer as query_tracer
+from src.database.query_listeners import ExecutedQuery
+
+SCOPE = {'type': 'http', 'method': 'GET', 'path': '/patients'}
+
+
+def execute_statements(trace: query_tracer.QueryTrace, number: int):
+    """Run listeners of query tracer as query listeners of engine do for every statement."""
+    context_token = query_tracer.request_trace.set(trace)
+    try:
+        for _ in range(number):
+            query = ExecutedQuery('SELECT 1', {}, False, time.perf_counter())
+            query_tracer.query_started(query)
+            query_tracer.query_finished(query)
+    finally:
+        query_tracer.request_trace.reset(context_token)
+
+
+class TestQueryBudget:
+
+    def test_within_budget(self, monkeypatch, caplog):
+        monkeypatch.setattr(query_tracer, 'QUERY_BUDGET_MODE', 'raise')
+        trace = query_tracer.QueryTrace(SCOPE, budget=3)
+        execute_statements(trace, 3)
+        query_tracer.finish_request(trace)
+        assert trace.queries == 3
+        assert not trace.over_budget
+        assert not caplog.records
+
+    def test_over_budget_warns(self, monkeypatch, caplog):
+        monkeypatch.setattr(query_tracer, 'QUERY_BUDGET_MODE', 'warn')
+        trace = query_tracer.QueryTrace(SCOPE, budget=3)
+        execute_statements(trace, 5)
+        with caplog.at_level(logging.WARNING, logger=query_tracer.__name__):
+            query_tracer.finish_request(trace)
+        assert trace.over_budget
+        assert 'GET /patients executed 5 statements over budget of 3: other x 5' in caplog.text
+
+    def test_over_budget_raises(self, monkeypatch):
+        monkeypatch.setattr(query_tracer, 'QUERY_BUDGET_MODE', 'raise')
+        trace = query_tracer.QueryTrace(SCOPE, budget=3)
+        with pytest.raises(query_tracer.QueryBudgetExceeded, match='more than 3 statements'):
+            execute_statements(trace, 5)
+        assert trace.queries == 4  # Fourth statement isn't executed
+
+    def test_budget_raised_for_batches(self, monkeypatch):
+        monkeypatch.setattr(query_tracer, 'QUERY_BUDGET_MODE', 'raise')
+        trace = query_tracer.QueryTrace(SCOPE, budget=3)
+        context_token = query_tracer.request_trace.set(trace)
+        try:
+            query_tracer.set_query_budget(0)
+        finally:
+            query_tracer.request_trace.reset(context_token)
+        execute_statements(trace, 30)
+        assert not trace.over_budget
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import src.data_access_layer.general as dal_gen
+import src.database.relational as db_rel
+
+
+class ExhaustedPoolEngine:
+    """Replica engine whose pool has no free connection."""
+
+    def __init__(self):
+        self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+        return self
+
+    async def start(self):
+        raise PoolTimeoutError('QueuePool limit reached, connection timed out')
+
+
+@pytest.mark.asyncio
+class TestReadSession:
+
+    @pytest.fixture
+    def replica_engine(self, monkeypatch) -> ExhaustedPoolEngine:
+        replica_engine = ExhaustedPoolEngine()
+        monkeypatch.setattr(db_rel, 'replica_async_engine', replica_engine)
+        monkeypatch.setattr(dal_gen, '_replica_down_until', 0.0)
+        return replica_engine
+
+    async def test_exhausted_replica_pool_falls_back_to_primary(self, replica_engine, fake_session):
+        request = SimpleNamespace(headers={})
+        for _ in range(2):
+            sessions = dal_gen.get_relational_read_session(request, fake_session)
+            assert await anext(sessions) is fake_session
+            await sessions.aclose()
+        assert replica_engine.connects == 1  # Replica is skipped after failure
@@ -0,0 +1,56 @@
+import hashlib
+
+import pytest
+
+import src.services.security as security
+
+
+@pytest.fixture(autouse=True)
+def fast_scrypt(monkeypatch):
+    """Cheap scrypt parameters and known legacy salt, hashes are checked by their format, not cost."""
+    monkeypatch.setattr(security, 'PASSWORD_HASH_ALGORITHM', 'scrypt')
+    monkeypatch.setattr(security, 'PASSWORD_SCRYPT_N', 2 ** 10)
+    monkeypatch.setattr(security, 'PASSWORD_SCRYPT_R', 8)
+    monkeypatch.setattr(security, 'PASSWORD_SCRYPT_P', 1)
+    monkeypatch.setattr(security, 'get_salt', lambda: 'legacy salt')
+
+
+class TestPasswordHashing:
+
+    def test_scrypt_round_trip(self):
+        hashed_password = security.hash_password('Correct horse 1')
+        assert hashed_password.startswith(b'scrypt$1024$8$1$')
+        assert security.verify_password('Correct horse 1', hashed_password)
+        assert not security.verify_password('Correct horse 2', hashed_password)
+
+    def test_scrypt_hashes_are_salted(self):
+        assert security.hash_password('Correct horse 1') != security.hash_password('Correct horse 1')
+
+    def test_scrypt_hash_keeps_its_parameters(self, monkeypatch):
+        hashed_password = security.hash_password('Correct horse 1')
+        monkeypatch.setattr(security, 'PASSWORD_SCRYPT_N', 2 ** 11)
+        assert security.verify_password('Correct horse 1', hashed_password)
+
+    def test_legacy_sha256_verification(self):
+        legacy_hash = hashlib.sha256(b'legacy saltCorrect horse 1').digest()
+        assert security.verify_password('Correct horse 1', legacy_hash)
+        assert not security.verify_password('Correct horse 2', legacy_hash)
+
+    def test_sha256_algorithm(self, monkeypatch):
+        monkeypatch.setattr(security, 'PASSWORD_HASH_ALGORITHM', 'sha256')
+        assert security.hash_password('Correct horse 1') == hashlib.sha256(b'legacy saltCorrect horse 1').digest()
+
+    def test_needs_rehash(self, monkeypatch):
+        scrypt_hash = security.hash_password('Correct horse 1')
+        legacy_hash = hashlib.sha256(b'legacy saltCorrect horse 1').digest()
+        assert not security.needs_rehash(scrypt_hash)
+        assert security.needs_rehash(legacy_hash)
+        monkeypatch.setattr(security, 'PASSWORD_SCRYPT_N', 2 ** 11)
+        assert security.needs_rehash(scrypt_hash)
+        monkeypatch.setattr(security, 'PASSWORD_HASH_ALGORITHM', 'sha256')
+        assert security.needs_rehash(scrypt_hash)
+        assert not security.needs_rehash(legacy_hash)
+
+    def test_dummy_password_never_matches(self, monkeypatch):
+        monkeypatch.setattr(security, '_get_dummy_password_hash', lambda: security.hash_password('Correct horse 1'))
+        assert not security.verify_dummy_password('Correct horse 1')
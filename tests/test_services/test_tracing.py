@@ -0,0 +1,120 @@
+import asyncio
+from collections import deque
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+import src.database.query_listeners as query_listeners
+import src.tracing as tracing
+from src.data_access_layer.instrumentation import instrument_data_access
+from src.services.background import run_periodically
+from src.services.middleware import TracedRoute, TracingMiddleware
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter(monkeypatch) -> ListExporter:
+    """Tracing enabled for functions decorated during test, finished spans are kept in list."""
+    monkeypatch.setattr(tracing, 'TRACING', True)
+    monkeypatch.setattr(tracing, '_finished_spans', deque())
+    list_exporter = ListExporter()
+    monkeypatch.setattr(tracing, 'exporter', list_exporter)
+    monkeypatch.setattr(query_listeners, '_started_listeners', [tracing.query_started])
+    monkeypatch.setattr(query_listeners, '_finished_listeners', [tracing.query_finished])
+    return list_exporter
+
+
+def make_data_access(database_session):
+    """Data access class decorated after tracing was enabled, on engine with query listeners."""
+    query_listeners.instrument_engine(database_session.bind)
+
+    @instrument_data_access
+    class Clock:
+        def __init__(self, db_session):
+            self.db_session = db_session
+
+        async def get_now(self):
+            return await self.db_session.scalar(text('SELECT now()'))
+
+    return Clock(database_session)
+
+
+def spans_by_kind(spans) -> dict[str, tracing.Span]:
+    assert len({span.trace_id for span in spans}) == 1
+    return {span.kind: span for span in spans}
+
+
+@pytest.mark.asyncio
+class TestTracing:
+
+    async def test_request_spans_chain(self, exporter, database_session):
+        data_access = make_data_access(database_session)
+        router = APIRouter(route_class=TracedRoute)
+
+        @router.get('/now')
+        async def get_now():
+            async with database_session.begin():
+                return {'now': str(await data_access.get_now())}
+
+        app = FastAPI()
+        app.include_router(router)
+        app.add_middleware(TracingMiddleware)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            response = await client.get('/now')
+        tracing._export_finished_spans()
+
+        spans = spans_by_kind(exporter.spans)
+        assert response.headers['X-Trace-Id'] == spans['server'].trace_id
+        assert spans['server'].name == 'GET /now' and spans['server'].parent_id is None
+        assert spans['handler'].name == 'handler get_now'
+        assert spans['handler'].parent_id == spans['server'].span_id
+        assert spans['data_access'].name == 'Clock.get_now'
+        assert spans['data_access'].parent_id == spans['handler'].span_id
+        assert spans['db'].attributes['db.statement'] == 'SELECT now()'
+        assert spans['db'].parent_id == spans['data_access'].span_id
+
+    async def test_periodic_job_is_one_trace(self, exporter, database_session):
+        data_access = make_data_access(database_session)
+        job_done = asyncio.Event()
+
+        async def purge():
+            async with database_session.begin():
+                await data_access.get_now()
+            job_done.set()
+
+        task = asyncio.create_task(run_periodically(purge, 0.01))
+        await asyncio.wait_for(job_done.wait(), 5)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        tracing._export_finished_spans()
+
+        spans = spans_by_kind(exporter.spans[:3])
+        assert spans['background'].parent_id is None
+        assert spans['data_access'].parent_id == spans['background'].span_id
+        assert spans['db'].parent_id == spans['data_access'].span_id
+
+    async def test_failed_query_span(self, exporter, database_session):
+        query_listeners.instrument_engine(database_session.bind)
+        finished_queries = []
+        query_listeners.add_listeners(finished=finished_queries.append)
+        with tracing.span('job', 'background'):
+            with pytest.raises(DBAPIError):
+                async with database_session.begin():
+                    await database_session.execute(text('SELECT 1 / 0'))
+        tracing._export_finished_spans()
+
+        spans = spans_by_kind(exporter.spans)
+        assert spans['db'].status == 'error'
+        assert 'DivisionByZero' in spans['db'].attributes['error']
+        [query] = finished_queries  # Finished once, timing shared by listeners
+        assert query.span is spans['db'] and query.duration > 0